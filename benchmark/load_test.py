@@ -0,0 +1,250 @@
+"""
+Load tests the service under concurrent traffic against the local stand-in for the Open-Meteo APIs.
+
+For every concurrency level, a fresh server is started through main.py with empty caches and a reproducible mix of
+locations, days and routes is replayed. Latency percentiles, throughput and error rate are written to a JSON file.
+With several workers, the server is set up like in production, with a shared fit cache, statistics pools and
+multi-process metrics.
+
+Example:
+    python -m benchmark.load_test --concurrency 1 8 32 --requests 200 --locations 50 --workers 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import httpx
+import numpy as np
+
+from benchmark.run_benchmarks import get_free_port, get_git_commit
+from benchmark.upstream_stand_in import FORECAST_LATENCY_SECONDS, ARCHIVE_LATENCY_SECONDS
+
+LOAD_TEST_PATHS = ['/temperature', '/precipitation', '/climate-context']
+# Seconds to wait for a started server to accept requests.
+SERVER_START_TIMEOUT_SECONDS = 30
+
+
+class LoadTestRequest(NamedTuple):
+    path: str
+    parameters: Dict[str, float]
+
+
+class LoadTestResult(NamedTuple):
+    latency_seconds: float
+    status_code: Optional[int]
+
+
+def generate_requests(
+        number_of_requests: int,
+        number_of_locations: int,
+        number_of_days: int,
+        paths: List[str],
+        latitude_range: Tuple[float, float],
+        longitude_range: Tuple[float, float],
+        seed: int
+) -> List[LoadTestRequest]:
+    """
+    Generates a reproducible mix of requests, which repeat locations and days like real traffic does.
+
+    Args:
+        number_of_requests: Number of requests.
+        number_of_locations: Number of distinct locations the requests are drawn from.
+        number_of_days: Number of distinct days up to today the requests are drawn from.
+        paths: Routes the requests are drawn from.
+        latitude_range: Southernmost and northernmost latitude of the locations.
+        longitude_range: Westernmost and easternmost longitude of the locations.
+        seed: Seed of the random mix.
+    """
+    rng = random.Random(seed)
+    locations = [
+        (round(rng.uniform(*latitude_range), 6), round(rng.uniform(*longitude_range), 6))
+        for _ in range(number_of_locations)
+    ]
+    today = datetime.now().replace(hour=12, minute=0, second=0, microsecond=0)
+    timestamps = [int((today - timedelta(days=day)).timestamp()) for day in range(number_of_days)]
+    requests = []
+    for _ in range(number_of_requests):
+        latitude, longitude = rng.choice(locations)
+        requests.append(LoadTestRequest(
+            path=rng.choice(paths),
+            parameters={'timestamp': rng.choice(timestamps), 'latitude': latitude, 'longitude': longitude}
+        ))
+    return requests
+
+
+def summarise_level(concurrency: int, results: List[LoadTestResult], duration_seconds: float) -> Dict:
+    """Latency percentiles, throughput and error rate of one concurrency level."""
+    latencies = np.array([result.latency_seconds for result in results])
+    errors = sum(result.status_code != 200 for result in results)
+    return {
+        'concurrency': concurrency,
+        'requests': len(results),
+        'errors': errors,
+        'error_rate': errors / len(results),
+        'duration_seconds': duration_seconds,
+        'throughput_per_second': len(results) / duration_seconds,
+        'latency_seconds': {
+            'p50': float(np.percentile(latencies, 50)),
+            'p95': float(np.percentile(latencies, 95)),
+            'p99': float(np.percentile(latencies, 99)),
+            'mean': float(latencies.mean()),
+            'max': float(latencies.max())
+        }
+    }
+
+
+async def replay(target: str, requests: List[LoadTestRequest], concurrency: int) -> Tuple[List[LoadTestResult], float]:
+    """
+    Sends the requests with the given number of concurrent clients.
+
+    Returns:
+        Result of every request and the duration of the replay in seconds.
+    """
+    queue = iter(requests)
+    results = []
+
+    async def client_loop(client: httpx.AsyncClient):
+        for request in queue:
+            start = time.perf_counter()
+            try:
+                response = await client.get(request.path, params=request.parameters)
+                status_code = response.status_code
+            except httpx.HTTPError:
+                status_code = None
+            results.append(LoadTestResult(time.perf_counter() - start, status_code))
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=target, timeout=None, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*[client_loop(client) for _ in range(concurrency)])
+        return results, time.perf_counter() - start
+
+
+def start_server(arguments: List[str], port: int, environment: Dict[str, str], health_path: str) -> subprocess.Popen:
+    """Starts a server process and waits until it answers requests."""
+    process = subprocess.Popen(
+        [sys.executable, *arguments], env={**os.environ, **environment}, stdout=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + SERVER_START_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'Server {arguments} exited with {process.returncode}.')
+        try:
+            httpx.get(f'http://127.0.0.1:{port}{health_path}', timeout=1)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f'Server {arguments} did not start within {SERVER_START_TIMEOUT_SECONDS} seconds.')
+
+
+def stop_server(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def run_level(
+        concurrency: int,
+        requests: List[LoadTestRequest],
+        stand_in_port: int,
+        workers: int
+) -> Dict:
+    """Replays the requests against a fresh server with empty caches."""
+    port = get_free_port()
+    with tempfile.TemporaryDirectory() as directory:
+        environment = {
+            'SERVER_WORKERS': str(workers),
+            'SERVER_HOST': '127.0.0.1',
+            'SERVER_PORT': str(port),
+            'SERVER_LOG_LEVEL': 'warning',
+            'FORECAST_API_ENDPOINT': f'http://127.0.0.1:{stand_in_port}/v1/forecast',
+            'HISTORICAL_API_ENDPOINT': f'http://127.0.0.1:{stand_in_port}/v1/archive',
+            'HISTORICAL_CACHE_DIRECTORY': str(Path(directory) / 'historical'),
+            'CLIMATOLOGY_STORE_DIRECTORY': str(Path(directory) / 'climatology')
+        }
+        if workers > 1:
+            # main.py sets up the shared fit cache and the metrics of several workers, here with empty files.
+            environment['FIT_CACHE_SHARED_PATH'] = str(Path(directory) / 'fit_cache.npy')
+            environment['PROMETHEUS_MULTIPROC_DIR'] = str(Path(directory) / 'prometheus')
+        server = start_server(['main.py'], port, environment, '/docs')
+        try:
+            results, duration_seconds = asyncio.run(replay(f'http://127.0.0.1:{port}', requests, concurrency))
+        finally:
+            stop_server(server)
+    return summarise_level(concurrency, results, duration_seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 8, 32])
+    parser.add_argument('--requests', type=int, default=200, help='Requests per concurrency level.')
+    parser.add_argument('--locations', type=int, default=50, help='Distinct locations of the requests.')
+    parser.add_argument('--days', type=int, default=7, help='Distinct days up to today of the requests.')
+    parser.add_argument('--paths', nargs='+', default=LOAD_TEST_PATHS, metavar='PATH')
+    parser.add_argument('--latitudes', nargs=2, type=float, default=(47.0, 55.0), metavar=('SOUTH', 'NORTH'))
+    parser.add_argument('--longitudes', nargs=2, type=float, default=(5.0, 15.0), metavar=('WEST', 'EAST'))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--forecast-latency', type=float, default=FORECAST_LATENCY_SECONDS, metavar='SECONDS')
+    parser.add_argument('--archive-latency', type=float, default=ARCHIVE_LATENCY_SECONDS, metavar='SECONDS')
+    parser.add_argument('--workers', type=int, default=1, help='Server processes, as SERVER_WORKERS of main.py.')
+    parser.add_argument('--output', type=Path, default=Path('load_test_results.json'))
+    arguments = parser.parse_args()
+
+    requests = generate_requests(
+        arguments.requests,
+        arguments.locations,
+        arguments.days,
+        arguments.paths,
+        tuple(arguments.latitudes),
+        tuple(arguments.longitudes),
+        arguments.seed
+    )
+    stand_in_port = get_free_port()
+    stand_in = start_server(
+        ['-m', 'benchmark.upstream_stand_in', '--port', str(stand_in_port),
+         '--forecast-latency', str(arguments.forecast_latency), '--archive-latency', str(arguments.archive_latency),
+         '--log-level', 'warning'],
+        stand_in_port,
+        {},
+        '/docs'
+    )
+    try:
+        levels = []
+        for concurrency in arguments.concurrency:
+            level = run_level(concurrency, requests, stand_in_port, arguments.workers)
+            levels.append(level)
+            latency = level['latency_seconds']
+            print(
+                f'concurrency {concurrency:>4}: {level["throughput_per_second"]:>8.2f} requests/s, '
+                f'p50 {latency["p50"] * 1000:>8.1f} ms, p95 {latency["p95"] * 1000:>8.1f} ms, '
+                f'p99 {latency["p99"] * 1000:>8.1f} ms, errors {level["error_rate"]:.1%}'
+            )
+    finally:
+        stop_server(stand_in)
+
+    report = {
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'git_commit': get_git_commit(),
+        'parameters': {
+            key: value for key, value in vars(arguments).items() if key != 'output'
+        },
+        'levels': levels
+    }
+    arguments.output.write_text(json.dumps(report, indent=2, default=str))
+    print(f'Wrote results to {arguments.output}.')
+
+
+if __name__ == '__main__':
+    main()
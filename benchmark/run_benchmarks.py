@@ -0,0 +1,226 @@
+"""
+Benchmarks the statistics and the endpoints against the local stand-in for the Open-Meteo APIs.
+
+The results are written to a JSON file, so that they can be compared between releases.
+
+Example:
+    python -m benchmark.run_benchmarks --repeats 20 --output benchmark_results.json
+"""
+import argparse
+import asyncio
+import json
+import platform
+import socket
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import httpx
+import numpy as np
+
+import src.weather_api_request
+from benchmark.upstream_stand_in import generate_daily_series, start_stand_in_server, FORECAST_LATENCY_SECONDS, \
+    ARCHIVE_LATENCY_SECONDS
+from main import app
+from src.calculate_statistics import calculate_cumulative_probability, calculate_last_occurrence
+from src.climatology_store import CLIMATOLOGY_STORE
+from src.daily_series import DailySeries
+from src.definitions import Coordinate, WeatherVariable, ReturnPeriodMode
+from src.extract_timeseries import get_historical_timeseries
+from src.fit_cache import FIT_CACHE
+from src.forecast_cache import FORECAST_CACHE
+from src.historical_cache import HISTORICAL_CACHE
+from src.response_cache import RESPONSE_CACHE
+from src.weather_api_request import close_http_client
+
+# Requested location and time of all benchmarks.
+BENCHMARK_COORDINATE = Coordinate(timestamp=1687461397, latitude=48.3504104, longitude=10.8766662)
+
+
+def get_free_port() -> int:
+    with socket.socket() as free_socket:
+        free_socket.bind(('127.0.0.1', 0))
+        return free_socket.getsockname()[1]
+
+
+def get_git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summarise(name: str, durations: List[float]) -> Dict:
+    """Summary statistics of the durations of a benchmark in seconds."""
+    return {
+        'name': name,
+        'repeats': len(durations),
+        'mean_seconds': statistics.fmean(durations),
+        'median_seconds': statistics.median(durations),
+        'min_seconds': min(durations),
+        'max_seconds': max(durations),
+        'stdev_seconds': statistics.stdev(durations) if len(durations) > 1 else 0.0
+    }
+
+
+def measure(function: Callable[[], object], repeats: int, setup: Callable[[], object] = lambda: None) -> List[float]:
+    durations = []
+    for _ in range(repeats):
+        setup()
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+async def measure_async(function, repeats: int, setup: Callable[[], object] = lambda: None) -> List[float]:
+    durations = []
+    for _ in range(repeats):
+        setup()
+        start = time.perf_counter()
+        await function()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def get_synthetic_historical_data(weather_variable: WeatherVariable, end_date: str) -> DailySeries:
+    """Historical data as returned by the archive API for the benchmark coordinate."""
+    start = np.datetime64('1940-01-01', 'D')
+    return DailySeries(
+        start,
+        generate_daily_series(
+            weather_variable,
+            BENCHMARK_COORDINATE.latitude,
+            BENCHMARK_COORDINATE.longitude,
+            start,
+            np.datetime64(end_date, 'D')
+        ),
+        weather_variable
+    )
+
+
+def run_microbenchmarks(repeats: int) -> List[Dict]:
+    """Benchmarks the extraction and statistics of the historical data without any caches."""
+    results = []
+    for weather_variable in WeatherVariable:
+        historical_data = get_synthetic_historical_data(weather_variable, '2022-06-27')
+        daily, weekly, monthly = get_historical_timeseries(BENCHMARK_COORDINATE, historical_data)
+        current_value = float(daily.iloc[:, 0].quantile(0.9))
+
+        results.append(summarise(
+            f'get_historical_timeseries[{weather_variable.value}]',
+            measure(lambda: get_historical_timeseries(BENCHMARK_COORDINATE, historical_data), repeats)
+        ))
+        for name, timeseries in [('daily', daily), ('monthly', monthly)]:
+            results.append(summarise(
+                f'calculate_cumulative_probability[{weather_variable.value},{name}]',
+                measure(
+                    lambda: calculate_cumulative_probability(timeseries, current_value, weather_variable),
+                    repeats
+                )
+            ))
+        results.append(summarise(
+            f'calculate_last_occurrence[{weather_variable.value}]',
+            measure(lambda: calculate_last_occurrence(daily, current_value, ReturnPeriodMode.MAX), repeats)
+        ))
+    return results
+
+
+def clear_caches(response_cache: bool = True, historical_cache: bool = True):
+    FIT_CACHE.clear()
+    FORECAST_CACHE.clear()
+    if response_cache:
+        RESPONSE_CACHE.clear()
+    if historical_cache:
+        HISTORICAL_CACHE.clear()
+
+
+async def run_endpoint_benchmarks(repeats: int) -> List[Dict]:
+    """
+    Benchmarks the endpoints in process, with the weather data fetched from the stand-in.
+
+    Every endpoint is measured with all caches cleared, with only the historical cache warm, and with the response
+    cached.
+    """
+    parameters = {
+        'timestamp': BENCHMARK_COORDINATE.timestamp,
+        'latitude': BENCHMARK_COORDINATE.latitude,
+        'longitude': BENCHMARK_COORDINATE.longitude
+    }
+    results = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://benchmark') as client:
+        async def get(path):
+            response = await client.get(path, params=parameters)
+            response.raise_for_status()
+
+        for path in ['/temperature', '/precipitation', '/climate-context']:
+            results.append(summarise(
+                f'endpoint[{path},cold]',
+                await measure_async(lambda: get(path), repeats, lambda: clear_caches())
+            ))
+            await get(path)
+            results.append(summarise(
+                f'endpoint[{path},historical_cached]',
+                await measure_async(
+                    lambda: get(path), repeats, lambda: clear_caches(historical_cache=False)
+                )
+            ))
+            await get(path)
+            results.append(summarise(f'endpoint[{path},response_cached]', await measure_async(lambda: get(path), repeats)))
+    return results
+
+
+async def run_benchmarks(repeats: int, forecast_latency_seconds: float, archive_latency_seconds: float) -> Dict:
+    server = start_stand_in_server(get_free_port(), forecast_latency_seconds, archive_latency_seconds)
+    stand_in_url = f'http://127.0.0.1:{server.config.port}/v1'
+    src.weather_api_request.FORECAST_API_ENDPOINT = f'{stand_in_url}/forecast'
+    src.weather_api_request.HISTORICAL_API_ENDPOINT = f'{stand_in_url}/archive'
+
+    with tempfile.TemporaryDirectory() as directory:
+        HISTORICAL_CACHE.directory = Path(directory) / 'historical'
+        CLIMATOLOGY_STORE.directory = Path(directory) / 'climatology'
+        try:
+            results = run_microbenchmarks(repeats)
+            results += await run_endpoint_benchmarks(repeats)
+        finally:
+            await close_http_client()
+            server.should_exit = True
+
+    return {
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'git_commit': get_git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': {
+            'repeats': repeats,
+            'forecast_latency_seconds': forecast_latency_seconds,
+            'archive_latency_seconds': archive_latency_seconds
+        },
+        'benchmarks': results
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeats', type=int, default=10)
+    parser.add_argument('--output', type=Path, default=Path('benchmark_results.json'))
+    parser.add_argument('--forecast-latency', type=float, default=FORECAST_LATENCY_SECONDS, metavar='SECONDS')
+    parser.add_argument('--archive-latency', type=float, default=ARCHIVE_LATENCY_SECONDS, metavar='SECONDS')
+    arguments = parser.parse_args()
+
+    report = asyncio.run(run_benchmarks(arguments.repeats, arguments.forecast_latency, arguments.archive_latency))
+    arguments.output.write_text(json.dumps(report, indent=2))
+
+    for result in report['benchmarks']:
+        print(f'{result["name"]:<60} {result["median_seconds"] * 1000:>10.3f} ms')
+    print(f'Wrote results to {arguments.output}.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""
+Local stand-in for the Open-Meteo forecast and archive APIs.
+
+Serves deterministic synthetic daily series from 1940 to the present after a configurable latency, so that the
+service can be benchmarked and load tested without network access.
+
+Example:
+    python -m benchmark.upstream_stand_in --port 8081 --archive-latency 0.5
+"""
+import argparse
+import asyncio
+import threading
+import time
+import zlib
+from typing import Optional
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Query
+from fastapi.responses import JSONResponse
+
+from src.definitions import WeatherVariable
+
+# First day of the synthetic series, like the archive.
+SERIES_START_DATE = np.datetime64('1940-01-01', 'D')
+# Latency of the forecast and the archive API in seconds.
+FORECAST_LATENCY_SECONDS = 0.05
+ARCHIVE_LATENCY_SECONDS = 0.5
+
+
+def generate_daily_series(
+        weather_variable: WeatherVariable,
+        latitude: float,
+        longitude: float,
+        start_date: np.datetime64,
+        end_date: np.datetime64
+) -> np.ndarray:
+    """
+    Generates a synthetic daily series, which is the same for the same location and day in every request.
+
+    Temperatures follow a seasonal cycle with a warming trend and noise. Precipitation is zero on dry days and gamma
+    distributed on wet days.
+
+    Args:
+        weather_variable: Weather variable of the series.
+        latitude: Latitude of the location.
+        longitude: Longitude of the location.
+        start_date: First day of the series.
+        end_date: Last day of the series.
+
+    Returns:
+        One value per day from the start date to the end date.
+    """
+    seed = zlib.crc32(f'{weather_variable.value}_{latitude:.4f}_{longitude:.4f}'.encode())
+    rng = np.random.default_rng(seed)
+    days = np.arange(SERIES_START_DATE, end_date + 1, dtype='datetime64[D]')
+    day_of_year = (days - days.astype('datetime64[Y]')).astype(np.float64)
+    years = (days - SERIES_START_DATE).astype(np.float64) / 365.25
+
+    if WeatherVariable.TEMPERATURE == weather_variable:
+        # The seasonal cycle is reversed on the southern hemisphere.
+        season = np.sign(latitude or 1) * np.sin(2 * np.pi * (day_of_year - 110) / 365.25)
+        values = (
+            27 - 0.35 * abs(latitude)
+            + (2 + 0.2 * abs(latitude)) * season
+            + 0.02 * years
+            + rng.normal(0, 3, len(days))
+        )
+    else:
+        wet = rng.random(len(days)) < 0.4
+        values = np.where(wet, rng.gamma(0.8, 5, len(days)), 0)
+
+    values = np.round(values, 1)
+    return values[max(int((start_date - SERIES_START_DATE).astype(int)), 0):]
+
+
+def create_app(
+        forecast_latency_seconds: float = FORECAST_LATENCY_SECONDS,
+        archive_latency_seconds: float = ARCHIVE_LATENCY_SECONDS
+) -> FastAPI:
+    """Creates the stand-in app, which answers after the latency of the respective API."""
+    app = FastAPI()
+
+    async def daily_response(latitude, longitude, daily, start_date, end_date, latency_seconds):
+        await asyncio.sleep(latency_seconds)
+        try:
+            weather_variables = [WeatherVariable(value) for value in daily.split(',')]
+            start = np.datetime64(start_date, 'D')
+            end = np.datetime64(end_date, 'D')
+        except ValueError as exception:
+            return JSONResponse(status_code=400, content={'error': True, 'reason': str(exception)})
+
+        start = max(start, SERIES_START_DATE)
+        daily_data = {'time': np.arange(start, end + 1, dtype='datetime64[D]').astype(str).tolist()}
+        for weather_variable in weather_variables:
+            daily_data[weather_variable.value] = generate_daily_series(
+                weather_variable, latitude, longitude, start, end
+            ).tolist()
+        return {'latitude': latitude, 'longitude': longitude, 'daily': daily_data}
+
+    @app.get('/v1/forecast')
+    async def forecast(
+            latitude: float,
+            longitude: float,
+            daily: str,
+            start_date: str,
+            end_date: str,
+            timezone: Optional[str] = Query(default=None)
+    ):
+        return await daily_response(latitude, longitude, daily, start_date, end_date, forecast_latency_seconds)
+
+    @app.get('/v1/archive')
+    async def archive(
+            latitude: float,
+            longitude: float,
+            daily: str,
+            start_date: str,
+            end_date: str,
+            models: Optional[str] = Query(default=None),
+            timezone: Optional[str] = Query(default=None)
+    ):
+        return await daily_response(latitude, longitude, daily, start_date, end_date, archive_latency_seconds)
+
+    return app
+
+
+def start_stand_in_server(
+        port: int,
+        forecast_latency_seconds: float = FORECAST_LATENCY_SECONDS,
+        archive_latency_seconds: float = ARCHIVE_LATENCY_SECONDS
+) -> uvicorn.Server:
+    """
+    Starts the stand-in on localhost in a background thread.
+
+    Returns:
+        Running server, which is stopped by setting should_exit.
+    """
+    server = uvicorn.Server(uvicorn.Config(
+        create_app(forecast_latency_seconds, archive_latency_seconds),
+        host='127.0.0.1',
+        port=port,
+        log_level='warning'
+    ))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--forecast-latency', type=float, default=FORECAST_LATENCY_SECONDS, metavar='SECONDS')
+    parser.add_argument('--archive-latency', type=float, default=ARCHIVE_LATENCY_SECONDS, metavar='SECONDS')
+    parser.add_argument('--log-level', default='info')
+    arguments = parser.parse_args()
+
+    uvicorn.run(
+        create_app(arguments.forecast_latency, arguments.archive_latency),
+        host='127.0.0.1',
+        port=arguments.port,
+        log_level=arguments.log_level
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -1,22 +1,103 @@
+import os
+import shutil
+import time
+
 import uvicorn
 from uvicorn.config import LOGGING_CONFIG
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+
+from src.api import precipitation, temperature, climate_context, batch, date_range, maps, metrics
+from src.forecast_cache import track_forecast_freshness, get_forecast_freshness_headers
+from src.metrics import TimedJSONResponse, track_stage_durations, get_server_timing_header, REQUEST_DURATION
+from src.response_cache import RESPONSE_CACHE
+from src.response_format import compress_response
+from src.statistics_pool import start_statistics_pool, shutdown_statistics_pool
+from src.weather_api_request import close_http_client
 
-from src.api import precipitation, temperature
+# Number of server processes. With several, the processes share the fit cache through a memory-mapped file.
+SERVER_WORKERS = int(os.environ.get('SERVER_WORKERS', 1))
+# Address and log level of the server, e.g. to start it on a free local port in the load test.
+SERVER_HOST = os.environ.get('SERVER_HOST', '0.0.0.0')
+SERVER_PORT = int(os.environ.get('SERVER_PORT', 80))
+SERVER_LOG_LEVEL = os.environ.get('SERVER_LOG_LEVEL', 'info')
+SHARED_FIT_CACHE_PATH = 'cache/fit_cache.npy'
+PROMETHEUS_MULTIPROCESS_DIRECTORY = 'cache/prometheus'
 
-app = FastAPI()
+app = FastAPI(default_response_class=TimedJSONResponse)
 
 app.include_router(temperature.router, prefix='/temperature')
 app.include_router(precipitation.router, prefix='/precipitation')
+app.include_router(climate_context.router, prefix='/climate-context')
+app.include_router(batch.router, prefix='/batch')
+app.include_router(date_range.router, prefix='/date-range')
+app.include_router(maps.router, prefix='/map')
+app.include_router(metrics.router, prefix='/metrics')
+
+# Paths of the routes, which label the request durations. Other paths share one label.
+ROUTE_PATHS = {route.path for route in app.routes}
+
+
+@app.middleware('http')
+async def add_forecast_freshness_headers(request: Request, call_next):
+    with track_forecast_freshness() as forecast_freshness:
+        response = await call_next(request)
+    response.headers.update(get_forecast_freshness_headers(forecast_freshness))
+    return response
+
+
+# Added last, so that it runs first and cached responses skip the routes and the other middleware.
+@app.middleware('http')
+async def cache_responses(request: Request, call_next):
+    return await RESPONSE_CACHE.respond(request, call_next)
+
+
+# Added after the response cache, so that cached responses are compressed as well and the cache holds one body for
+# every content encoding.
+@app.middleware('http')
+async def compress_responses(request: Request, call_next):
+    return await compress_response(request, call_next)
+
+
+# Added after the response cache and the compression, so that cached responses and compressing are timed as well.
+@app.middleware('http')
+async def add_server_timing_header(request: Request, call_next):
+    with track_stage_durations() as stage_durations:
+        start = time.perf_counter()
+        response = await call_next(request)
+        stage_durations['total'] = time.perf_counter() - start
+    route = request.url.path if request.url.path in ROUTE_PATHS else 'other'
+    REQUEST_DURATION.labels(route).observe(stage_durations['total'])
+    response.headers['Server-Timing'] = get_server_timing_header(stage_durations)
+    return response
+
+
+@app.on_event('startup')
+async def startup():
+    start_statistics_pool()
+
+
+@app.on_event('shutdown')
+async def shutdown():
+    await close_http_client()
+    shutdown_statistics_pool()
 
 
 if __name__ == '__main__':
     LOGGING_CONFIG["formatters"]["default"]["fmt"] = "%(asctime)s [%(name)s] %(levelprefix)s %(message)s"
     LOGGING_CONFIG["formatters"]["access"][
         "fmt"] = '%(asctime)s [%(name)s] %(levelprefix)s %(client_addr)s - "%(request_line)s" %(status_code)s'
+    if SERVER_WORKERS > 1:
+        # Read by the server processes, which import the app anew.
+        os.environ.setdefault('FIT_CACHE_SHARED_PATH', SHARED_FIT_CACHE_PATH)
+        os.environ.setdefault('STATISTICS_POOL_WORKERS', str(max((os.cpu_count() or 1) // SERVER_WORKERS, 1)))
+        os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', PROMETHEUS_MULTIPROCESS_DIRECTORY)
+        # Metrics of earlier runs would be collected as well.
+        shutil.rmtree(os.environ['PROMETHEUS_MULTIPROC_DIR'], ignore_errors=True)
+        os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'])
     uvicorn.run(
-        app,
-        host='0.0.0.0',
-        port=80,
-        log_level='info',
+        'main:app',
+        host=SERVER_HOST,
+        port=SERVER_PORT,
+        log_level=SERVER_LOG_LEVEL,
+        workers=SERVER_WORKERS
     )
@@ -0,0 +1,22 @@
+from fastapi import APIRouter, Request
+
+from src.definitions import WeatherModel, BatchRequest
+from src.calculate_batch_statistics import get_batch_climate_context_data
+from src.response_format import create_response
+import logging
+logger = logging.getLogger('uvicorn.error')
+
+router = APIRouter()
+
+
+@router.post("")
+async def get_batch_climate_context(request: Request, batch_request: BatchRequest):
+    logger.info(f'Entering get_batch_climate_context with {len(batch_request.coordinates)} coordinates.')
+    batch_climate_context_data = await get_batch_climate_context_data(
+        coordinates=batch_request.coordinates,
+        weather_model=WeatherModel.ERA5,
+        weather_variable_names=batch_request.weather_variables,
+        return_period_method=batch_request.return_period_method
+    )
+    logger.info('Sending batch climate context data.')
+    return create_response(request, batch_climate_context_data)
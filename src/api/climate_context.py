@@ -0,0 +1,31 @@
+from typing import List
+
+from fastapi import Depends, APIRouter, Query, Request
+
+from src.definitions import Coordinate, WeatherModel, WeatherVariableName, ReturnPeriodMethod
+from src.calculate_statistics import get_climate_context_data
+from src.response_format import create_response
+import logging
+logger = logging.getLogger('uvicorn.error')
+
+router = APIRouter()
+
+
+@router.get("")
+async def get_climate_context(
+        request: Request,
+        coordinate: Coordinate = Depends(),
+        weather_variables: List[WeatherVariableName] = Query(default=list(WeatherVariableName)),
+        return_period_method: ReturnPeriodMethod = ReturnPeriodMethod.FIT,
+        confidence_intervals: bool = False
+):
+    logger.info('Entering get_climate_context.')
+    climate_context_data = await get_climate_context_data(
+        coordinate=coordinate,
+        weather_model=WeatherModel.ERA5,
+        weather_variable_names=weather_variables,
+        return_period_method=return_period_method,
+        confidence_intervals=confidence_intervals
+    )
+    logger.info('Sending climate context data.')
+    return create_response(request, climate_context_data)
@@ -0,0 +1,42 @@
+from datetime import date
+from typing import List
+
+from fastapi import APIRouter, Query, HTTPException, Request
+
+from src.definitions import WeatherModel, WeatherVariableName, ReturnPeriodMethod
+from src.calculate_date_range_statistics import get_date_range_climate_context_data, DATE_RANGE_MAX_DAYS
+from src.response_format import create_response
+import logging
+logger = logging.getLogger('uvicorn.error')
+
+router = APIRouter()
+
+
+@router.get("")
+async def get_date_range_climate_context(
+        request: Request,
+        latitude: float,
+        longitude: float,
+        start_date: date,
+        end_date: date,
+        weather_variables: List[WeatherVariableName] = Query(default=list(WeatherVariableName)),
+        return_period_method: ReturnPeriodMethod = ReturnPeriodMethod.FIT
+):
+    logger.info(f'Entering get_date_range_climate_context from {start_date} to {end_date}.')
+    number_of_days = (end_date - start_date).days + 1
+    if not 1 <= number_of_days <= DATE_RANGE_MAX_DAYS:
+        raise HTTPException(
+            status_code=422,
+            detail=f'The date range must span 1 to {DATE_RANGE_MAX_DAYS} days, but spans {number_of_days}.'
+        )
+    date_range_climate_context_data = await get_date_range_climate_context_data(
+        latitude=latitude,
+        longitude=longitude,
+        start_date=start_date,
+        end_date=end_date,
+        weather_model=WeatherModel.ERA5,
+        weather_variable_names=weather_variables,
+        return_period_method=return_period_method
+    )
+    logger.info('Sending date range climate context data.')
+    return create_response(request, date_range_climate_context_data)
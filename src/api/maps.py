@@ -0,0 +1,54 @@
+from typing import List
+
+from fastapi import APIRouter, Query, HTTPException, Request
+from fastapi.responses import Response
+
+from src.definitions import WeatherModel, WeatherVariableName, MapFormat, ReturnPeriodMethod
+from src.calculate_map_statistics import get_map_data, to_netcdf, to_dense_arrays, MapTooLargeException
+from src.metrics import time_stage
+from src.response_format import create_response
+import logging
+logger = logging.getLogger('uvicorn.error')
+
+router = APIRouter()
+
+
+@router.get("")
+async def get_map(
+        request: Request,
+        south: float,
+        north: float,
+        west: float,
+        east: float,
+        timestamp: int,
+        weather_variables: List[WeatherVariableName] = Query(default=list(WeatherVariableName)),
+        format: MapFormat = MapFormat.NETCDF,
+        return_period_method: ReturnPeriodMethod = ReturnPeriodMethod.FIT
+):
+    logger.info(f'Entering get_map for south {south}, north {north}, west {west} and east {east}.')
+    if south > north or west > east:
+        raise HTTPException(status_code=422, detail='The bounding box must have south <= north and west <= east.')
+    try:
+        map_data = await get_map_data(
+            south=south,
+            north=north,
+            west=west,
+            east=east,
+            timestamp=timestamp,
+            weather_model=WeatherModel.ERA5,
+            weather_variable_names=weather_variables,
+            return_period_method=return_period_method
+        )
+    except MapTooLargeException as exception:
+        raise HTTPException(status_code=422, detail=str(exception))
+
+    logger.info('Sending map data.')
+    if MapFormat.JSON == format:
+        return create_response(request, to_dense_arrays(map_data))
+    with time_stage('serialize'):
+        content = to_netcdf(map_data)
+    return Response(
+        content=content,
+        media_type='application/x-netcdf',
+        headers={'Content-Disposition': f'attachment; filename="map_{map_data.attrs["date"]}.nc"'}
+    )
@@ -0,0 +1,16 @@
+import os
+
+from fastapi import APIRouter, Response
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST, CollectorRegistry, REGISTRY, multiprocess
+
+router = APIRouter()
+
+
+@router.get("")
+async def get_metrics():
+    registry = REGISTRY
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        # Several server processes write their metrics to the directory, which are collected together.
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(content=generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
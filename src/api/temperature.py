@@ -1,7 +1,8 @@
-from fastapi import Depends, APIRouter
+from fastapi import Depends, APIRouter, Request
 
-from src.definitions import WeatherVariable, Coordinate, WeatherModel, WeatherVariableName
+from src.definitions import WeatherVariable, Coordinate, WeatherModel, WeatherVariableName, ReturnPeriodMethod
 from src.calculate_statistics import get_weather_variable_data
+from src.response_format import create_response
 import logging
 logger = logging.getLogger('uvicorn.error')
 
@@ -9,13 +10,20 @@ router = APIRouter()
 
 
 @router.get("")
-async def get_daily_average_temperature(coordinate: Coordinate = Depends()):
+async def get_daily_average_temperature(
+        request: Request,
+        coordinate: Coordinate = Depends(),
+        return_period_method: ReturnPeriodMethod = ReturnPeriodMethod.FIT,
+        confidence_intervals: bool = False
+):
     logger.info('Entering get_temperature.')
-    weather_variable_data = get_weather_variable_data(
+    weather_variable_data = await get_weather_variable_data(
         coordinate=coordinate,
         weather_model=WeatherModel.ERA5,
         weather_variable=WeatherVariable.TEMPERATURE,
-        weather_variable_name=WeatherVariableName.TEMPERATURE
+        weather_variable_name=WeatherVariableName.TEMPERATURE,
+        return_period_method=return_period_method,
+        confidence_intervals=confidence_intervals
     )
     logger.info(f"Sending precipitation data.")
-    return weather_variable_data
+    return create_response(request, weather_variable_data)
@@ -0,0 +1,60 @@
+import os
+import warnings
+from typing import Tuple
+
+import numpy as np
+
+# Number of resampled series per historical series, which bounds the precision of the confidence intervals.
+BOOTSTRAP_SAMPLES = int(os.environ.get('BOOTSTRAP_SAMPLES', 200))
+# Share of the resampled return periods between the bounds of the confidence intervals.
+BOOTSTRAP_CONFIDENCE_LEVEL = float(os.environ.get('BOOTSTRAP_CONFIDENCE_LEVEL', 0.9))
+# Seed of the resampling, which is fixed so that repeated requests get the same intervals and the same entity tags.
+BOOTSTRAP_SEED = 0
+
+
+def resample(values: np.ndarray, samples: int = BOOTSTRAP_SAMPLES, seed: int = BOOTSTRAP_SEED) -> np.ndarray:
+    """
+    Draws the values of every series with replacement, as many times as the series has values.
+
+    All series are resampled together with one matrix of random positions, so that no loop over the samples is needed.
+
+    Args:
+        values: Values with one series per row. Missing values are NaN and are never drawn.
+        samples: Number of resampled series per series.
+        seed: Seed of the random positions.
+
+    Returns:
+        Resampled values with shape (series, samples, values). Series with fewer values are padded with NaN.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    missing = np.isnan(values)
+    counts = np.sum(~missing, axis=-1)
+    # Moves the missing values of every series behind its values.
+    compacted = np.take_along_axis(values, np.argsort(missing, axis=-1, kind='stable'), axis=-1)
+
+    uniform = np.random.default_rng(seed).random((samples, values.shape[-1]))
+    positions = (uniform * counts[:, np.newaxis, np.newaxis]).astype(np.int64)
+    resampled = np.take_along_axis(compacted[:, np.newaxis, :], positions, axis=-1)
+    return np.where(np.arange(values.shape[-1]) < counts[:, np.newaxis, np.newaxis], resampled, np.nan)
+
+
+def get_confidence_intervals(
+        samples: np.ndarray,
+        confidence_level: float = BOOTSTRAP_CONFIDENCE_LEVEL
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Computes the percentile intervals of bootstrapped statistics.
+
+    Args:
+        samples: Statistic of every resampled series along the last axis. Samples without a statistic are NaN.
+        confidence_level: Share of the samples between the bounds.
+
+    Returns:
+        Lower and upper bound per series, NaN for series without samples.
+    """
+    tail = (1 - confidence_level) / 2 * 100
+    with warnings.catch_warnings():
+        # Series without samples are NaN.
+        warnings.simplefilter('ignore', RuntimeWarning)
+        lower, upper = np.nanpercentile(samples, [tail, 100 - tail], axis=-1)
+    return lower, upper
@@ -0,0 +1,152 @@
+"""
+Builds the climatology store of a region for one calendar year.
+
+Example:
+    python -m src.build_climatology --latitudes 47 55 --longitudes 5 15 --year 2024
+"""
+import argparse
+import asyncio
+from datetime import datetime
+from typing import List, Tuple
+
+import numpy as np
+
+from src.climatology_store import ClimatologyStore, CLIMATOLOGY_STORE, DAYS_OF_YEAR, ARCHIVE_START_YEAR, \
+    get_month_and_day
+from src.definitions import WeatherModel, WeatherVariable, Coordinate, TimeFrame
+from src.extract_timeseries import stack_timeseries, get_historical_timeseries_stacked, calculate_cumulative_sums
+from src.fit_distribution import fit_distributions, WEATHER_VARIABLE_TO_DISTRIBUTION
+from src.grid import WEATHER_MODEL_RESOLUTION
+from src.weather_api_request import get_historical_data_for_variables, close_http_client
+import logging
+logger = logging.getLogger('uvicorn.error')
+
+# Number of grid cells whose archive series are held in memory at the same time.
+BUILD_CHUNK_SIZE = 64
+# Maximum number of grid cells fetched from the weather API at the same time.
+BUILD_MAX_CONCURRENT_FETCHES = 8
+
+
+def get_grid(value_range: Tuple[float, float], resolution: float) -> np.ndarray:
+    """Grid cell centres covering the range."""
+    start = round(value_range[0] / resolution)
+    stop = round(value_range[1] / resolution)
+    return np.round(np.arange(start, stop + 1) * resolution, 4)
+
+
+async def build_climatology_store(
+        climatology_store: ClimatologyStore,
+        weather_model: WeatherModel,
+        weather_variables: List[WeatherVariable],
+        latitude_range: Tuple[float, float],
+        longitude_range: Tuple[float, float],
+        year: int
+):
+    """
+    Precomputes the daily, weekly and monthly historical values and fitted distributions of every grid cell in the
+    region for every day of the year.
+
+    Args:
+        climatology_store: Store to write to.
+        weather_model: Reanalysis model of the historical data.
+        weather_variables: Weather variables to precompute.
+        latitude_range: Southernmost and northernmost latitude of the region.
+        longitude_range: Westernmost and easternmost longitude of the region.
+        year: Calendar year the store serves. The historical values end in the year before.
+    """
+    resolution = WEATHER_MODEL_RESOLUTION[weather_model]
+    latitudes = get_grid(latitude_range, resolution)
+    longitudes = get_grid(longitude_range, resolution)
+    end_date = datetime(year - 1, 12, 31)
+    start_date = np.datetime64(f'{ARCHIVE_START_YEAR}-01-01', 'D')
+    cells = [
+        Coordinate(timestamp=int(end_date.timestamp()), latitude=latitude, longitude=longitude)
+        for latitude in latitudes
+        for longitude in longitudes
+    ]
+    logger.info(f'Building climatology of {len(cells)} grid cells for {year}.')
+
+    stores = {
+        weather_variable: climatology_store.create(
+            weather_model=weather_model,
+            weather_variable=weather_variable,
+            latitudes=latitudes,
+            longitudes=longitudes,
+            year=year,
+            number_of_parameters=WEATHER_VARIABLE_TO_DISTRIBUTION[weather_variable].numargs + 2
+        )
+        for weather_variable in weather_variables
+    }
+
+    semaphore = asyncio.Semaphore(BUILD_MAX_CONCURRENT_FETCHES)
+
+    async def fetch(coordinate):
+        async with semaphore:
+            return await get_historical_data_for_variables(
+                coordinate=coordinate,
+                weather_variables=weather_variables,
+                weather_model=weather_model,
+                end_date=end_date
+            )
+
+    for chunk_start in range(0, len(cells), BUILD_CHUNK_SIZE):
+        chunk = slice(chunk_start, chunk_start + BUILD_CHUNK_SIZE)
+        historical_data = await asyncio.gather(*[fetch(coordinate) for coordinate in cells[chunk]])
+        logger.info(f'Precomputing grid cells {chunk_start} to {chunk_start + len(historical_data)}.')
+
+        for weather_variable, (_, arrays) in stores.items():
+            values = stack_timeseries(
+                [cell_data[weather_variable] for cell_data in historical_data],
+                start_date,
+                np.datetime64(end_date.date(), 'D')
+            )
+            cumulative_sums = calculate_cumulative_sums(values)
+            for day_of_year_index in range(DAYS_OF_YEAR):
+                month, day = get_month_and_day(day_of_year_index)
+                years, *time_frame_values = get_historical_timeseries_stacked(
+                    values, start_date, year, month, day, cumulative_sums=cumulative_sums
+                )
+                first_column = years[0] - ARCHIVE_START_YEAR
+                for time_frame, historical_values in zip(TimeFrame, time_frame_values):
+                    arrays[time_frame.value][chunk, day_of_year_index, first_column:] = historical_values
+                    arrays[f'{time_frame.value}_parameters'][chunk, day_of_year_index] = fit_distributions(
+                        weather_variable, historical_values
+                    )
+
+    for weather_variable, (metadata, arrays) in stores.items():
+        climatology_store.finalise(weather_model, weather_variable, metadata, arrays)
+    logger.info('Built climatology store.')
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latitudes', nargs=2, type=float, required=True, metavar=('SOUTH', 'NORTH'))
+    parser.add_argument('--longitudes', nargs=2, type=float, required=True, metavar=('WEST', 'EAST'))
+    parser.add_argument('--year', type=int, default=datetime.now().year)
+    parser.add_argument('--model', type=WeatherModel, default=WeatherModel.ERA5)
+    parser.add_argument(
+        '--variables',
+        nargs='+',
+        type=WeatherVariable,
+        default=list(WeatherVariable),
+        metavar='VARIABLE',
+        help=', '.join(weather_variable.value for weather_variable in WeatherVariable)
+    )
+    arguments = parser.parse_args()
+
+    try:
+        await build_climatology_store(
+            climatology_store=CLIMATOLOGY_STORE,
+            weather_model=arguments.model,
+            weather_variables=arguments.variables,
+            latitude_range=tuple(arguments.latitudes),
+            longitude_range=tuple(arguments.longitudes),
+            year=arguments.year
+        )
+    finally:
+        await close_http_client()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,300 @@
+import asyncio
+import os
+from datetime import datetime
+from typing import List, Tuple, Dict, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.calculate_statistics import calculate_cumulative_probabilities, calculate_return_periods, \
+    calculate_empirical_return_periods, calculate_last_occurrences, get_fit_key, run_statistics_task, \
+    WEATHER_VARIABLE_NAME_TO_VARIABLE
+from src.daily_series import DailySeries, as_daily_series
+from src.definitions import Coordinate, WeatherModel, WeatherVariable, WeatherVariableName, TimeFrame, \
+    ReturnPeriodMethod
+from src.extract_timeseries import stack_timeseries, get_historical_timeseries_stacked, calculate_trailing_means, \
+    WEEK_LENGTH, MONTH_LENGTH
+from src.fit_cache import FitKey
+from src.grid import snap_coordinate
+from src.metrics import time_stage
+from src.weather_api_request import get_forecast_and_historical_data_for_variables
+import logging
+logger = logging.getLogger('uvicorn.error')
+
+# Maximum number of locations fetched from the weather APIs at the same time.
+BATCH_MAX_CONCURRENT_FETCHES = int(os.environ.get('BATCH_MAX_CONCURRENT_FETCHES', 20))
+# Maximum number of locations whose daily archive series are stacked into one array, which bounds the memory use.
+BATCH_CHUNK_SIZE = int(os.environ.get('BATCH_CHUNK_SIZE', 128))
+
+TIME_FRAME_TO_WINDOW_LENGTH = {
+    TimeFrame.DAILY: 1,
+    TimeFrame.WEEKLY: WEEK_LENGTH,
+    TimeFrame.MONTHLY: MONTH_LENGTH
+}
+
+
+async def get_batch_climate_context_data(
+        coordinates: List[Coordinate],
+        weather_model: WeatherModel,
+        weather_variable_names: List[WeatherVariableName],
+        return_period_method: ReturnPeriodMethod = ReturnPeriodMethod.FIT
+) -> List[dict]:
+    """
+    Computes the climate context of many coordinates.
+
+    Coordinates in the same grid cell on the same day are fetched once, and the statistics of all locations with the
+    same day are computed together on stacked arrays.
+
+    Returns:
+        Climate context statistics per weather variable name for each coordinate, in the order of the coordinates.
+    """
+    weather_variables = [WEATHER_VARIABLE_NAME_TO_VARIABLE[name] for name in weather_variable_names]
+
+    keys = [get_batch_key(coordinate, weather_model) for coordinate in coordinates]
+    unique_coordinates = {}
+    for key, coordinate in zip(keys, coordinates):
+        unique_coordinates.setdefault(key, coordinate)
+    logger.info(f'Fetching weather data for {len(unique_coordinates)} of {len(coordinates)} batch coordinates.')
+
+    weather_data = dict(zip(
+        unique_coordinates.keys(),
+        await fetch_batch_weather_data(list(unique_coordinates.values()), weather_variables, weather_model)
+    ))
+
+    logger.info('Calculate batch climate context stats.')
+    keys_by_date = {}
+    for key in unique_coordinates:
+        keys_by_date.setdefault(key[1], []).append(key)
+
+    statistics = {key: {} for key in unique_coordinates}
+    for date, date_keys in keys_by_date.items():
+        for chunk_start in range(0, len(date_keys), BATCH_CHUNK_SIZE):
+            chunk_keys = date_keys[chunk_start:chunk_start + BATCH_CHUNK_SIZE]
+            chunks_statistics = await asyncio.gather(*[
+                calculate_stacked_statistics_in_pool(
+                    coordinates=[unique_coordinates[key] for key in chunk_keys],
+                    weather_model=weather_model,
+                    weather_data=[weather_data[key][weather_variable] for key in chunk_keys],
+                    weather_variable=weather_variable,
+                    weather_variable_name=weather_variable_name,
+                    return_period_method=return_period_method
+                )
+                for weather_variable, weather_variable_name in zip(weather_variables, weather_variable_names)
+            ])
+            for weather_variable_name, chunk_statistics in zip(weather_variable_names, chunks_statistics):
+                for key, key_statistics in zip(chunk_keys, chunk_statistics):
+                    statistics[key][weather_variable_name.value] = key_statistics
+
+    return [{**coordinate.dict(), **statistics[key]} for key, coordinate in zip(keys, coordinates)]
+
+
+async def fetch_batch_weather_data(
+        coordinates: List[Coordinate],
+        weather_variables: List[WeatherVariable],
+        weather_model: WeatherModel
+) -> List[Dict[WeatherVariable, Tuple[pd.DataFrame, pd.DataFrame]]]:
+    """Fetches the forecast and historical data of many coordinates, at most BATCH_MAX_CONCURRENT_FETCHES at a time."""
+    semaphore = asyncio.Semaphore(BATCH_MAX_CONCURRENT_FETCHES)
+
+    async def fetch(coordinate):
+        async with semaphore:
+            return await get_forecast_and_historical_data_for_variables(
+                coordinate=coordinate,
+                weather_variables=weather_variables,
+                weather_model=weather_model
+            )
+
+    return await asyncio.gather(*[fetch(coordinate) for coordinate in coordinates])
+
+
+def get_batch_key(coordinate: Coordinate, weather_model: WeatherModel) -> Tuple[Tuple[float, float], str]:
+    """Coordinates with the same key share their weather data and statistics."""
+    return snap_coordinate(coordinate, weather_model), datetime.fromtimestamp(coordinate.timestamp).strftime('%Y-%m-%d')
+
+
+class StackedStatistics(NamedTuple):
+    """Statistics of one time frame for many locations, with one entry per location."""
+    mean_values: np.ndarray
+    current_values: np.ndarray
+    return_periods: np.ndarray
+    last_occurrences: list
+
+
+def calculate_stacked_statistics(
+        coordinates: List[Coordinate],
+        weather_model: WeatherModel,
+        weather_data: List[Tuple[pd.DataFrame, DailySeries]],
+        weather_variable: WeatherVariable,
+        weather_variable_name: WeatherVariableName,
+        return_period_method: ReturnPeriodMethod = ReturnPeriodMethod.FIT,
+        fit_keys: Optional[Dict[TimeFrame, List[FitKey]]] = None
+) -> List[Dict[str, float]]:
+    """
+    Computes the daily, weekly and monthly climate context statistics of many locations on the same date.
+
+    Args:
+        coordinates: Locations, which all have the same date.
+        weather_model: Reanalysis model of the historical data.
+        weather_data: Forecast and historical data per location.
+        weather_variable: Weather variable of the data.
+        weather_variable_name: Name of the weather variable in the statistics keys.
+        return_period_method: Whether the return periods follow from fitted distributions or from the ranks of the
+            historical values.
+        fit_keys: Keys of the fitted distributions per time frame for each location. Computed from the historical
+            cache if not given.
+
+    Returns:
+        Mean, current value, return period and last occurrence per time frame for each location.
+    """
+    statistics = [{} for _ in weather_data]
+    stacked_statistics = calculate_stacked_statistics_arrays(
+        coordinates, weather_model, weather_data, weather_variable, return_period_method, fit_keys
+    )
+    for time_frame, time_frame_statistics in stacked_statistics.items():
+        for index, location_statistics in enumerate(statistics):
+            location_statistics.update({
+                f'{time_frame.value}_average_{weather_variable_name.value}':
+                    to_json_value(time_frame_statistics.mean_values[index]),
+                f'{time_frame.value}_current_{weather_variable_name.value}':
+                    to_json_value(time_frame_statistics.current_values[index]),
+                f'{time_frame.value}_return_period_{weather_variable_name.value}':
+                    to_json_value(time_frame_statistics.return_periods[index]),
+                f'{time_frame.value}_last_occurrence_{weather_variable_name.value}':
+                    time_frame_statistics.last_occurrences[index],
+            })
+
+    return statistics
+
+
+def calculate_stacked_statistics_arrays(
+        coordinates: List[Coordinate],
+        weather_model: WeatherModel,
+        weather_data: List[Tuple[pd.DataFrame, DailySeries]],
+        weather_variable: WeatherVariable,
+        return_period_method: ReturnPeriodMethod = ReturnPeriodMethod.FIT,
+        fit_keys: Optional[Dict[TimeFrame, List[FitKey]]] = None
+) -> Dict[TimeFrame, StackedStatistics]:
+    """
+    Computes the statistics of calculate_stacked_statistics as arrays, with one entry per location.
+
+    The historical values of all locations are stacked into arrays with shape (location, year), so that every time
+    frame is extracted, fitted and evaluated with one call for all locations.
+    """
+    date = datetime.fromtimestamp(coordinates[0].timestamp)
+    current_date = np.datetime64(date.date(), 'D')
+    historical_series = [as_daily_series(historical_data) for _, historical_data in weather_data]
+    if fit_keys is None:
+        fit_keys = get_stacked_fit_keys(coordinates, weather_model, weather_variable, historical_series)
+    start_date = min(series.start_date for series in historical_series)
+    end_date = max(series.end_date for series in historical_series)
+    with time_stage('extract'):
+        historical_values = stack_timeseries(
+            historical_series,
+            start_date,
+            end_date
+        )
+        forecast_values = stack_timeseries(
+            [forecast_data for forecast_data, _ in weather_data],
+            current_date - (MONTH_LENGTH - 1),
+            current_date
+        )
+        years, *historical_time_frames = get_historical_timeseries_stacked(
+            historical_values, start_date, date.year, date.month, date.day
+        )
+
+    statistics = {}
+    for time_frame, time_frame_values in zip(TimeFrame, historical_time_frames):
+        current_values = calculate_trailing_means(
+            forecast_values,
+            np.array([MONTH_LENGTH - 1]),
+            TIME_FRAME_TO_WINDOW_LENGTH[time_frame]
+        )[:, 0]
+        with np.errstate(invalid='ignore'):
+            mean_values = np.nanmean(time_frame_values, axis=1)
+        if ReturnPeriodMethod.EMPIRICAL == return_period_method:
+            return_periods = calculate_empirical_return_periods(time_frame_values, current_values, mean_values)
+        else:
+            cumulative_probabilities = calculate_cumulative_probabilities(
+                historical_values=time_frame_values,
+                current_values=current_values,
+                weather_variable=weather_variable,
+                fit_keys=fit_keys[time_frame]
+            )
+            return_periods = calculate_return_periods(cumulative_probabilities, current_values, mean_values)
+        statistics[time_frame] = StackedStatistics(
+            mean_values=mean_values,
+            current_values=current_values,
+            return_periods=return_periods,
+            last_occurrences=calculate_last_occurrences(time_frame_values, years, current_values, mean_values)
+        )
+
+    return statistics
+
+
+def get_stacked_fit_keys(
+        coordinates: List[Coordinate],
+        weather_model: WeatherModel,
+        weather_variable: WeatherVariable,
+        historical_series: List[DailySeries]
+) -> Dict[TimeFrame, List[FitKey]]:
+    """Computes the keys of the distributions fitted to the historical values of every time frame for each location."""
+    return {
+        time_frame: [
+            get_fit_key(coordinate, weather_model, weather_variable, time_frame, series)
+            for coordinate, series in zip(coordinates, historical_series)
+        ]
+        for time_frame in TimeFrame
+    }
+
+
+async def calculate_stacked_statistics_in_pool(
+        coordinates: List[Coordinate],
+        weather_model: WeatherModel,
+        weather_data: List[Tuple[pd.DataFrame, DailySeries]],
+        weather_variable: WeatherVariable,
+        weather_variable_name: WeatherVariableName,
+        return_period_method: ReturnPeriodMethod = ReturnPeriodMethod.FIT
+) -> List[Dict[str, float]]:
+    """Computes calculate_stacked_statistics in the statistics pool, so that the event loop is not blocked."""
+    weather_data = [
+        (forecast_data, as_daily_series(historical_data)) for forecast_data, historical_data in weather_data
+    ]
+    fit_keys = get_stacked_fit_keys(
+        coordinates, weather_model, weather_variable, [historical_data for _, historical_data in weather_data]
+    )
+    return await run_statistics_task(
+        calculate_stacked_statistics,
+        (
+            coordinates, weather_model, weather_data, weather_variable, weather_variable_name, return_period_method,
+            fit_keys
+        ),
+        [fit_key for time_frame_fit_keys in fit_keys.values() for fit_key in time_frame_fit_keys]
+    )
+
+
+async def calculate_stacked_statistics_arrays_in_pool(
+        coordinates: List[Coordinate],
+        weather_model: WeatherModel,
+        weather_data: List[Tuple[pd.DataFrame, DailySeries]],
+        weather_variable: WeatherVariable,
+        return_period_method: ReturnPeriodMethod = ReturnPeriodMethod.FIT
+) -> Dict[TimeFrame, StackedStatistics]:
+    """Computes calculate_stacked_statistics_arrays in the statistics pool, so that the event loop is not blocked."""
+    weather_data = [
+        (forecast_data, as_daily_series(historical_data)) for forecast_data, historical_data in weather_data
+    ]
+    fit_keys = get_stacked_fit_keys(
+        coordinates, weather_model, weather_variable, [historical_data for _, historical_data in weather_data]
+    )
+    return await run_statistics_task(
+        calculate_stacked_statistics_arrays,
+        (coordinates, weather_model, weather_data, weather_variable, return_period_method, fit_keys),
+        [fit_key for time_frame_fit_keys in fit_keys.values() for fit_key in time_frame_fit_keys]
+    )
+
+
+def to_json_value(value: float):
+    """Missing values are NaN, which is not valid JSON."""
+    if np.isnan(value):
+        return None
+    return float(value)
@@ -0,0 +1,230 @@
+import asyncio
+import os
+from datetime import datetime, date, time, timedelta
+from typing import List, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.calculate_batch_statistics import TIME_FRAME_TO_WINDOW_LENGTH, to_json_value
+from src.calculate_statistics import calculate_cumulative_probabilities, calculate_return_periods, \
+    calculate_empirical_return_periods, calculate_last_occurrences, get_fit_key, run_statistics_task, \
+    WEATHER_VARIABLE_NAME_TO_VARIABLE
+from src.daily_series import DailySeries, as_daily_series
+from src.definitions import Coordinate, WeatherModel, WeatherVariable, WeatherVariableName, TimeFrame, \
+    ReturnPeriodMethod
+from src.extract_timeseries import stack_timeseries, get_historical_timeseries_stacked, calculate_cumulative_sums, \
+    calculate_trailing_means, MONTH_LENGTH
+from src.fit_cache import FitKey
+from src.metrics import time_stage
+from src.weather_api_request import get_forecast_data_for_dates, get_historical_data_for_variables
+import logging
+logger = logging.getLogger('uvicorn.error')
+
+# Maximum number of days of a date range, which bounds the forecast request and the memory use.
+DATE_RANGE_MAX_DAYS = int(os.environ.get('DATE_RANGE_MAX_DAYS', 366))
+
+
+async def get_date_range_climate_context_data(
+        latitude: float,
+        longitude: float,
+        start_date: date,
+        end_date: date,
+        weather_model: WeatherModel,
+        weather_variable_names: List[WeatherVariableName],
+        return_period_method: ReturnPeriodMethod = ReturnPeriodMethod.FIT
+) -> List[dict]:
+    """
+    Computes the climate context of a location for every day from the start date up to the end date.
+
+    The forecast and the archive are fetched once for the whole range, and the statistics of all days are computed
+    together on arrays.
+
+    Returns:
+        Climate context statistics per weather variable name for each day, in the order of the days.
+    """
+    weather_variables = [WEATHER_VARIABLE_NAME_TO_VARIABLE[name] for name in weather_variable_names]
+    first_day = datetime.combine(start_date, time(12))
+    last_day = datetime.combine(end_date, time(12))
+    coordinate = Coordinate(timestamp=int(last_day.timestamp()), latitude=latitude, longitude=longitude)
+
+    forecast_data, historical_data = await asyncio.gather(
+        get_forecast_data_for_dates(
+            coordinate=coordinate,
+            weather_variables=weather_variables,
+            weather_model=weather_model,
+            start_date=first_day - timedelta(days=MONTH_LENGTH - 1),
+            end_date=last_day
+        ),
+        get_historical_data_for_variables(
+            coordinate=coordinate,
+            weather_variables=weather_variables,
+            weather_model=weather_model,
+            end_date=last_day - timedelta(days=360)
+        )
+    )
+
+    logger.info('Calculate date range climate context stats.')
+    days = np.arange(np.datetime64(start_date, 'D'), np.datetime64(end_date, 'D') + 1)
+    statistics = [{'date': str(day)} for day in days]
+    variables_statistics = await asyncio.gather(*[
+        calculate_date_range_statistics_in_pool(
+            coordinate=coordinate,
+            days=days,
+            weather_model=weather_model,
+            forecast_data=forecast_data[weather_variable],
+            historical_data=as_daily_series(historical_data[weather_variable]),
+            weather_variable=weather_variable,
+            weather_variable_name=weather_variable_name,
+            return_period_method=return_period_method
+        )
+        for weather_variable, weather_variable_name in zip(weather_variables, weather_variable_names)
+    ])
+    for weather_variable_name, variable_statistics in zip(weather_variable_names, variables_statistics):
+        for day_statistics, day_variable_statistics in zip(statistics, variable_statistics):
+            day_statistics[weather_variable_name.value] = day_variable_statistics
+    return statistics
+
+
+def calculate_date_range_statistics(
+        coordinate: Coordinate,
+        days: np.ndarray,
+        weather_model: WeatherModel,
+        forecast_data: pd.DataFrame,
+        historical_data: DailySeries,
+        weather_variable: WeatherVariable,
+        weather_variable_name: WeatherVariableName,
+        return_period_method: ReturnPeriodMethod = ReturnPeriodMethod.FIT,
+        fit_keys: Optional[Dict[TimeFrame, List[FitKey]]] = None
+) -> List[Dict[str, float]]:
+    """
+    Computes the daily, weekly and monthly climate context statistics of one location for many days.
+
+    The cumulative sums of the historical series are computed once and reused for every day. The historical values of
+    all days are placed on a common grid of years, so that the distributions are fitted and the return periods and last
+    occurrences are computed with one call per time frame.
+
+    Args:
+        coordinate: Location of the series.
+        days: Consecutive days as datetime64[D] array.
+        weather_model: Reanalysis model of the historical data.
+        forecast_data: Forecast data from a month before the first day up to the last day.
+        historical_data: Historical data up to 360 days before the last day.
+        weather_variable: Weather variable of the data.
+        weather_variable_name: Name of the weather variable in the statistics keys.
+        return_period_method: Whether the return periods follow from fitted distributions or from the ranks of the
+            historical values.
+        fit_keys: Keys of the fitted distributions per time frame for each day. Computed from the historical cache if
+            not given.
+
+    Returns:
+        Mean, current value, return period and last occurrence per time frame for each day.
+    """
+    historical_data = as_daily_series(historical_data)
+    if fit_keys is None:
+        fit_keys = get_date_range_fit_keys(coordinate, days, weather_model, weather_variable, historical_data)
+    with time_stage('extract'):
+        historical_start_date = historical_data.start_date
+        historical_values = stack_timeseries([historical_data], historical_start_date, historical_data.end_date)
+        cumulative_sums = calculate_cumulative_sums(historical_values)
+
+        dates = [day.astype(datetime) for day in days]
+        years = np.arange(historical_start_date.astype('datetime64[Y]').astype(np.int64) + 1970, dates[-1].year)
+        historical_time_frames = {
+            time_frame: np.full((len(days), len(years)), np.nan) for time_frame in TimeFrame
+        }
+        for row, day in enumerate(dates):
+            day_years, *day_time_frames = get_historical_timeseries_stacked(
+                historical_values, historical_start_date, day.year, day.month, day.day, cumulative_sums
+            )
+            columns = day_years - years[0]
+            for time_frame, time_frame_values in zip(TimeFrame, day_time_frames):
+                historical_time_frames[time_frame][row, columns] = time_frame_values[0]
+
+        forecast_start_date = days[0] - (MONTH_LENGTH - 1)
+        forecast_values = stack_timeseries([forecast_data], forecast_start_date, days[-1])
+        end_offsets = (days - forecast_start_date).astype(np.int64)
+
+    statistics = [{} for _ in dates]
+    for time_frame, time_frame_values in historical_time_frames.items():
+        current_values = calculate_trailing_means(
+            forecast_values,
+            end_offsets,
+            TIME_FRAME_TO_WINDOW_LENGTH[time_frame]
+        )[0]
+        with np.errstate(invalid='ignore'):
+            mean_values = np.nanmean(time_frame_values, axis=1)
+        if ReturnPeriodMethod.EMPIRICAL == return_period_method:
+            return_periods = calculate_empirical_return_periods(time_frame_values, current_values, mean_values)
+        else:
+            cumulative_probabilities = calculate_cumulative_probabilities(
+                historical_values=time_frame_values,
+                current_values=current_values,
+                weather_variable=weather_variable,
+                fit_keys=fit_keys[time_frame]
+            )
+            return_periods = calculate_return_periods(cumulative_probabilities, current_values, mean_values)
+        last_occurrences = calculate_last_occurrences(time_frame_values, years, current_values, mean_values)
+
+        for index, day_statistics in enumerate(statistics):
+            day_statistics.update({
+                f'{time_frame.value}_average_{weather_variable_name.value}': to_json_value(mean_values[index]),
+                f'{time_frame.value}_current_{weather_variable_name.value}': to_json_value(current_values[index]),
+                f'{time_frame.value}_return_period_{weather_variable_name.value}': to_json_value(return_periods[index]),
+                f'{time_frame.value}_last_occurrence_{weather_variable_name.value}': last_occurrences[index],
+            })
+
+    return statistics
+
+
+def get_date_range_fit_keys(
+        coordinate: Coordinate,
+        days: np.ndarray,
+        weather_model: WeatherModel,
+        weather_variable: WeatherVariable,
+        historical_data: DailySeries
+) -> Dict[TimeFrame, List[FitKey]]:
+    """Computes the keys of the distributions fitted to the historical values of every time frame for each day."""
+    dates = [day.astype(datetime) for day in days]
+    day_coordinates = [
+        Coordinate(
+            timestamp=int(datetime.combine(day, time(12)).timestamp()),
+            latitude=coordinate.latitude,
+            longitude=coordinate.longitude
+        )
+        for day in dates
+    ]
+    # The archive of each day ends 360 days before it, like for a request of the day alone, so that the fitted
+    # distributions are shared with those requests.
+    day_historical_data = [
+        historical_data.slice(end_date=day - timedelta(days=360)) for day in dates
+    ]
+    return {
+        time_frame: [
+            get_fit_key(day_coordinate, weather_model, weather_variable, time_frame, data)
+            for day_coordinate, data in zip(day_coordinates, day_historical_data)
+        ]
+        for time_frame in TimeFrame
+    }
+
+
+async def calculate_date_range_statistics_in_pool(
+        coordinate: Coordinate,
+        days: np.ndarray,
+        weather_model: WeatherModel,
+        forecast_data: pd.DataFrame,
+        historical_data: DailySeries,
+        weather_variable: WeatherVariable,
+        weather_variable_name: WeatherVariableName,
+        return_period_method: ReturnPeriodMethod = ReturnPeriodMethod.FIT
+) -> List[Dict[str, float]]:
+    """Computes calculate_date_range_statistics in the statistics pool, so that the event loop is not blocked."""
+    fit_keys = get_date_range_fit_keys(coordinate, days, weather_model, weather_variable, historical_data)
+    return await run_statistics_task(
+        calculate_date_range_statistics,
+        (
+            coordinate, days, weather_model, forecast_data, historical_data, weather_variable, weather_variable_name,
+            return_period_method, fit_keys
+        ),
+        [fit_key for time_frame_fit_keys in fit_keys.values() for fit_key in time_frame_fit_keys]
+    )
@@ -0,0 +1,124 @@
+import asyncio
+import os
+from datetime import datetime
+from typing import List
+
+import numpy as np
+import xarray as xr
+
+from src.calculate_batch_statistics import calculate_stacked_statistics_arrays_in_pool, fetch_batch_weather_data, \
+    BATCH_CHUNK_SIZE
+from src.calculate_statistics import WEATHER_VARIABLE_NAME_TO_VARIABLE
+from src.definitions import Coordinate, WeatherModel, WeatherVariableName, TimeFrame, ReturnPeriodMethod
+from src.grid import get_grid_cells_in_bounding_box
+import logging
+logger = logging.getLogger('uvicorn.error')
+
+# Maximum number of grid cells of a map, which bounds the number of archive requests of one map.
+MAP_MAX_CELLS = int(os.environ.get('MAP_MAX_CELLS', 400))
+
+
+class MapTooLargeException(Exception):
+    """Raised when a bounding box holds more grid cells than a map may have."""
+    pass
+
+
+async def get_map_data(
+        south: float,
+        north: float,
+        west: float,
+        east: float,
+        timestamp: int,
+        weather_model: WeatherModel,
+        weather_variable_names: List[WeatherVariableName],
+        return_period_method: ReturnPeriodMethod = ReturnPeriodMethod.FIT
+) -> xr.Dataset:
+    """
+    Computes the return periods and anomalies of every grid cell inside a bounding box on one day.
+
+    The statistics of all cells are computed together on arrays with shape (cell, year), like those of a batch.
+
+    Returns:
+        Dataset with latitude and longitude dimensions and, per time frame and weather variable name, the return period
+        in years and the anomaly of the current value from the historical mean. Cells without data are NaN.
+    """
+    latitudes, longitudes = get_grid_cells_in_bounding_box(south, north, west, east, weather_model)
+    number_of_cells = len(latitudes) * len(longitudes)
+    if number_of_cells > MAP_MAX_CELLS:
+        raise MapTooLargeException(
+            f'The bounding box holds {number_of_cells} grid cells, but a map may have at most {MAP_MAX_CELLS}.'
+        )
+
+    coordinates = [
+        Coordinate(timestamp=timestamp, latitude=latitude, longitude=longitude)
+        for latitude in latitudes for longitude in longitudes
+    ]
+    weather_variables = [WEATHER_VARIABLE_NAME_TO_VARIABLE[name] for name in weather_variable_names]
+    logger.info(f'Fetching weather data for {number_of_cells} map cells.')
+    weather_data = await fetch_batch_weather_data(coordinates, weather_variables, weather_model)
+
+    logger.info('Calculate map climate context stats.')
+    shape = (len(latitudes), len(longitudes))
+    data_variables = {}
+    for weather_variable, weather_variable_name in zip(weather_variables, weather_variable_names):
+        return_periods = {time_frame: np.full(number_of_cells, np.nan) for time_frame in TimeFrame}
+        anomalies = {time_frame: np.full(number_of_cells, np.nan) for time_frame in TimeFrame}
+        chunks = [
+            slice(chunk_start, chunk_start + BATCH_CHUNK_SIZE)
+            for chunk_start in range(0, number_of_cells, BATCH_CHUNK_SIZE)
+        ]
+        chunks_statistics = await asyncio.gather(*[
+            calculate_stacked_statistics_arrays_in_pool(
+                coordinates=coordinates[chunk],
+                weather_model=weather_model,
+                weather_data=[cell_weather_data[weather_variable] for cell_weather_data in weather_data[chunk]],
+                weather_variable=weather_variable,
+                return_period_method=return_period_method
+            )
+            for chunk in chunks
+        ])
+        for chunk, chunk_statistics in zip(chunks, chunks_statistics):
+            for time_frame, statistics in chunk_statistics.items():
+                return_periods[time_frame][chunk] = statistics.return_periods
+                anomalies[time_frame][chunk] = statistics.current_values - statistics.mean_values
+
+        for time_frame in TimeFrame:
+            data_variables[f'{time_frame.value}_return_period_{weather_variable_name.value}'] = xr.Variable(
+                ('latitude', 'longitude'), return_periods[time_frame].reshape(shape),
+                attrs={'units': 'years'}
+            )
+            data_variables[f'{time_frame.value}_anomaly_{weather_variable_name.value}'] = xr.Variable(
+                ('latitude', 'longitude'), anomalies[time_frame].reshape(shape)
+            )
+
+    return xr.Dataset(
+        data_vars=data_variables,
+        coords={'latitude': latitudes, 'longitude': longitudes},
+        attrs={
+            'date': datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d'),
+            'weather_model': weather_model.value,
+            'return_period_method': return_period_method.value
+        }
+    )
+
+
+def to_netcdf(dataset: xr.Dataset) -> bytes:
+    """
+    Serialises the map to a NetCDF3 file in memory, which needs no further dependency than scipy.
+
+    The variables are stored as 32-bit floats, which halves the size of the file.
+    """
+    return dataset.to_netcdf(encoding={name: {'dtype': 'float32'} for name in dataset.data_vars})
+
+
+def to_dense_arrays(dataset: xr.Dataset) -> dict:
+    """Serialises the map to JSON with one nested list per variable, which has one row per latitude."""
+    return {
+        **dataset.attrs,
+        'latitude': dataset['latitude'].values.tolist(),
+        'longitude': dataset['longitude'].values.tolist(),
+        'variables': {
+            name: np.where(np.isnan(variable.values), None, variable.values).tolist()
+            for name, variable in dataset.data_vars.items()
+        }
+    }
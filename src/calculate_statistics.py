@@ -1,29 +1,47 @@
+import asyncio
 from datetime import datetime, timedelta
+from typing import Optional, List, Dict, NamedTuple, Tuple, Callable, Any, TypeVar
 
 import numpy as np
 import pandas as pd
-from scipy.stats import norm, gamma
 
-from src.definitions import WeatherVariable, ReturnPeriodMode, TimeFrame
+from src.bootstrap import resample, get_confidence_intervals
+from src.climatology_store import CLIMATOLOGY_STORE
+from src.daily_series import DailySeries, as_daily_series
+from src.definitions import WeatherVariable, ReturnPeriodMode, TimeFrame, WeatherVariableName, Coordinate, WeatherModel, \
+    ReturnPeriodMethod
+from src.empirical_distribution import EmpiricalDistribution
 from src.extract_timeseries import get_historical_timeseries
-from src.weather_api_request import get_forecast_and_historical_data
+from src.fit_cache import FIT_CACHE, FitKey
+from src.fit_distribution import WEATHER_VARIABLE_TO_DISTRIBUTION, fit_distribution, fit_distributions, \
+    fit_distributions_approximately
+from src.historical_cache import HISTORICAL_CACHE
+from src.last_occurrence_index import LastOccurrenceIndex
+from src.metrics import time_stage, track_stage_durations, record_stage_duration
+from src.statistics_pool import run_in_statistics_pool, get_statistics_pool
+from src.weather_api_request import get_forecast_and_historical_data, get_forecast_and_historical_data_for_variables, \
+    get_forecast_data_for_variables
 import logging
 logger = logging.getLogger('uvicorn.error')
 
 # Small constant to avoid division by zero.
 EPSILON = 1e-6
 
+T = TypeVar('T')
 
-WEATHER_VARIABLE_TO_DISTRIBUTION = {
-    WeatherVariable.TEMPERATURE: norm,
-    WeatherVariable.PRECIPITATION: gamma
+
+WEATHER_VARIABLE_NAME_TO_VARIABLE = {
+    WeatherVariableName.TEMPERATURE: WeatherVariable.TEMPERATURE,
+    WeatherVariableName.PRECIPITATION: WeatherVariable.PRECIPITATION
 }
 
 
 def calculate_return_period(
         timeseries: pd.DataFrame,
         current_value: float,
-        mode: ReturnPeriodMode = ReturnPeriodMode.MAX
+        mode: ReturnPeriodMode = ReturnPeriodMode.MAX,
+        fit_key: Optional[FitKey] = None,
+        method: ReturnPeriodMethod = ReturnPeriodMethod.FIT
 ) -> float:
     """
     Computes the value of the return period for the current value of the weather variable.
@@ -33,14 +51,21 @@ def calculate_return_period(
         current_value: Daily temperature in °C.
         mode: Indicates whether extreme minima or maxima are investigated. For values higher than mean temperature
             choose ReturnPeriodMode.MAX, else choose ReturnPeriodMode.MIN.
+        fit_key: Key of the fitted distribution in the fit cache. Without a key, the distribution is always fitted.
+        method: Whether the return period follows from a fitted distribution or from the ranks of the historical
+            values, which needs no fit.
 
     Returns:
         Return period in years.
     """
+    if ReturnPeriodMethod.EMPIRICAL == method:
+        return float(EmpiricalDistribution(timeseries.iloc[:, 0].to_numpy()).return_periods(current_value, mode))
+
     cumulative_probability = calculate_cumulative_probability(
         timeseries=timeseries,
         current_value=current_value,
-        weather_variable=WeatherVariable(timeseries.columns[0])
+        weather_variable=WeatherVariable(timeseries.columns[0]),
+        fit_key=fit_key
     )
 
     if mode == ReturnPeriodMode.MAX:
@@ -54,12 +79,11 @@ def calculate_return_period(
 def calculate_cumulative_probability(
         timeseries: pd.DataFrame,
         current_value: float,
-        weather_variable: WeatherVariable
+        weather_variable: WeatherVariable,
+        fit_key: Optional[FitKey] = None
 ) -> float:
     probability_distribution = WEATHER_VARIABLE_TO_DISTRIBUTION[weather_variable]
 
-    pdf_parameters = probability_distribution.fit(timeseries)
-
     # Cumulative probability distribution doesn't fit well to a distribution, where many values are at the edge
     # of the distribution at 0.
     if WeatherVariable.PRECIPITATION == weather_variable and current_value == 0:
@@ -67,15 +91,163 @@ def calculate_cumulative_probability(
         # Use first element which should usually be 0. Otherwise, lowest element is taken as unique returns sorted.
         return counts[0] / len(timeseries)
 
+    pdf_parameters = FIT_CACHE.get(fit_key) if fit_key is not None else None
+    if pdf_parameters is None:
+        with time_stage('fit'):
+            pdf_parameters = fit_distribution(weather_variable, timeseries)
+        if fit_key is not None:
+            FIT_CACHE.put(fit_key, pdf_parameters)
+
     return probability_distribution.cdf(current_value, *pdf_parameters)
 
 
+def calculate_cumulative_probabilities(
+        historical_values: np.ndarray,
+        current_values: np.ndarray,
+        weather_variable: WeatherVariable,
+        fit_keys: Optional[List[FitKey]] = None
+) -> np.ndarray:
+    """
+    Computes the cumulative probabilities of many current values at once, like calculate_cumulative_probability.
+
+    Args:
+        historical_values: Historical values with one series per row. Missing values are NaN.
+        current_values: Current value per series.
+        weather_variable: Weather variable of the series.
+        fit_keys: Keys of the fitted distributions in the fit cache per series. Distributions which are not cached are
+            fitted together.
+
+    Returns:
+        Cumulative probability per series.
+    """
+    probability_distribution = WEATHER_VARIABLE_TO_DISTRIBUTION[weather_variable]
+
+    cached_parameters = [FIT_CACHE.get(fit_key) for fit_key in fit_keys] if fit_keys is not None \
+        else [None] * len(historical_values)
+    missing_rows = [row for row, parameters in enumerate(cached_parameters) if parameters is None]
+    pdf_parameters = np.empty((len(historical_values), probability_distribution.numargs + 2))
+    if missing_rows:
+        with time_stage('fit'):
+            pdf_parameters[missing_rows] = fit_distributions(weather_variable, historical_values[missing_rows])
+    for row, parameters in enumerate(cached_parameters):
+        if parameters is not None:
+            pdf_parameters[row] = parameters
+        elif fit_keys is not None:
+            FIT_CACHE.put(fit_keys[row], pdf_parameters[row])
+
+    return calculate_cumulative_probabilities_from_parameters(
+        historical_values, current_values, weather_variable, pdf_parameters
+    )
+
+
+def calculate_cumulative_probabilities_from_parameters(
+        historical_values: np.ndarray,
+        current_values: np.ndarray,
+        weather_variable: WeatherVariable,
+        pdf_parameters: np.ndarray
+) -> np.ndarray:
+    """
+    Computes the cumulative probabilities of many current values from already fitted distributions.
+
+    Args:
+        historical_values: Historical values with one series per row. Missing values are NaN.
+        current_values: Current value per series.
+        weather_variable: Weather variable of the series.
+        pdf_parameters: Parameters of the distribution fitted to each series with one series per row.
+
+    Returns:
+        Cumulative probability per series.
+    """
+    probability_distribution = WEATHER_VARIABLE_TO_DISTRIBUTION[weather_variable]
+    cumulative_probabilities = probability_distribution.cdf(current_values, *np.asarray(pdf_parameters).T)
+
+    # Cumulative probability distribution doesn't fit well to a distribution, where many values are at the edge
+    # of the distribution at 0.
+    if WeatherVariable.PRECIPITATION == weather_variable:
+        with np.errstate(invalid='ignore'):
+            lowest_values = np.nanmin(historical_values, axis=-1, keepdims=True)
+            lowest_shares = np.sum(historical_values == lowest_values, axis=-1) / \
+                np.sum(~np.isnan(historical_values), axis=-1)
+        cumulative_probabilities = np.where(current_values == 0, lowest_shares, cumulative_probabilities)
+
+    return cumulative_probabilities
+
+
+def get_fit_key(
+        coordinate: Coordinate,
+        weather_model: WeatherModel,
+        weather_variable: WeatherVariable,
+        time_frame: TimeFrame,
+        historical_data: DailySeries
+) -> FitKey:
+    """
+    Computes the key of the distribution fitted to the historical values of the time frame at the location.
+
+    Args:
+        coordinate: Requested location and time.
+        weather_model: Reanalysis model of the historical data.
+        weather_variable: Weather variable of the historical data.
+        time_frame: Time frame of the historical values.
+        historical_data: Daily historical data the historical values were extracted from.
+    """
+    # The grid cell whose archive series was served, which may be a cached neighbour of a coordinate on a boundary.
+    latitude, longitude = HISTORICAL_CACHE.find_cell(coordinate, weather_variable, weather_model)
+    return FitKey(
+        latitude=latitude,
+        longitude=longitude,
+        weather_model=weather_model,
+        weather_variable=weather_variable,
+        day_of_year=datetime.fromtimestamp(coordinate.timestamp).strftime('%m-%d'),
+        time_frame=time_frame,
+        archive_end_date=str(historical_data.end_date)
+    )
+
+
+def get_fit_keys(
+        coordinate: Coordinate,
+        weather_model: WeatherModel,
+        weather_variable: WeatherVariable,
+        historical_data: DailySeries
+) -> Dict[TimeFrame, FitKey]:
+    """Computes the keys of the distributions fitted to the historical values of every time frame."""
+    return {
+        time_frame: get_fit_key(coordinate, weather_model, weather_variable, time_frame, historical_data)
+        for time_frame in TimeFrame
+    }
+
+
 def calculate_mean_value_current_value_and_rp(
         historical_values,
         forecast_values,
         coordinate,
-        time_frame
+        time_frame,
+        fit_key=None,
+        return_period_method=ReturnPeriodMethod.FIT
 ):
+    current_value = calculate_current_value(forecast_values, coordinate, time_frame)
+
+    # calculate average temperature over the whole timeseries
+    mean_historical_value = float(historical_values.mean().values)
+
+    # calculate return period of actual temperature
+    if current_value > mean_historical_value:
+        return_period = calculate_return_period(
+            historical_values, current_value, mode=ReturnPeriodMode.MAX, fit_key=fit_key, method=return_period_method
+        )
+        last_occurrence = calculate_last_occurrence(historical_values, current_value, mode=ReturnPeriodMode.MAX)
+    elif current_value < mean_historical_value:
+        return_period = calculate_return_period(
+            historical_values, current_value, mode=ReturnPeriodMode.MIN, fit_key=fit_key, method=return_period_method
+        )
+        last_occurrence = calculate_last_occurrence(historical_values, current_value, mode=ReturnPeriodMode.MIN)
+    else:
+        return_period = 2  # if temperatures are the same cdf=0.5 which gives rp=2
+        last_occurrence = calculate_last_occurrence(historical_values, current_value, mode=ReturnPeriodMode.MAX)
+
+    return mean_historical_value, return_period, current_value, last_occurrence
+
+
+def calculate_current_value(forecast_values, coordinate, time_frame):
     # get date
     date = datetime.fromtimestamp(coordinate.timestamp)
     date_string = date.strftime('%Y-%m-%d')
@@ -94,51 +266,411 @@ def calculate_mean_value_current_value_and_rp(
     else:
         current_value = []
 
-    # calculate average temperature over the whole timeseries
-    mean_historical_value = float(historical_values.mean().values)
+    return current_value
 
-    # calculate return period of actual temperature
-    if current_value > mean_historical_value:
-        return_period = calculate_return_period(historical_values, current_value, mode=ReturnPeriodMode.MAX)
-        last_occurrence = calculate_last_occurrence(historical_values, current_value, mode=ReturnPeriodMode.MAX)
-    elif current_value < mean_historical_value:
-        return_period = calculate_return_period(historical_values, current_value, mode=ReturnPeriodMode.MIN)
-        last_occurrence = calculate_last_occurrence(historical_values, current_value, mode=ReturnPeriodMode.MIN)
-    else:
-        return_period = 2  # if temperatures are the same cdf=0.5 which gives rp=2
-        last_occurrence = calculate_last_occurrence(historical_values, current_value, mode=ReturnPeriodMode.MAX)
 
-    return mean_historical_value, return_period, current_value, last_occurrence
+def calculate_last_occurrence(historical_data, current_value, mode):
+    return LastOccurrenceIndex.from_data_frame(historical_data).query(current_value, mode)
 
 
-def calculate_last_occurrence(historical_data, current_value, mode):
-    if ReturnPeriodMode.MAX == mode:
-        if historical_data.iloc[:, 0].sort_index(ascending=False).ge(current_value).eq(False).all():
-            return 'Never'
-        return historical_data.iloc[:, 0].sort_index(ascending=False).ge(current_value).idxmax().item()
-    else:
-        if historical_data.iloc[:, 0].sort_index(ascending=False).le(current_value).eq(False).all():
-            return 'Never'
-        return historical_data.iloc[:, 0].sort_index(ascending=False).le(current_value).idxmax().item()
+def calculate_return_periods(
+        cumulative_probabilities: np.ndarray,
+        current_values: np.ndarray,
+        mean_values: np.ndarray
+) -> np.ndarray:
+    """
+    Computes the return periods of many current values at once.
+
+    Values above the historical mean are treated as maxima and values below it as minima, as in
+    calculate_mean_value_current_value_and_rp.
+
+    Returns:
+        Return periods in years.
+    """
+    return_periods = np.where(
+        current_values > mean_values,
+        1 / (1 - cumulative_probabilities + EPSILON),
+        1 / (cumulative_probabilities + EPSILON)
+    )
+    # If the values are the same cdf=0.5 which gives rp=2.
+    return np.where(current_values == mean_values, 2, return_periods)
+
+
+def calculate_empirical_return_periods(
+        historical_values: np.ndarray,
+        current_values: np.ndarray,
+        mean_values: np.ndarray
+) -> np.ndarray:
+    """
+    Computes the return periods of many current values at once from the ranks of the historical values, without
+    fitting distributions.
+
+    Args:
+        historical_values: Historical values with one series per row. Missing values are NaN.
+        current_values: Current value per series.
+        mean_values: Historical mean per series, which decides whether maxima or minima are investigated.
 
+    Returns:
+        Return periods in years.
+    """
+    modes = np.where(current_values < mean_values, ReturnPeriodMode.MIN, ReturnPeriodMode.MAX)
+    return_periods = EmpiricalDistribution(historical_values).return_periods(current_values, modes)
+    return np.where(current_values == mean_values, 2, return_periods)
+
+
+def calculate_return_period_intervals(
+        historical_values: np.ndarray,
+        current_values: np.ndarray,
+        mean_values: np.ndarray,
+        weather_variable: WeatherVariable,
+        return_period_method: ReturnPeriodMethod = ReturnPeriodMethod.FIT
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Computes bootstrap confidence intervals of the return periods of many current values at once.
+
+    Every historical series is resampled BOOTSTRAP_SAMPLES times and the return periods of all resampled series are
+    computed together, like those of stacked series. The resampled series are fitted without scipy, so inaccurate fits
+    are left out. Where the fit to the series itself is inaccurate, its return period follows from a scipy fit, which
+    the resampled fits do not bootstrap, and the bounds are NaN.
+
+    Args:
+        historical_values: Historical values with one series per row. Missing values are NaN.
+        current_values: Current value per series.
+        mean_values: Historical mean per series, which decides whether maxima or minima are investigated.
+        weather_variable: Weather variable of the series.
+        return_period_method: Whether the return periods follow from fitted distributions or from the ranks of the
+            historical values.
+
+    Returns:
+        Lower and upper bound of the return period in years per series.
+    """
+    resampled = resample(historical_values)
+    series, samples, years = resampled.shape
+    resampled = resampled.reshape(series * samples, years)
+    current_values = np.repeat(current_values, samples)
+    mean_values = np.repeat(mean_values, samples)
 
-def get_weather_variable_data(coordinate, weather_model, weather_variable, weather_variable_name):
-    forecast_data, historical_data = get_forecast_and_historical_data(
+    if ReturnPeriodMethod.EMPIRICAL == return_period_method:
+        return_periods = calculate_empirical_return_periods(resampled, current_values, mean_values)
+        return get_confidence_intervals(return_periods.reshape(series, samples))
+
+    with time_stage('fit'):
+        _, accurate = fit_distributions_approximately(weather_variable, historical_values)
+        pdf_parameters, _ = fit_distributions_approximately(weather_variable, resampled)
+    cumulative_probabilities = calculate_cumulative_probabilities_from_parameters(
+        resampled, current_values, weather_variable, pdf_parameters
+    )
+    return_periods = calculate_return_periods(cumulative_probabilities, current_values, mean_values)
+    return_periods = return_periods.reshape(series, samples)
+    return_periods[~accurate] = np.nan
+    return get_confidence_intervals(return_periods)
+
+
+def get_return_period_interval_statistics(
+        historical_values: Dict[TimeFrame, np.ndarray],
+        current_values: Dict[TimeFrame, float],
+        mean_values: Dict[TimeFrame, float],
+        weather_variable: WeatherVariable,
+        weather_variable_name: WeatherVariableName,
+        return_period_method: ReturnPeriodMethod
+) -> Dict[str, float]:
+    """
+    Computes the bootstrap confidence intervals of the return periods of every time frame with one bootstrap.
+
+    Returns:
+        Lower and upper bound of the return period per time frame.
+    """
+    time_frame_values = np.full((len(TimeFrame), max(len(values) for values in historical_values.values())), np.nan)
+    for row, time_frame in enumerate(TimeFrame):
+        time_frame_values[row, :len(historical_values[time_frame])] = historical_values[time_frame]
+
+    lower_bounds, upper_bounds = calculate_return_period_intervals(
+        time_frame_values,
+        np.array([current_values[time_frame] for time_frame in TimeFrame]),
+        np.array([mean_values[time_frame] for time_frame in TimeFrame]),
+        weather_variable,
+        return_period_method
+    )
+    statistics = {}
+    for time_frame, lower_bound, upper_bound in zip(TimeFrame, lower_bounds, upper_bounds):
+        statistics[f'{time_frame.value}_return_period_lower_{weather_variable_name.value}'] = float(lower_bound)
+        statistics[f'{time_frame.value}_return_period_upper_{weather_variable_name.value}'] = float(upper_bound)
+    return statistics
+
+
+def calculate_last_occurrences(
+        historical_values: np.ndarray,
+        years: np.ndarray,
+        current_values: np.ndarray,
+        mean_values: np.ndarray
+) -> list:
+    """
+    Computes the last year at or beyond the current value for many series at once.
+
+    Args:
+        historical_values: Historical values with one series per row and one year per column. NaN values never count.
+        years: Years of the columns.
+        current_values: Current value per series.
+        mean_values: Historical mean per series, which decides whether maxima or minima are investigated.
+
+    Returns:
+        Last year per series or 'Never'.
+    """
+    modes = np.where(current_values < mean_values, ReturnPeriodMode.MIN, ReturnPeriodMode.MAX)
+    return LastOccurrenceIndex(years, historical_values).query(current_values, modes)
+
+
+async def get_weather_variable_data(
+        coordinate,
+        weather_model,
+        weather_variable,
+        weather_variable_name,
+        return_period_method=ReturnPeriodMethod.FIT,
+        confidence_intervals=False
+):
+    climatology = CLIMATOLOGY_STORE.load(coordinate, weather_model, weather_variable)
+    if climatology is not None:
+        forecast_data = await get_forecast_data_for_variables(
+            coordinate=coordinate,
+            weather_variables=[weather_variable],
+            weather_model=weather_model
+        )
+        return calculate_weather_variable_statistics_from_climatology(
+            coordinate,
+            forecast_data[weather_variable],
+            climatology,
+            weather_variable,
+            weather_variable_name,
+            return_period_method,
+            confidence_intervals
+        )
+
+    forecast_data, historical_data = await get_forecast_and_historical_data(
         coordinate=coordinate,
         weather_variable=weather_variable,
         weather_model=weather_model
     )
+    return await calculate_weather_variable_statistics_in_pool(
+        coordinate,
+        weather_model,
+        forecast_data,
+        historical_data,
+        weather_variable_name,
+        return_period_method,
+        confidence_intervals
+    )
+
+
+async def get_climate_context_data(
+        coordinate,
+        weather_model,
+        weather_variable_names,
+        return_period_method=ReturnPeriodMethod.FIT,
+        confidence_intervals=False
+):
+    """
+    Computes the climate context of several weather variables from one forecast and one archive request.
+
+    Returns:
+        Climate context statistics per weather variable name.
+    """
+    weather_data = await get_forecast_and_historical_data_for_variables(
+        coordinate=coordinate,
+        weather_variables=[WEATHER_VARIABLE_NAME_TO_VARIABLE[name] for name in weather_variable_names],
+        weather_model=weather_model
+    )
+    statistics = await asyncio.gather(*[
+        calculate_weather_variable_statistics_in_pool(
+            coordinate,
+            weather_model,
+            *weather_data[WEATHER_VARIABLE_NAME_TO_VARIABLE[name]],
+            name,
+            return_period_method,
+            confidence_intervals
+        )
+        for name in weather_variable_names
+    ])
+    return {name.value: name_statistics for name, name_statistics in zip(weather_variable_names, statistics)}
+
+
+class StatisticsTask(NamedTuple):
+    """A statistics function and its arguments, which are cheap to send to another process, and the fits it needs."""
+    function: Callable
+    arguments: tuple
+    fit_keys: List[FitKey]
+    cached_pdf_parameters: Dict[FitKey, Tuple[float, ...]]
+
+
+class StatisticsTaskResult(NamedTuple):
+    statistics: Any
+    # Parameters of the distributions fitted by the task, which were not cached.
+    fitted_pdf_parameters: Dict[FitKey, Tuple[float, ...]]
+    stage_durations: Dict[str, float]
+
+
+def to_data_frame(dates: np.ndarray, values: np.ndarray, weather_variable: WeatherVariable) -> pd.DataFrame:
+    return pd.DataFrame(
+        data=values,
+        index=pd.DatetimeIndex(dates.astype('datetime64[ns]')),
+        columns=[weather_variable.value]
+    )
+
+
+def calculate_statistics_task(task: StatisticsTask) -> StatisticsTaskResult:
+    """
+    Computes the statistics of a task in a process of the statistics pool.
+
+    The cached parameters of the task are added to the fit cache of the process, and the parameters fitted by the task
+    are read back from it and returned to the event loop process. A fit cache of the process alone is cleared
+    afterwards, so that it does not duplicate the fit cache of the event loop process.
+    """
+    for fit_key, pdf_parameters in task.cached_pdf_parameters.items():
+        FIT_CACHE.put(fit_key, pdf_parameters)
+
+    with track_stage_durations() as stage_durations:
+        statistics = task.function(*task.arguments)
+
+    # Peeked, as the lookups of the task were already counted.
+    fitted_pdf_parameters = {
+        fit_key: FIT_CACHE.peek(fit_key)
+        for fit_key in set(task.fit_keys)
+        if fit_key not in task.cached_pdf_parameters
+    }
+    if not FIT_CACHE.shared:
+        FIT_CACHE.clear()
+    return StatisticsTaskResult(
+        statistics=statistics,
+        fitted_pdf_parameters={
+            fit_key: pdf_parameters for fit_key, pdf_parameters in fitted_pdf_parameters.items()
+            if pdf_parameters is not None
+        },
+        stage_durations=dict(stage_durations)
+    )
+
+
+async def run_statistics_task(function: Callable[..., T], arguments: tuple, fit_keys: List[FitKey]) -> T:
+    """
+    Computes statistics in the statistics pool, so that the fits do not block the event loop.
+
+    The fit cache stays in the event loop process: cached parameters are sent with the task and newly fitted
+    parameters are returned with its result.
+
+    Args:
+        function: Module-level statistics function, which looks its fits up in the fit cache.
+        arguments: Arguments of the function, which are pickled. Prefer arrays over data frames and objects.
+        fit_keys: Keys of all fits the function looks up, which are computed here, as they depend on the historical
+            cache of the event loop process.
+    """
+    if get_statistics_pool() is None:
+        # The task would clear the fit cache of the event loop process.
+        return function(*arguments)
+
+    cached_pdf_parameters = {fit_key: FIT_CACHE.get(fit_key) for fit_key in set(fit_keys)}
+    task = StatisticsTask(
+        function=function,
+        arguments=arguments,
+        fit_keys=fit_keys,
+        cached_pdf_parameters={
+            fit_key: pdf_parameters for fit_key, pdf_parameters in cached_pdf_parameters.items()
+            if pdf_parameters is not None
+        }
+    )
+
+    result = await run_in_statistics_pool(calculate_statistics_task, task)
+
+    for fit_key, pdf_parameters in result.fitted_pdf_parameters.items():
+        FIT_CACHE.put(fit_key, pdf_parameters)
+    for stage, duration in result.stage_durations.items():
+        record_stage_duration(stage, duration)
+    return result.statistics
 
+
+def calculate_weather_variable_statistics_from_arrays(
+        coordinate: Coordinate,
+        weather_model: WeatherModel,
+        forecast_dates: np.ndarray,
+        forecast_values: np.ndarray,
+        historical_data: DailySeries,
+        weather_variable_name: WeatherVariableName,
+        fit_keys: Dict[TimeFrame, FitKey],
+        return_period_method: ReturnPeriodMethod,
+        confidence_intervals: bool
+):
+    """Computes calculate_weather_variable_statistics from the forecast as arrays, which are cheaper to pickle."""
+    return calculate_weather_variable_statistics(
+        coordinate,
+        weather_model,
+        to_data_frame(forecast_dates, forecast_values, historical_data.weather_variable),
+        historical_data,
+        weather_variable_name,
+        fit_keys=fit_keys,
+        return_period_method=return_period_method,
+        confidence_intervals=confidence_intervals
+    )
+
+
+async def calculate_weather_variable_statistics_in_pool(
+        coordinate,
+        weather_model,
+        forecast_data,
+        historical_data,
+        weather_variable_name,
+        return_period_method=ReturnPeriodMethod.FIT,
+        confidence_intervals=False
+):
+    """Computes calculate_weather_variable_statistics in the statistics pool, so that the event loop is not blocked."""
+    if get_statistics_pool() is None:
+        return calculate_weather_variable_statistics(
+            coordinate, weather_model, forecast_data, historical_data, weather_variable_name,
+            return_period_method=return_period_method, confidence_intervals=confidence_intervals
+        )
+
+    historical_data = as_daily_series(historical_data)
+    fit_keys = get_fit_keys(coordinate, weather_model, historical_data.weather_variable, historical_data)
+    return await run_statistics_task(
+        calculate_weather_variable_statistics_from_arrays,
+        (
+            coordinate,
+            weather_model,
+            forecast_data.index.values.astype('datetime64[D]'),
+            forecast_data.iloc[:, 0].to_numpy(dtype=np.float64),
+            historical_data,
+            weather_variable_name,
+            fit_keys,
+            return_period_method,
+            confidence_intervals
+        ),
+        list(fit_keys.values())
+    )
+
+
+def calculate_weather_variable_statistics(
+        coordinate,
+        weather_model,
+        forecast_data,
+        historical_data,
+        weather_variable_name,
+        fit_keys: Optional[Dict[TimeFrame, FitKey]] = None,
+        return_period_method: ReturnPeriodMethod = ReturnPeriodMethod.FIT,
+        confidence_intervals: bool = False
+):
     logger.info('Calculate weather climate context stats.')
-    daily_historical_data, weekly_historical_data, monthly_historical_data = \
-        get_historical_timeseries(coordinate, historical_data)
+    historical_data = as_daily_series(historical_data)
+    weather_variable = historical_data.weather_variable
+    if fit_keys is None:
+        fit_keys = get_fit_keys(coordinate, weather_model, weather_variable, historical_data)
+    with time_stage('extract'):
+        daily_historical_data, weekly_historical_data, monthly_historical_data = \
+            get_historical_timeseries(coordinate, historical_data)
 
     daily_mean_value, daily_return_period, daily_current_value, daily_last_occurrence = \
         calculate_mean_value_current_value_and_rp(
             daily_historical_data,
             forecast_data,
             coordinate,
-            time_frame=TimeFrame.DAILY
+            time_frame=TimeFrame.DAILY,
+            fit_key=fit_keys[TimeFrame.DAILY],
+            return_period_method=return_period_method
         )
 
     weekly_mean_value, weekly_return_period, weekly_current_value, weekly_last_occurrence = \
@@ -146,7 +678,9 @@ def get_weather_variable_data(coordinate, weather_model, weather_variable, weath
             weekly_historical_data,
             forecast_data,
             coordinate,
-            time_frame=TimeFrame.WEEKLY
+            time_frame=TimeFrame.WEEKLY,
+            fit_key=fit_keys[TimeFrame.WEEKLY],
+            return_period_method=return_period_method
         )
 
     monthly_mean_value, monthly_return_period, monthly_current_value, monthly_last_occurrence = \
@@ -154,10 +688,12 @@ def get_weather_variable_data(coordinate, weather_model, weather_variable, weath
             monthly_historical_data,
             forecast_data,
             coordinate,
-            time_frame=TimeFrame.MONTHLY
+            time_frame=TimeFrame.MONTHLY,
+            fit_key=fit_keys[TimeFrame.MONTHLY],
+            return_period_method=return_period_method
         )
 
-    return {
+    statistics = {
         f'daily_average_{weather_variable_name.value}': daily_mean_value,
         f'daily_current_{weather_variable_name.value}': daily_current_value,
         f'daily_return_period_{weather_variable_name.value}': daily_return_period,
@@ -177,3 +713,92 @@ def get_weather_variable_data(coordinate, weather_model, weather_variable, weath
         'monthly_historical_index': list(monthly_historical_data.index),
         f'monthly_last_occurrence_{weather_variable_name.value}': monthly_last_occurrence,
     }
+    if confidence_intervals:
+        statistics.update(get_return_period_interval_statistics(
+            {
+                TimeFrame.DAILY: daily_historical_data.iloc[:, 0].to_numpy(dtype=np.float64),
+                TimeFrame.WEEKLY: weekly_historical_data.iloc[:, 0].to_numpy(dtype=np.float64),
+                TimeFrame.MONTHLY: monthly_historical_data.iloc[:, 0].to_numpy(dtype=np.float64),
+            },
+            {
+                TimeFrame.DAILY: daily_current_value,
+                TimeFrame.WEEKLY: weekly_current_value,
+                TimeFrame.MONTHLY: monthly_current_value,
+            },
+            {
+                TimeFrame.DAILY: daily_mean_value,
+                TimeFrame.WEEKLY: weekly_mean_value,
+                TimeFrame.MONTHLY: monthly_mean_value,
+            },
+            weather_variable,
+            weather_variable_name,
+            return_period_method
+        ))
+    return statistics
+
+
+def calculate_weather_variable_statistics_from_climatology(
+        coordinate,
+        forecast_data,
+        climatology,
+        weather_variable,
+        weather_variable_name,
+        return_period_method=ReturnPeriodMethod.FIT,
+        confidence_intervals=False
+):
+    """
+    Computes the same statistics as calculate_weather_variable_statistics from precomputed historical values and fitted
+    distributions, so that only the current values and their cumulative probabilities are computed per request.
+    """
+    logger.info('Calculate weather climate context stats from climatology.')
+    statistics = {}
+    time_frame_historical_values, current_values, mean_values = {}, {}, {}
+    for time_frame in TimeFrame:
+        historical_values = climatology.historical_values[time_frame]
+        years = climatology.years[time_frame]
+        if TimeFrame.DAILY == time_frame:
+            # Years without the day are missing from the daily values.
+            available = ~np.isnan(historical_values)
+            historical_values = historical_values[available]
+            years = years[available]
+
+        current_value = calculate_current_value(forecast_data, coordinate, time_frame)
+        # Skips missing values like the mean of the historical data frames.
+        mean_value = float(np.nanmean(historical_values))
+        if ReturnPeriodMethod.EMPIRICAL == return_period_method:
+            return_period = calculate_empirical_return_periods(
+                historical_values[np.newaxis], np.array([current_value]), mean_value
+            )[0]
+        else:
+            cumulative_probability = calculate_cumulative_probabilities_from_parameters(
+                historical_values[np.newaxis],
+                np.array([current_value]),
+                weather_variable,
+                climatology.pdf_parameters[time_frame][np.newaxis]
+            )
+            return_period = calculate_return_periods(cumulative_probability, np.array([current_value]), mean_value)[0]
+        mode = ReturnPeriodMode.MIN if current_value < mean_value else ReturnPeriodMode.MAX
+
+        statistics.update({
+            f'{time_frame.value}_average_{weather_variable_name.value}': mean_value,
+            f'{time_frame.value}_current_{weather_variable_name.value}': current_value,
+            f'{time_frame.value}_return_period_{weather_variable_name.value}': float(return_period),
+            f'{time_frame.value}_historical_{weather_variable_name.value}': historical_values.tolist(),
+            f'{time_frame.value}_historical_index': years.tolist(),
+            f'{time_frame.value}_last_occurrence_{weather_variable_name.value}':
+                LastOccurrenceIndex(years, historical_values).query(current_value, mode),
+        })
+        time_frame_historical_values[time_frame] = historical_values
+        current_values[time_frame] = current_value
+        mean_values[time_frame] = mean_value
+
+    if confidence_intervals:
+        statistics.update(get_return_period_interval_statistics(
+            time_frame_historical_values,
+            current_values,
+            mean_values,
+            weather_variable,
+            weather_variable_name,
+            return_period_method
+        ))
+    return statistics
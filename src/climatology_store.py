@@ -0,0 +1,190 @@
+import json
+import os
+from datetime import datetime, date
+from pathlib import Path
+from typing import Optional, Dict, NamedTuple, Tuple
+
+import numpy as np
+
+from src.definitions import WeatherVariable, WeatherModel, Coordinate, TimeFrame
+from src.extract_timeseries import get_historical_start_year
+from src.grid import snap_coordinate, WEATHER_MODEL_RESOLUTION
+from src.metrics import record_cache_lookup
+import logging
+logger = logging.getLogger('uvicorn.error')
+
+CLIMATOLOGY_STORE_DIRECTORY = os.environ.get('CLIMATOLOGY_STORE_DIRECTORY', 'cache/climatology')
+
+# Days of a leap year, so that the 29th of February has its own index.
+DAYS_OF_YEAR = 366
+# First year of the archive.
+ARCHIVE_START_YEAR = 1940
+
+
+def get_day_of_year_index(month: int, day: int) -> int:
+    return (date(2000, month, day) - date(2000, 1, 1)).days
+
+
+def get_month_and_day(day_of_year_index: int) -> Tuple[int, int]:
+    day_of_year = date.fromordinal(date(2000, 1, 1).toordinal() + day_of_year_index)
+    return day_of_year.month, day_of_year.day
+
+
+class ClimatologyCell(NamedTuple):
+    """Precomputed historical values and fitted distribution parameters of one grid cell on one day of the year."""
+    # The daily values start in the first year of the archive and the weekly and monthly values in
+    # get_historical_start_year, like in get_historical_timeseries.
+    years: Dict[TimeFrame, np.ndarray]
+    historical_values: Dict[TimeFrame, np.ndarray]
+    pdf_parameters: Dict[TimeFrame, np.ndarray]
+
+
+class ClimatologyStore:
+    """
+    Precomputed climatology of a fixed region, served from memory-mapped arrays.
+
+    For every weather model and weather variable, the store holds per time frame an array of the historical values
+    with shape (cell, day of year, year) and an array of the fitted distribution parameters with shape
+    (cell, day of year, parameter). The cells are ordered by latitude and then longitude. The store is built with
+    src.build_climatology for one calendar year and serves only requests in that year.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self._opened = {}
+
+    def path(self, weather_model: WeatherModel, weather_variable: WeatherVariable) -> Path:
+        return self.directory / weather_model.value / weather_variable.value
+
+    def open(self, weather_model: WeatherModel, weather_variable: WeatherVariable) -> Optional[Tuple[dict, dict]]:
+        """
+        Memory-maps the arrays of the weather model and weather variable.
+
+        Returns:
+            Metadata and arrays by name, or None if the store has not been built.
+        """
+        key = (weather_model, weather_variable)
+        if key not in self._opened:
+            path = self.path(weather_model, weather_variable)
+            # The metadata is written last, so the arrays are complete once it exists.
+            if not (path / 'metadata.json').exists():
+                return None
+            with open(path / 'metadata.json') as file:
+                metadata = json.load(file)
+            arrays = {
+                name: np.load(path / f'{name}.npy', mmap_mode='r')
+                for time_frame in TimeFrame
+                for name in [time_frame.value, f'{time_frame.value}_parameters']
+            }
+            self._opened[key] = metadata, arrays
+        return self._opened[key]
+
+    def load(
+            self,
+            coordinate: Coordinate,
+            weather_model: WeatherModel,
+            weather_variable: WeatherVariable
+    ) -> Optional[ClimatologyCell]:
+        """
+        Loads the climatology of the grid cell and day of the year of the coordinate.
+
+        Returns:
+            Climatology or None if the store does not cover the coordinate or its year.
+        """
+        opened = self.open(weather_model, weather_variable)
+        if opened is None:
+            record_cache_lookup('climatology', 'miss')
+            return None
+        metadata, arrays = opened
+
+        today = datetime.fromtimestamp(coordinate.timestamp)
+        if today.year != metadata['year']:
+            record_cache_lookup('climatology', 'miss')
+            return None
+
+        latitude, longitude = snap_coordinate(coordinate, weather_model)
+        row = round((latitude - metadata['latitudes'][0]) / metadata['resolution'])
+        column = round((longitude - metadata['longitudes'][0]) / metadata['resolution'])
+        if not (0 <= row < metadata['shape'][0] and 0 <= column < metadata['shape'][1]):
+            record_cache_lookup('climatology', 'miss')
+            return None
+        cell = row * metadata['shape'][1] + column
+
+        day_of_year_index = get_day_of_year_index(today.month, today.day)
+        first_years = {
+            time_frame: metadata['start_year'] if TimeFrame.DAILY == time_frame
+            else get_historical_start_year(today.month)
+            for time_frame in TimeFrame
+        }
+        record_cache_lookup('climatology', 'hit')
+        logger.info(f'Serving climatology of cell ({latitude}, {longitude}) from store.')
+        return ClimatologyCell(
+            years={time_frame: np.arange(first_year, today.year) for time_frame, first_year in first_years.items()},
+            historical_values={
+                time_frame: arrays[time_frame.value][cell, day_of_year_index, first_year - metadata['start_year']:]
+                for time_frame, first_year in first_years.items()
+            },
+            pdf_parameters={
+                time_frame: arrays[f'{time_frame.value}_parameters'][cell, day_of_year_index]
+                for time_frame in TimeFrame
+            }
+        )
+
+    def create(
+            self,
+            weather_model: WeatherModel,
+            weather_variable: WeatherVariable,
+            latitudes: np.ndarray,
+            longitudes: np.ndarray,
+            year: int,
+            number_of_parameters: int
+    ) -> Tuple[dict, dict]:
+        """
+        Creates writable memory-mapped arrays for the grid, filled with NaN.
+
+        Returns:
+            Metadata, which has to be passed to finalise once the arrays are written, and arrays by name.
+        """
+        path = self.path(weather_model, weather_variable)
+        path.mkdir(parents=True, exist_ok=True)
+        (path / 'metadata.json').unlink(missing_ok=True)
+        self._opened.pop((weather_model, weather_variable), None)
+
+        number_of_cells = len(latitudes) * len(longitudes)
+        number_of_years = year - ARCHIVE_START_YEAR
+        arrays = {}
+        for time_frame in TimeFrame:
+            arrays[time_frame.value] = np.lib.format.open_memmap(
+                path / f'{time_frame.value}.npy',
+                mode='w+',
+                dtype=np.float64,
+                shape=(number_of_cells, DAYS_OF_YEAR, number_of_years)
+            )
+            arrays[f'{time_frame.value}_parameters'] = np.lib.format.open_memmap(
+                path / f'{time_frame.value}_parameters.npy',
+                mode='w+',
+                dtype=np.float64,
+                shape=(number_of_cells, DAYS_OF_YEAR, number_of_parameters)
+            )
+        for array in arrays.values():
+            array[:] = np.nan
+
+        metadata = {
+            'year': year,
+            'start_year': ARCHIVE_START_YEAR,
+            'resolution': WEATHER_MODEL_RESOLUTION[weather_model],
+            'latitudes': [float(latitudes[0]), float(latitudes[-1])],
+            'longitudes': [float(longitudes[0]), float(longitudes[-1])],
+            'shape': [len(latitudes), len(longitudes)]
+        }
+        return metadata, arrays
+
+    def finalise(self, weather_model: WeatherModel, weather_variable: WeatherVariable, metadata: dict, arrays: dict):
+        """Flushes the arrays and writes the metadata, which makes the arrays visible to readers."""
+        for array in arrays.values():
+            array.flush()
+        with open(self.path(weather_model, weather_variable) / 'metadata.json', 'w') as file:
+            json.dump(metadata, file)
+
+
+CLIMATOLOGY_STORE = ClimatologyStore(CLIMATOLOGY_STORE_DIRECTORY)
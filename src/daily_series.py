@@ -0,0 +1,147 @@
+from typing import Union
+
+import numpy as np
+import pandas as pd
+
+from src.definitions import WeatherVariable
+
+# Decimals the values are rounded to when they are widened to float64. The weather APIs publish values with one
+# decimal, which float32 does not represent exactly, and rounding restores them, so that a historical value still
+# equals the same value of the forecast.
+DAILY_SERIES_DECIMALS = 4
+
+
+class DailySeries:
+    """
+    Compact daily series of a weather variable, e.g. of the historical archive of a location.
+
+    The series holds its first day and one float32 value per consecutive day, in which missing days are NaN. The date
+    of every value follows from its offset, so a series takes a quarter of the memory of a data frame with a
+    DatetimeIndex and float64 values, and dates are looked up without searching an index.
+
+    Attributes:
+        start_date: First day of the series.
+        values: Value per day from the first day on, NaN for missing days.
+        weather_variable: Weather variable of the values.
+    """
+    __slots__ = ('start_date', 'values', 'weather_variable')
+
+    def __init__(self, start_date: np.datetime64, values: np.ndarray, weather_variable: WeatherVariable):
+        self.start_date = np.datetime64(start_date, 'D')
+        self.values = np.asarray(values, dtype=np.float32)
+        self.weather_variable = weather_variable
+
+    @classmethod
+    def from_dates(cls, dates, values, weather_variable: WeatherVariable) -> 'DailySeries':
+        """
+        Places the values of the dates on consecutive days from the first to the last date.
+
+        Args:
+            dates: Dates of the values, e.g. strings in ISO format, which need not be consecutive.
+            values: Value per date. Missing values are None or NaN.
+            weather_variable: Weather variable of the values.
+        """
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        if not len(dates):
+            return cls(np.datetime64('NaT', 'D'), np.empty(0), weather_variable)
+        start_date = dates.min()
+        offsets = (dates - start_date).astype(np.int64)
+        grid = np.full(offsets.max() + 1, np.nan, dtype=np.float32)
+        grid[offsets] = np.asarray(values, dtype=np.float64)
+        return cls(start_date, grid, weather_variable)
+
+    @classmethod
+    def from_data_frame(cls, data_frame: pd.DataFrame) -> 'DailySeries':
+        """Converts a data frame with a DatetimeIndex and the values of a weather variable in its first column."""
+        return cls.from_dates(
+            data_frame.index.values,
+            data_frame.iloc[:, 0].to_numpy(dtype=np.float64),
+            WeatherVariable(data_frame.columns[0])
+        )
+
+    def __len__(self):
+        return len(self.values)
+
+    def __repr__(self):
+        return f'DailySeries({self.weather_variable.value}, {self.start_date} to {self.end_date})'
+
+    @property
+    def end_date(self) -> np.datetime64:
+        """Last day of the series."""
+        return self.start_date + (len(self.values) - 1)
+
+    @property
+    def mask(self) -> np.ndarray:
+        """Days without a value."""
+        return np.isnan(self.values)
+
+    def offset(self, date) -> int:
+        """Offset of the date from the first day of the series."""
+        return int((np.datetime64(date, 'D') - self.start_date).astype(np.int64))
+
+    def slice(self, start_date=None, end_date=None) -> 'DailySeries':
+        """Days from the start date up to and including the end date, as a view of the values."""
+        start = max(self.offset(start_date), 0) if start_date is not None else 0
+        end = max(self.offset(end_date) + 1, 0) if end_date is not None else len(self.values)
+        return DailySeries(self.start_date + start, self.values[start:end], self.weather_variable)
+
+    def window(self, start_date, end_date) -> np.ndarray:
+        """
+        Values widened to float64 from the start date up to and including the end date.
+
+        Days outside of the series are NaN, so that series with different days are placed on a common grid.
+        """
+        window = np.full(int((np.datetime64(end_date, 'D') - np.datetime64(start_date, 'D')).astype(np.int64)) + 1, np.nan)
+        if not len(self.values):
+            return window
+        start = self.offset(start_date)
+        first = max(-start, 0)
+        last = min(len(self.values) - start, len(window))
+        if first < last:
+            window[first:last] = widen(self.values[start + first:start + last])
+        return window
+
+    def to_float64(self) -> np.ndarray:
+        """All values widened to float64, to compute with."""
+        return widen(self.values)
+
+    def append(self, tail: 'DailySeries') -> 'DailySeries':
+        """
+        Extends the series with a tail, whose values replace those of the days both hold.
+
+        Days between the end of the series and the start of the tail are missing.
+        """
+        if not len(tail.values):
+            return self
+        if not len(self.values):
+            return tail
+        start_date = min(self.start_date, tail.start_date)
+        values = np.full(
+            int((max(self.end_date, tail.end_date) - start_date).astype(np.int64)) + 1, np.nan, dtype=np.float32
+        )
+        head_start = int((self.start_date - start_date).astype(np.int64))
+        values[head_start:head_start + len(self.values)] = self.values
+        tail_start = int((tail.start_date - start_date).astype(np.int64))
+        values[tail_start:tail_start + len(tail.values)] = tail.values
+        return DailySeries(start_date, values, self.weather_variable)
+
+    def to_data_frame(self) -> pd.DataFrame:
+        """Data frame with a DatetimeIndex of the days with values and the values in float64."""
+        valid = ~self.mask
+        dates = self.start_date + np.flatnonzero(valid)
+        return pd.DataFrame(
+            data=widen(self.values[valid]),
+            index=pd.DatetimeIndex(dates.astype('datetime64[ns]')),
+            columns=[self.weather_variable.value]
+        )
+
+
+def widen(values: np.ndarray) -> np.ndarray:
+    return np.round(values.astype(np.float64), DAILY_SERIES_DECIMALS)
+
+
+def as_daily_series(historical_data: Union[DailySeries, pd.DataFrame]) -> DailySeries:
+    """Converts a historical data frame to a daily series, and returns a daily series as it is."""
+    if isinstance(historical_data, DailySeries):
+        return historical_data
+    return DailySeries.from_data_frame(historical_data)
@@ -1,4 +1,5 @@
 from enum import Enum
+from typing import List
 
 from pydantic import BaseModel
 
@@ -8,6 +9,12 @@ class ReturnPeriodMode(Enum):
     MAX = 'max'
 
 
+class ReturnPeriodMethod(Enum):
+    """Whether return periods follow from a fitted distribution or from the ranks of the historical values."""
+    FIT = 'fit'
+    EMPIRICAL = 'empirical'
+
+
 class WeatherVariable(Enum):
     TEMPERATURE = 'temperature_2m_max'
     PRECIPITATION = 'precipitation_sum'
@@ -29,7 +36,24 @@ class WeatherModel(Enum):
     ERA5_LAND = 'era5_land'
 
 
+class MapFormat(Enum):
+    NETCDF = 'netcdf'
+    JSON = 'json'
+
+
+class ResponseFormat(Enum):
+    """Media types the statistics are served in, see src.response_format."""
+    JSON = 'application/json'
+    MSGPACK = 'application/msgpack'
+
+
 class Coordinate(BaseModel):
     timestamp: int
     latitude: float
     longitude: float
+
+
+class BatchRequest(BaseModel):
+    coordinates: List[Coordinate]
+    weather_variables: List[WeatherVariableName] = list(WeatherVariableName)
+    return_period_method: ReturnPeriodMethod = ReturnPeriodMethod.FIT
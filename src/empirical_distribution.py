@@ -0,0 +1,79 @@
+import numpy as np
+
+from src.definitions import ReturnPeriodMode
+
+
+class EmpiricalDistribution:
+    """
+    Ranks values within historical series, so that return periods follow from plotting positions without a fit.
+
+    The values of every series are sorted once. The sorted series are offset by a multiple of the range of all values
+    and concatenated, so that the ranks of one value per series are found with a single binary search. Values closer
+    than the precision of the keys, about 2e-16 times the range of the values times the number of series, count as
+    equal, which values rounded to DAILY_SERIES_DECIMALS never are. The distribution works on a single series or on many
+    series with one series per row, e.g. the years of several locations or days.
+    """
+
+    def __init__(self, values: np.ndarray):
+        """
+        Args:
+            values: Historical values with the years along the last axis. NaN values are not part of the series.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        self.single_series = values.ndim == 1
+        values = np.atleast_2d(values)
+        missing = np.isnan(values)
+        self.counts = np.sum(~missing, axis=-1)
+        self.length = values.shape[-1]
+
+        self.lowest = float(np.min(values[~missing])) if self.counts.any() else 0.0
+        # Every series occupies a range of keys of this width, in which missing values are sorted behind all values.
+        self.span = float(np.max(values[~missing])) - self.lowest + 1 if self.counts.any() else 1.0
+        self.offsets = np.arange(len(values)) * self.span
+        self.keys = (np.sort(np.where(missing, self.span - 0.5, values - self.lowest), axis=-1) +
+                     self.offsets[:, np.newaxis]).ravel()
+
+    def count(self, current_values, mode: ReturnPeriodMode) -> np.ndarray:
+        """
+        Counts the historical values at or above (ReturnPeriodMode.MAX) or at or below (ReturnPeriodMode.MIN) the values.
+
+        Args:
+            current_values: One value per series, or many values for a single series.
+            mode: Direction of the count.
+        """
+        current_values = np.asarray(current_values, dtype=np.float64)
+        rows = 0 if self.single_series else np.arange(len(self.offsets))
+        # Values beyond all historical values are clipped into the range of their series.
+        keys = np.clip(current_values - self.lowest, -0.25, self.span - 0.75) + self.offsets[rows]
+        starts = np.asarray(rows) * self.length
+        if ReturnPeriodMode.MAX == mode:
+            return self.counts[rows] - (np.searchsorted(self.keys, keys, side='left') - starts)
+        return np.searchsorted(self.keys, keys, side='right') - starts
+
+    def return_periods(self, current_values, modes) -> np.ndarray:
+        """
+        Computes the return periods of the values from the Weibull plotting position.
+
+        The current value is ranked among the historical values and itself, so that a value beyond all historical
+        values has a finite return period of two more than the number of historical years.
+
+        Args:
+            current_values: One value per series, or many values for a single series.
+            modes: A mode or one mode per value.
+
+        Returns:
+            Return periods in years, NaN for a NaN value or a series without values.
+        """
+        current_values = np.asarray(current_values, dtype=np.float64)
+        maxima = np.vectorize(lambda mode: ReturnPeriodMode.MAX == mode, otypes=[bool])(np.asarray(modes))
+        counts = np.where(
+            maxima,
+            self.count(current_values, ReturnPeriodMode.MAX),
+            self.count(current_values, ReturnPeriodMode.MIN)
+        )
+        series_counts = self.counts[0] if self.single_series else self.counts
+        return np.where(
+            np.isnan(current_values) | (series_counts == 0),
+            np.nan,
+            (series_counts + 2) / (counts + 1)
+        )
@@ -1,36 +1,196 @@
+from typing import List, Tuple, Optional, Union
+
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+from datetime import datetime
+
+from src.daily_series import DailySeries, as_daily_series
+
+# Number of days up to and including the current day that make up a week and a month.
+WEEK_LENGTH = 7
+MONTH_LENGTH = 31
 
 
 def get_historical_timeseries(coordinate, data_historical):
     date = datetime.fromtimestamp(coordinate.timestamp)
+    years = np.arange(get_historical_start_year(date.month), date.year)
 
-    # select week and months
-    weekly_data = []
-    monthly_data = []
+    # Every date maps to an offset of the contiguous daily series.
+    series = as_daily_series(data_historical)
+    values = series.to_float64()
 
-    if date.month != 1:
-        historical_start_year = 1940
-    else:
-        historical_start_year = 1941
+    end_offsets = (get_end_dates(years, date.month, date.day) - series.start_date).astype(np.int64)
+    cumulative_sums = calculate_cumulative_sums(values)
+    weekly_data = calculate_trailing_means_from_sums(cumulative_sums, end_offsets, WEEK_LENGTH)
+    monthly_data = calculate_trailing_means_from_sums(cumulative_sums, end_offsets, MONTH_LENGTH)
 
-    for year in range(historical_start_year, date.year):
-        end_date = datetime(year=year, month=date.month, day=date.day)
-        week = pd.date_range(end_date - timedelta(days=6), end_date, freq='d')
-        weekly_data.append(float(data_historical.loc[week].mean().iloc[0]))
-        month = pd.date_range(end_date - timedelta(days=30), end_date, freq='d')
-        monthly_data.append(float(data_historical.loc[month].mean().iloc[0]))
+    # The daily values of every year of the series which has the current day and a value on it.
+    daily_years = np.arange(series.start_date.astype('datetime64[Y]').astype(np.int64) + 1970, date.year)
+    daily_dates = get_end_dates(daily_years, date.month, date.day)
+    daily_values = take_days(values, (daily_dates - series.start_date).astype(np.int64))
+    days = (daily_dates - daily_dates.astype('datetime64[M]').astype('datetime64[D]')).astype(np.int64) + 1
+    valid = ~np.isnan(daily_values) & (days == date.day)
 
-    daily_data = data_historical[(data_historical.index.month == date.month) & (data_historical.index.day == date.day)]
-    daily_data.index = daily_data.index.year
+    column = series.weather_variable.value
+    daily_data = pd.DataFrame(data={column: daily_values[valid]}, index=daily_years[valid].astype(np.int32))
     weekly_data = pd.DataFrame(
-        data={daily_data.columns[0]: weekly_data},
-        index=np.arange(historical_start_year, date.year)
+        data={column: weekly_data},
+        index=years
     )
     monthly_data = pd.DataFrame(
-        data={daily_data.columns[0]: monthly_data},
-        index=np.arange(historical_start_year, date.year)
+        data={column: monthly_data},
+        index=years
     )
 
     return daily_data, weekly_data, monthly_data
+
+
+def get_historical_timeseries_stacked(
+        values: np.ndarray,
+        start_date: np.datetime64,
+        year: int,
+        month: int,
+        day: int,
+        cumulative_sums: Optional[Tuple[np.ndarray, np.ndarray]] = None
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Extracts the daily, weekly and monthly historical values of many series at once.
+
+    Args:
+        values: Daily historical values with one series per row, e.g. from stack_timeseries.
+        start_date: Date of the first column of the values.
+        year: Current year. The historical values end in the year before.
+        month: Current month.
+        day: Current day of the month.
+        cumulative_sums: Result of calculate_cumulative_sums of the values, if it is reused for several days.
+
+    Returns:
+        Years from the year of the start date and the daily, weekly and monthly values with one series per row and one
+        year per column. Years in which the current day does not exist, or without values, are NaN, as are the weekly
+        and monthly values of years before get_historical_start_year, like in get_historical_timeseries.
+    """
+    years = np.arange(start_date.astype('datetime64[Y]').astype(np.int64) + 1970, year)
+    end_dates = get_end_dates(years, month, day)
+    end_offsets = (end_dates - start_date).astype(np.int64)
+
+    if cumulative_sums is None:
+        cumulative_sums = calculate_cumulative_sums(values)
+
+    daily_data = take_days(values, end_offsets)
+    days = (end_dates - end_dates.astype('datetime64[M]').astype('datetime64[D]')).astype(np.int64) + 1
+    daily_data[..., days != day] = np.nan
+    weekly_data = calculate_trailing_means_from_sums(cumulative_sums, end_offsets, WEEK_LENGTH)
+    monthly_data = calculate_trailing_means_from_sums(cumulative_sums, end_offsets, MONTH_LENGTH)
+    weekly_data[..., years < get_historical_start_year(month)] = np.nan
+    monthly_data[..., years < get_historical_start_year(month)] = np.nan
+
+    return years, daily_data, weekly_data, monthly_data
+
+
+def get_historical_start_year(month: int) -> int:
+    # In January, the month before the current day starts before the archive does.
+    if month != 1:
+        return 1940
+    return 1941
+
+
+def stack_timeseries(
+        data_frames: List[Union[DailySeries, pd.DataFrame]],
+        start_date: np.datetime64,
+        end_date: np.datetime64
+) -> np.ndarray:
+    """
+    Places series on a common contiguous daily grid.
+
+    Args:
+        data_frames: Daily series, or series with a DatetimeIndex and the values in the first column.
+        start_date: First date of the grid.
+        end_date: Last date of the grid.
+
+    Returns:
+        Values with one series per row and one day per column. Days without values are NaN.
+    """
+    values = np.full((len(data_frames), int((end_date - start_date).astype(np.int64)) + 1), np.nan)
+    for row, data_frame in enumerate(data_frames):
+        if isinstance(data_frame, DailySeries):
+            values[row] = data_frame.window(start_date, end_date)
+            continue
+        offsets = (data_frame.index.values.astype('datetime64[D]') - start_date).astype(np.int64)
+        inside = (offsets >= 0) & (offsets < values.shape[1])
+        values[row, offsets[inside]] = data_frame.iloc[:, 0].to_numpy(dtype=np.float64)[inside]
+    return values
+
+
+def get_end_dates(years: np.ndarray, month: int, day: int) -> np.ndarray:
+    """
+    Computes the date with the given month and day in each of the years.
+
+    Args:
+        years: Years to compute the dates for.
+        month: Month of the dates.
+        day: Day of the month. Days beyond the end of the month, i.e. the 29th of February in years which are not leap
+            years, are moved to the last day of the month.
+
+    Returns:
+        Dates as datetime64[D] array.
+    """
+    months = (years - 1970).astype('datetime64[Y]').astype('datetime64[M]') + (month - 1)
+    last_days = (months + 1).astype('datetime64[D]') - 1
+    return np.minimum(months.astype('datetime64[D]') + (day - 1), last_days)
+
+
+def calculate_trailing_means(values: np.ndarray, end_offsets: np.ndarray, window_length: int) -> np.ndarray:
+    """
+    Computes the means over the window of days ending at each of the offsets from cumulative sums.
+
+    Args:
+        values: Daily values along the last axis. Missing values are NaN and are ignored.
+        end_offsets: Offsets of the last day of each window along the last axis.
+        window_length: Number of days in each window.
+
+    Returns:
+        Means with the offsets along the last axis. Windows without any values are NaN.
+    """
+    if window_length == 1:
+        return take_days(values, end_offsets)
+    return calculate_trailing_means_from_sums(calculate_cumulative_sums(values), end_offsets, window_length)
+
+
+def take_days(values: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """
+    Takes the values at the offsets along the last axis, which are NaN outside of the values.
+
+    Single days are taken from the values rather than from cumulative sums, which would round them, so that a current
+    value equal to a historical value still counts as an occurrence.
+    """
+    inside = (offsets >= 0) & (offsets < values.shape[-1])
+    days = np.full(values.shape[:-1] + offsets.shape, np.nan)
+    days[..., inside] = values[..., offsets[inside]]
+    return days
+
+
+def calculate_cumulative_sums(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Computes the cumulative sums and counts of the values along the last axis, ignoring missing values.
+
+    Both start with a zero, so that the sum of the values from offset i to offset j is sums[j + 1] - sums[i].
+    """
+    valid = ~np.isnan(values)
+    padding = np.zeros(values.shape[:-1] + (1,))
+    sums = np.concatenate([padding, np.cumsum(np.where(valid, values, 0), axis=-1)], axis=-1)
+    counts = np.concatenate([padding, np.cumsum(valid, axis=-1)], axis=-1)
+    return sums, counts
+
+
+def calculate_trailing_means_from_sums(
+        cumulative_sums: Tuple[np.ndarray, np.ndarray],
+        end_offsets: np.ndarray,
+        window_length: int
+) -> np.ndarray:
+    """Computes the trailing means like calculate_trailing_means from the result of calculate_cumulative_sums."""
+    sums, counts = cumulative_sums
+    number_of_days = sums.shape[-1] - 1
+    upper = np.clip(end_offsets + 1, 0, number_of_days)
+    lower = np.clip(end_offsets + 1 - window_length, 0, number_of_days)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (sums[..., upper] - sums[..., lower]) / (counts[..., upper] - counts[..., lower])
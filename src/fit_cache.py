@@ -0,0 +1,280 @@
+import fcntl
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from src.definitions import WeatherVariable, TimeFrame, WeatherModel
+from src.metrics import record_cache_lookup
+
+FIT_CACHE_MAX_SIZE = int(os.environ.get('FIT_CACHE_MAX_SIZE', 100000))
+# Memory-mapped file of the fit cache shared by all processes. Without it, every process has its own fit cache.
+FIT_CACHE_SHARED_PATH = os.environ.get('FIT_CACHE_SHARED_PATH')
+
+# Maximum number of parameters of a distribution and number of slots probed per key in the shared fit cache.
+MAXIMUM_PARAMETERS = 3
+SHARED_FIT_CACHE_PROBES = 8
+SHARED_FIT_CACHE_DTYPE = np.dtype([
+    ('key', np.uint64),
+    ('series', np.uint64),
+    ('archive_end_date', 'datetime64[D]'),
+    ('size', np.uint64),
+    ('parameters', np.float64, (MAXIMUM_PARAMETERS,)),
+    ('check', np.uint64)
+])
+
+
+class FitKey(NamedTuple):
+    """Identifies a fitted distribution, which stays the same until the archive of the location grows."""
+    latitude: float
+    longitude: float
+    # Models share some cell centres, e.g. (48.5, 11.0) of the 0.25° and the 0.1° grid, but not their series.
+    weather_model: WeatherModel
+    weather_variable: WeatherVariable
+    day_of_year: str
+    time_frame: TimeFrame
+    archive_end_date: str
+
+
+class FitCache:
+    """
+    Bounded cache of fitted distribution parameters with least recently used eviction.
+
+    Attributes:
+        hits: Number of lookups that found fitted parameters.
+        misses: Number of lookups that did not find fitted parameters.
+    """
+    shared = False
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: FitKey) -> Optional[Tuple[float, ...]]:
+        with self._lock:
+            parameters = self._entries.get(key)
+            if parameters is None:
+                self.misses += 1
+                record_cache_lookup('fit', 'miss')
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            record_cache_lookup('fit', 'hit')
+            return parameters
+
+    def peek(self, key: FitKey) -> Optional[Tuple[float, ...]]:
+        """Looks the parameters up without counting the lookup or marking them as recently used."""
+        with self._lock:
+            return self._entries.get(key)
+
+    def put(self, key: FitKey, parameters: Tuple[float, ...]):
+        with self._lock:
+            self._entries[key] = tuple(float(parameter) for parameter in parameters)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(
+            self,
+            latitude: float,
+            longitude: float,
+            weather_model: WeatherModel,
+            weather_variable: WeatherVariable,
+            archive_end_date: str
+    ):
+        """
+        Removes the parameters fitted to the archive series of a grid cell that ends on or after the date.
+
+        Args:
+            latitude: Latitude of the grid cell.
+            longitude: Longitude of the grid cell.
+            weather_model: Reanalysis model of the series.
+            weather_variable: Weather variable of the series.
+            archive_end_date: First day of the series whose value changed.
+        """
+        series = (latitude, longitude, weather_model, weather_variable)
+        with self._lock:
+            for key in [
+                key for key in self._entries
+                if (key.latitude, key.longitude, key.weather_model, key.weather_variable) == series
+                and key.archive_end_date >= archive_end_date
+            ]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+def hash_fit_key(key: FitKey) -> int:
+    """Hash of the key, which is the same in every process and never 0, which marks empty slots."""
+    return int.from_bytes(hashlib.blake2b(repr(key).encode(), digest_size=8).digest(), 'little') or 1
+
+
+def hash_series(
+        latitude: float,
+        longitude: float,
+        weather_model: WeatherModel,
+        weather_variable: WeatherVariable
+) -> int:
+    """Hash of the archive series of a grid cell, which is the same in every process."""
+    return int.from_bytes(
+        hashlib.blake2b(repr((latitude, longitude, weather_model, weather_variable)).encode(), digest_size=8).digest(),
+        'little'
+    )
+
+
+def get_check(key_hash: int, size: int, parameters: np.ndarray) -> int:
+    """Checksum of a slot, so that readers detect slots that are being written."""
+    digest = hashlib.blake2b(parameters.tobytes(), digest_size=8, key=key_hash.to_bytes(8, 'little'))
+    return int.from_bytes(digest.digest(), 'little') ^ size
+
+
+class SharedFitCache:
+    """
+    Fit cache in a memory-mapped file, which all worker processes of a server share.
+
+    The file holds a fixed number of slots, which form a hash table with linear probing. Writers lock the file, while
+    readers do not lock and instead verify the checksum of a slot, so that a slot that is being written reads as a
+    miss. When all probed slots are taken, the first probed slot is replaced.
+
+    Attributes:
+        hits: Number of lookups of this process that found fitted parameters.
+        misses: Number of lookups of this process that did not find fitted parameters.
+    """
+    shared = True
+
+    def __init__(self, path: str, max_size: int):
+        self.path = Path(path)
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._slots = None
+
+    def slots(self) -> np.memmap:
+        """Maps the file and creates it on first use."""
+        if self._slots is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.lock():
+                try:
+                    slots = np.load(self.path, mmap_mode='r+')
+                    if slots.dtype != SHARED_FIT_CACHE_DTYPE or slots.shape != (self.max_size,):
+                        raise ValueError(f'Shared fit cache {self.path} has a different layout.')
+                except (FileNotFoundError, ValueError):
+                    slots = np.lib.format.open_memmap(
+                        self.path, mode='w+', dtype=SHARED_FIT_CACHE_DTYPE, shape=(self.max_size,)
+                    )
+            self._slots = slots
+        return self._slots
+
+    def lock(self):
+        return FileLock(self.path.with_suffix('.lock'))
+
+    def __len__(self):
+        return int(np.count_nonzero(self.slots()['key']))
+
+    def get(self, key: FitKey) -> Optional[Tuple[float, ...]]:
+        parameters = self.peek(key)
+        if parameters is None:
+            self.misses += 1
+            record_cache_lookup('fit', 'miss')
+            return None
+        self.hits += 1
+        record_cache_lookup('fit', 'hit')
+        return parameters
+
+    def peek(self, key: FitKey) -> Optional[Tuple[float, ...]]:
+        """Looks the parameters up without counting the lookup."""
+        slots = self.slots()
+        key_hash = hash_fit_key(key)
+        for probe in range(SHARED_FIT_CACHE_PROBES):
+            slot = slots[(key_hash + probe) % self.max_size].copy()
+            if slot['key'] == 0:
+                break
+            if slot['key'] == key_hash and slot['check'] == get_check(key_hash, int(slot['size']), slot['parameters']):
+                return tuple(float(parameter) for parameter in slot['parameters'][:slot['size']])
+        return None
+
+    def put(self, key: FitKey, parameters: Tuple[float, ...]):
+        slots = self.slots()
+        key_hash = hash_fit_key(key)
+        padded_parameters = np.full(MAXIMUM_PARAMETERS, np.nan)
+        padded_parameters[:len(parameters)] = parameters
+        positions = [(key_hash + probe) % self.max_size for probe in range(SHARED_FIT_CACHE_PROBES)]
+        with self.lock():
+            position = next(
+                (position for position in positions if slots['key'][position] in (0, key_hash)),
+                positions[0]
+            )
+            # The checksum is written last, so that readers never accept a partially written slot.
+            slots['check'][position] = 0
+            slots['key'][position] = key_hash
+            slots['series'][position] = hash_series(
+                key.latitude, key.longitude, key.weather_model, key.weather_variable
+            )
+            slots['archive_end_date'][position] = np.datetime64(key.archive_end_date, 'D')
+            slots['size'][position] = len(parameters)
+            slots['parameters'][position] = padded_parameters
+            slots['check'][position] = get_check(key_hash, len(parameters), padded_parameters)
+
+    def invalidate(
+            self,
+            latitude: float,
+            longitude: float,
+            weather_model: WeatherModel,
+            weather_variable: WeatherVariable,
+            archive_end_date: str
+    ):
+        """
+        Removes the parameters fitted to the archive series of a grid cell that ends on or after the date.
+
+        The slots are emptied, so that keys probed past them read as misses until they are fitted again.
+        """
+        slots = self.slots()
+        with self.lock():
+            invalid = (
+                (slots['key'] != 0)
+                & (slots['series'] == hash_series(latitude, longitude, weather_model, weather_variable))
+                & (slots['archive_end_date'] >= np.datetime64(archive_end_date, 'D'))
+            )
+            slots['check'][invalid] = 0
+            slots['key'][invalid] = 0
+
+    def clear(self):
+        slots = self.slots()
+        with self.lock():
+            slots[:] = np.zeros(1, dtype=SHARED_FIT_CACHE_DTYPE)
+        self.hits = 0
+        self.misses = 0
+
+
+class FileLock:
+    """Exclusive lock of a file across processes."""
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    def __enter__(self):
+        self.file = open(self.path, 'a')
+        fcntl.flock(self.file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exception):
+        fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.file.close()
+
+
+FIT_CACHE = SharedFitCache(FIT_CACHE_SHARED_PATH, FIT_CACHE_MAX_SIZE) if FIT_CACHE_SHARED_PATH \
+    else FitCache(FIT_CACHE_MAX_SIZE)
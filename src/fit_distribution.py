@@ -0,0 +1,162 @@
+import warnings
+from typing import Tuple
+
+import numpy as np
+from scipy.special import gammaln
+from scipy.stats import norm, gamma
+
+from src.definitions import WeatherVariable
+
+WEATHER_VARIABLE_TO_DISTRIBUTION = {
+    WeatherVariable.TEMPERATURE: norm,
+    WeatherVariable.PRECIPITATION: gamma
+}
+
+# Minimum number of values a distribution is fitted to.
+MINIMUM_FIT_VALUES = 2
+# Candidate locations of the gamma distribution below the minimum of a series, relative to the range of the series.
+GAMMA_LOCATION_OFFSETS = np.geomspace(1e-4, 10, 48)
+# Number of candidate locations between the neighbours of the best candidate in the refinement step.
+GAMMA_LOCATION_REFINEMENTS = 16
+
+
+def fit_distribution(weather_variable: WeatherVariable, timeseries) -> Tuple[float, ...]:
+    """
+    Fits the distribution of the weather variable to a single series.
+
+    Args:
+        weather_variable: Weather variable, which determines the distribution.
+        timeseries: Values of the series.
+
+    Returns:
+        Parameters of the distribution in the order of scipy.stats.
+    """
+    values = np.asarray(timeseries, dtype=np.float64).reshape(1, -1)
+    return tuple(fit_distributions(weather_variable, values)[0])
+
+
+def fit_distributions(weather_variable: WeatherVariable, values: np.ndarray) -> np.ndarray:
+    """
+    Fits the distribution of the weather variable to many series at once.
+
+    The distribution is fitted with fit_distributions_approximately and series whose fast fit is inaccurate are
+    refitted with scipy.
+
+    Args:
+        weather_variable: Weather variable, which determines the distribution.
+        values: Values with one series per row. Missing values are NaN.
+
+    Returns:
+        Parameters of the distribution in the order of scipy.stats with one series per row. Series with fewer than
+        MINIMUM_FIT_VALUES values have NaN parameters.
+    """
+    parameters, accurate = fit_distributions_approximately(weather_variable, values)
+    for row in np.flatnonzero(~accurate):
+        series = values[row][~np.isnan(values[row])]
+        # Series without enough values to fit a distribution, e.g. the 29th of February in too few years, stay NaN.
+        if len(series) >= MINIMUM_FIT_VALUES:
+            parameters[row] = WEATHER_VARIABLE_TO_DISTRIBUTION[weather_variable].fit(series)
+    return parameters
+
+
+def fit_distributions_approximately(
+        weather_variable: WeatherVariable,
+        values: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fits the distribution of the weather variable to many series at once without scipy.
+
+    The normal distribution is fitted in closed form and the gamma distribution with fit_gamma, e.g. for the many
+    resampled series of a bootstrap, which are too many to refit.
+
+    Args:
+        weather_variable: Weather variable, which determines the distribution.
+        values: Values with one series per row. Missing values are NaN.
+
+    Returns:
+        Parameters of the distribution in the order of scipy.stats with one series per row and whether the fit is
+        accurate. Inaccurate fits have NaN parameters, as do series with fewer than MINIMUM_FIT_VALUES values.
+    """
+    if WEATHER_VARIABLE_TO_DISTRIBUTION[weather_variable] is norm:
+        parameters = fit_normal(values)
+        accurate = np.sum(~np.isnan(values), axis=-1) >= MINIMUM_FIT_VALUES
+    else:
+        parameters, accurate = fit_gamma(values)
+    parameters[~accurate] = np.nan
+    return parameters, accurate
+
+
+def fit_normal(values: np.ndarray) -> np.ndarray:
+    """Maximum likelihood estimate of the location and scale of the normal distribution per row."""
+    with warnings.catch_warnings():
+        # Rows without values are NaN.
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.stack([np.nanmean(values, axis=-1), np.nanstd(values, axis=-1)], axis=-1)
+
+
+def fit_gamma(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Approximate maximum likelihood estimate of the shape, location and scale of the gamma distribution per row.
+
+    For a given location, shape and scale follow from Thom's approximation. The location is chosen by maximising the
+    profile log-likelihood over candidates below the minimum of the series, first on a coarse grid and then between
+    the neighbours of the best candidate.
+
+    Args:
+        values: Values with one series per row. Missing values are NaN.
+
+    Returns:
+        Parameters with one series per row and whether the fit is accurate. Fits are inaccurate if the best location
+        lies at the edge of the candidates, where the likelihood is unbounded or flat, or if they are not finite.
+    """
+    with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings():
+        # Rows without values are NaN and are marked as inaccurate.
+        warnings.simplefilter('ignore', RuntimeWarning)
+        minimum = np.nanmin(values, axis=-1, keepdims=True)
+        value_range = np.nanmax(values, axis=-1, keepdims=True) - minimum
+        value_range = np.where(value_range > 0, value_range, 1)
+
+        offsets = np.broadcast_to(GAMMA_LOCATION_OFFSETS, values.shape[:-1] + GAMMA_LOCATION_OFFSETS.shape)
+        log_likelihood, parameters = evaluate_gamma_locations(values, minimum - offsets * value_range)
+        best = np.argmax(log_likelihood, axis=-1)
+        accurate = (best > 0) & (best < len(GAMMA_LOCATION_OFFSETS) - 1)
+
+        # Refine between the neighbouring candidates of the best one.
+        lower = GAMMA_LOCATION_OFFSETS[np.clip(best - 1, 0, None)]
+        upper = GAMMA_LOCATION_OFFSETS[np.clip(best + 1, None, len(GAMMA_LOCATION_OFFSETS) - 1)]
+        fractions = np.linspace(0, 1, GAMMA_LOCATION_REFINEMENTS)
+        offsets = np.exp(np.log(lower)[..., np.newaxis] * (1 - fractions) + np.log(upper)[..., np.newaxis] * fractions)
+        log_likelihood, parameters = evaluate_gamma_locations(values, minimum - offsets * value_range)
+        best = np.argmax(log_likelihood, axis=-1)
+
+    parameters = np.take_along_axis(parameters, best[..., np.newaxis, np.newaxis], axis=-2)[..., 0, :]
+    accurate &= np.isfinite(parameters).all(axis=-1)
+    return parameters, accurate
+
+
+def evaluate_gamma_locations(values: np.ndarray, locations: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fits shape and scale with Thom's approximation for each candidate location.
+
+    Args:
+        values: Values with one series per row. Missing values are NaN.
+        locations: Candidate locations with one series per row.
+
+    Returns:
+        Log-likelihood and parameters (shape, location, scale) per series and candidate location.
+    """
+    shifted = values[..., np.newaxis, :] - locations[..., np.newaxis]
+    log_shifted = np.log(shifted)
+    count = np.sum(~np.isnan(values), axis=-1)[..., np.newaxis]
+    mean = np.nanmean(shifted, axis=-1)
+    mean_log = np.nanmean(log_shifted, axis=-1)
+
+    statistic = np.log(mean) - mean_log
+    shape = (3 - statistic + np.sqrt((statistic - 3) ** 2 + 24 * statistic)) / (12 * statistic)
+    scale = mean / shape
+
+    log_likelihood = count * (
+        -gammaln(shape) - shape * np.log(scale) + (shape - 1) * mean_log - mean / scale
+    )
+    log_likelihood = np.where(np.isfinite(log_likelihood), log_likelihood, -np.inf)
+    return log_likelihood, np.stack([shape, locations, scale], axis=-1)
@@ -0,0 +1,134 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import Enum
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from src.metrics import record_cache_lookup
+
+FORECAST_CACHE_TTL_SECONDS = float(os.environ.get('FORECAST_CACHE_TTL_SECONDS', 3600))
+FORECAST_CACHE_MAX_SIZE = int(os.environ.get('FORECAST_CACHE_MAX_SIZE', 10000))
+
+
+class ForecastCacheStatus(Enum):
+    HIT = 'hit'
+    MISS = 'miss'
+    COALESCED = 'coalesced'
+
+
+# Freshness of the forecasts used while handling the current request, see track_forecast_freshness.
+forecast_freshness: ContextVar[Optional[List[Tuple[ForecastCacheStatus, float]]]] = \
+    ContextVar('forecast_freshness', default=None)
+
+
+class ForecastCache:
+    """
+    Forecast cache with a time to live and single-flight fetching.
+
+    Forecasts only change when the weather model updates, so they are served from memory until they are older than the
+    time to live. Concurrent lookups of a key that is not cached share one in-flight fetch instead of each fetching it.
+    """
+
+    def __init__(self, ttl_seconds: float, max_size: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._entries = OrderedDict()
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+
+    async def get_or_fetch(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Returns the fresh cached forecast of the key, joins the in-flight fetch of the key or fetches it.
+
+        Args:
+            key: Identifies the forecast.
+            fetch: Fetches the forecast on a miss.
+        """
+        entry = self._entries.get(key)
+        if entry is not None and time.time() - entry[0] < self.ttl_seconds:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            record_forecast_freshness(ForecastCacheStatus.HIT, entry[0])
+            return entry[1]
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self.coalesced += 1
+            status = ForecastCacheStatus.COALESCED
+        else:
+            self.misses += 1
+            status = ForecastCacheStatus.MISS
+            in_flight = asyncio.ensure_future(self._fetch(key, fetch))
+            self._in_flight[key] = in_flight
+            in_flight.add_done_callback(lambda task: self._finish_fetch(key, task))
+
+        # The fetch runs in its own task, so that a cancelled caller does not cancel it for the others.
+        fetched_at, forecast = await asyncio.shield(in_flight)
+        record_forecast_freshness(status, fetched_at)
+        return forecast
+
+    async def _fetch(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Tuple[float, Any]:
+        forecast = await fetch()
+        fetched_at = time.time()
+        self._entries[key] = fetched_at, forecast
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return fetched_at, forecast
+
+    def _finish_fetch(self, key: Hashable, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            # Callers receive the exception; the task itself does not need to be retrieved, e.g. if all were cancelled.
+            task.exception()
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+
+def record_forecast_freshness(status: ForecastCacheStatus, fetched_at: float):
+    record_cache_lookup('forecast', status.value)
+    freshness = forecast_freshness.get()
+    if freshness is not None:
+        freshness.append((status, fetched_at))
+
+
+@contextmanager
+def track_forecast_freshness():
+    """
+    Collects the freshness of all forecasts used within the context, including in tasks started within it.
+
+    Yields:
+        Cache status and fetch time of every forecast used.
+    """
+    freshness = []
+    token = forecast_freshness.set(freshness)
+    try:
+        yield freshness
+    finally:
+        forecast_freshness.reset(token)
+
+
+def get_forecast_freshness_headers(freshness: List[Tuple[ForecastCacheStatus, float]]) -> Dict[str, str]:
+    """
+    Response headers describing the forecasts used, with the age of the oldest forecast in seconds.
+    """
+    if not freshness:
+        return {}
+    statuses = {status for status, _ in freshness}
+    return {
+        'X-Forecast-Cache': statuses.pop().value if len(statuses) == 1 else 'mixed',
+        'X-Forecast-Age': str(int(time.time() - min(fetched_at for _, fetched_at in freshness)))
+    }
+
+
+FORECAST_CACHE = ForecastCache(FORECAST_CACHE_TTL_SECONDS, FORECAST_CACHE_MAX_SIZE)
@@ -0,0 +1,130 @@
+import os
+import threading
+from typing import Dict, NamedTuple, Optional, Set, Iterable, Tuple
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from src.definitions import WeatherModel, Coordinate
+
+# Approximate grid resolution of the reanalysis models in degrees.
+WEATHER_MODEL_RESOLUTION = {
+    WeatherModel.ERA5: 0.25,
+    WeatherModel.ERA5_LAND: 0.1
+}
+# Maximum distance in grid cells at which an already cached neighbouring cell is reused instead of the snapped cell.
+# Half a cell reuses neighbours only for coordinates on the boundary between cells, which belong to either cell.
+GRID_REUSE_DISTANCE_CELLS = float(os.environ.get('GRID_REUSE_DISTANCE_CELLS', 0.5))
+
+
+class GridCell(NamedTuple):
+    """Centre of a grid cell of a weather model."""
+    latitude: float
+    longitude: float
+
+
+def snap_coordinate(coordinate: Coordinate, weather_model: WeatherModel) -> GridCell:
+    """
+    Snaps a coordinate to the centre of the grid cell of the weather model it falls into.
+
+    Args:
+        coordinate: Requested location.
+        weather_model: Reanalysis model whose grid is used.
+
+    Returns:
+        Latitude and longitude of the grid cell, with the longitude in [-180, 180).
+    """
+    resolution = WEATHER_MODEL_RESOLUTION[weather_model]
+    latitude = min(max(coordinate.latitude, -90.0), 90.0)
+    longitude = (coordinate.longitude + 180.0) % 360.0 - 180.0
+    return GridCell(
+        latitude=round(round(latitude / resolution) * resolution, 4),
+        longitude=round((round(longitude / resolution) * resolution + 180.0) % 360.0 - 180.0, 4)
+    )
+
+
+def get_cell_coordinate(coordinate: Coordinate, grid_cell: GridCell) -> Coordinate:
+    """Moves the coordinate to the centre of the grid cell, so that requests for the same cell are identical."""
+    return Coordinate(timestamp=coordinate.timestamp, latitude=grid_cell.latitude, longitude=grid_cell.longitude)
+
+
+def get_grid_cells_in_bounding_box(
+        south: float,
+        north: float,
+        west: float,
+        east: float,
+        weather_model: WeatherModel
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Finds the grid cells of the weather model whose centres lie inside a bounding box.
+
+    Args:
+        south: Southernmost latitude of the box.
+        north: Northernmost latitude of the box.
+        west: Westernmost longitude of the box.
+        east: Easternmost longitude of the box, which is not smaller than the westernmost.
+        weather_model: Reanalysis model whose grid is used.
+
+    Returns:
+        Ascending latitudes and longitudes of the cell centres, whose combinations are the cells inside the box.
+    """
+    resolution = WEATHER_MODEL_RESOLUTION[weather_model]
+    latitudes = np.arange(np.ceil(max(south, -90.0) / resolution), np.floor(min(north, 90.0) / resolution) + 1)
+    longitudes = np.arange(np.ceil(west / resolution), np.floor(east / resolution) + 1)
+    return np.round(latitudes * resolution, 4), np.round(longitudes * resolution, 4)
+
+
+class GridIndex:
+    """
+    Spatial index of grid cells, e.g. of the cells held in a cache.
+
+    The cells are indexed with a KD-tree per weather model, which is rebuilt lazily after cells were added.
+    """
+
+    def __init__(self):
+        self._cells: Dict[WeatherModel, Set[GridCell]] = {}
+        self._trees: Dict[WeatherModel, Optional[cKDTree]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, weather_model: WeatherModel, grid_cells: Iterable[GridCell]):
+        with self._lock:
+            cells = self._cells.setdefault(weather_model, set())
+            size = len(cells)
+            cells.update(grid_cells)
+            if len(cells) != size:
+                self._trees[weather_model] = None
+
+    def __contains__(self, key) -> bool:
+        weather_model, grid_cell = key
+        return grid_cell in self._cells.get(weather_model, ())
+
+    def nearest(self, weather_model: WeatherModel, coordinate: Coordinate, max_distance: float) -> Optional[GridCell]:
+        """
+        Finds the indexed cell whose centre is nearest to the coordinate.
+
+        Args:
+            weather_model: Weather model of the cells.
+            coordinate: Location to search around.
+            max_distance: Maximum distance in degrees along latitude and longitude.
+
+        Returns:
+            Nearest indexed cell or None if no cell is within the distance.
+        """
+        with self._lock:
+            cells = self._cells.get(weather_model)
+            if not cells:
+                return None
+            tree = self._trees.get(weather_model)
+            if tree is None:
+                tree = self._trees[weather_model] = cKDTree(np.array(sorted(cells)))
+        point = (min(max(coordinate.latitude, -90.0), 90.0), (coordinate.longitude + 180.0) % 360.0 - 180.0)
+        # The maximum norm measures the distance along latitude and longitude like the grid cells do.
+        distance, position = tree.query(point, p=np.inf, distance_upper_bound=max_distance * (1 + 1e-9))
+        if not np.isfinite(distance):
+            return None
+        return GridCell(*(round(float(value), 4) for value in tree.data[position]))
+
+    def clear(self):
+        with self._lock:
+            self._cells.clear()
+            self._trees.clear()
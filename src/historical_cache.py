@@ -0,0 +1,221 @@
+import os
+import shutil
+from datetime import datetime, date, timedelta
+from pathlib import Path
+from typing import Optional, Dict, Tuple, NamedTuple
+
+import numpy as np
+
+from src.daily_series import DailySeries
+from src.definitions import WeatherVariable, WeatherModel, Coordinate
+from src.grid import GridCell, GridIndex, snap_coordinate, WEATHER_MODEL_RESOLUTION, GRID_REUSE_DISTANCE_CELLS
+from src.metrics import record_cache_lookup
+import logging
+logger = logging.getLogger('uvicorn.error')
+
+HISTORICAL_CACHE_DIRECTORY = os.environ.get('HISTORICAL_CACHE_DIRECTORY', 'cache/historical')
+
+
+class CachedSeries(NamedTuple):
+    """Historical series of a grid cell as held by the cache."""
+    grid_cell: GridCell
+    historical_data: DailySeries
+    end_date: date
+
+class HistoricalCache:
+    """
+    On-disk cache of the historical archive series.
+
+    Every series is stored once per weather model, weather variable and grid cell together with the end date it was
+    fetched up to. As the archive grows by one day per day, a series that ends too early is extended by appending the
+    missing tail rather than fetched again. The cached cells are kept in a spatial index, so that a
+    coordinate on the boundary between cells is served by whichever of the cells is already cached.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self._indices: Dict[Tuple[WeatherModel, WeatherVariable], GridIndex] = {}
+
+    def path(self, grid_cell: GridCell, weather_variable: WeatherVariable, weather_model: WeatherModel) -> Path:
+        latitude, longitude = grid_cell
+        return self.directory / weather_model.value / weather_variable.value / f'{latitude:.4f}_{longitude:.4f}.npz'
+
+    def index(self, weather_model: WeatherModel, weather_variable: WeatherVariable) -> GridIndex:
+        """Spatial index of the cached cells, read from the cache directory on first use."""
+        key = (weather_model, weather_variable)
+        if key not in self._indices:
+            index = GridIndex()
+            index.add(weather_model, [
+                GridCell(*map(float, path.stem.split('_')))
+                for path in (self.directory / weather_model.value / weather_variable.value).glob('*.npz')
+            ])
+            self._indices[key] = index
+        return self._indices[key]
+
+    def clear(self):
+        """Removes all cached series from the cache directory together with their spatial indices."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self._indices.clear()
+
+    def find_cell(
+            self,
+            coordinate: Coordinate,
+            weather_variable: WeatherVariable,
+            weather_model: WeatherModel
+    ) -> GridCell:
+        """
+        Finds the grid cell whose series serves the coordinate.
+
+        Returns:
+            The cell the coordinate snaps to, unless it is not cached and a cached cell is within
+            GRID_REUSE_DISTANCE_CELLS of the coordinate.
+        """
+        grid_cell = snap_coordinate(coordinate, weather_model)
+        index = self.index(weather_model, weather_variable)
+        if (weather_model, grid_cell) in index:
+            return grid_cell
+        reused_cell = index.nearest(
+            weather_model, coordinate, GRID_REUSE_DISTANCE_CELLS * WEATHER_MODEL_RESOLUTION[weather_model]
+        )
+        return reused_cell or grid_cell
+
+    def read(
+            self,
+            coordinate: Coordinate,
+            weather_variable: WeatherVariable,
+            weather_model: WeatherModel
+    ) -> Optional[CachedSeries]:
+        """
+        Reads the whole cached historical series that serves the coordinate, whatever end date it was fetched up to.
+
+        Returns:
+            Cached series or None if no series is cached for the coordinate.
+        """
+        grid_cell = self.find_cell(coordinate, weather_variable, weather_model)
+        path = self.path(grid_cell, weather_variable, weather_model)
+        if not path.exists():
+            return None
+
+        with np.load(path) as cached:
+            if 'start_date' in cached:
+                historical_data = DailySeries(cached['start_date'], cached['values'], weather_variable)
+            else:
+                # Series cached before daily series were introduced hold the date of every value.
+                historical_data = DailySeries.from_dates(cached['time'], cached['values'], weather_variable)
+            cached_end_date = cached['end_date']
+
+        return CachedSeries(grid_cell, historical_data, cached_end_date.item())
+
+    def load(
+            self,
+            coordinate: Coordinate,
+            weather_variable: WeatherVariable,
+            weather_model: WeatherModel,
+            end_date: datetime
+    ) -> Optional[DailySeries]:
+        """
+        Loads the cached historical series up to the end date.
+
+        Returns:
+            Historical series or None if the cache does not hold the series up to the end date.
+        """
+        return self.serve(self.read(coordinate, weather_variable, weather_model), weather_model, end_date)
+
+    def serve(
+            self,
+            cached: Optional[CachedSeries],
+            weather_model: WeatherModel,
+            end_date: datetime
+    ) -> Optional[DailySeries]:
+        """
+        Serves a series returned by read up to the end date, so that a series that is stale is read only once.
+
+        Returns:
+            Historical series or None if the series is not cached or does not reach the end date.
+        """
+        if cached is None:
+            record_cache_lookup('historical', 'miss')
+            return None
+        if cached.end_date < end_date.date():
+            record_cache_lookup('historical', 'stale')
+            return None
+
+        weather_variable = cached.historical_data.weather_variable
+        record_cache_lookup('historical', 'hit')
+        logger.info(f'Serving historical data from cache {self.path(cached.grid_cell, weather_variable, weather_model)}.')
+        return cached.historical_data.slice(end_date=end_date.date())
+
+    def append(
+            self,
+            cached: CachedSeries,
+            weather_variable: WeatherVariable,
+            weather_model: WeatherModel,
+            end_date: datetime,
+            tail: DailySeries,
+            tail_start_date: date
+    ) -> Tuple[DailySeries, Optional[date]]:
+        """
+        Appends the tail fetched from the start date up to the end date to a cached series.
+
+        The tail replaces the days it shares with the cached series, so that revised archive values are taken over.
+
+        Args:
+            cached: Cached series, as returned by read.
+            weather_variable: Weather variable of the series.
+            weather_model: Reanalysis model of the series.
+            end_date: Day the tail was fetched up to.
+            tail: Series fetched from the start date up to the end date.
+            tail_start_date: Day the tail was fetched from, which is at most the day after the cached end date.
+
+        Returns:
+            Extended series and the first cached day whose value was changed by the tail, or None if the tail only
+            added days.
+        """
+        # Days up to the cached end date that the tail changes, including days that only one of them holds.
+        cached_values = cached.historical_data.window(tail_start_date, cached.end_date)
+        tail_values = tail.window(tail_start_date, cached.end_date)
+        changed = (cached_values != tail_values) & ~(np.isnan(cached_values) & np.isnan(tail_values))
+        first_changed_date = (np.datetime64(tail_start_date, 'D') + int(np.argmax(changed))).item() if changed.any() \
+            else None
+
+        historical_data = cached.historical_data.slice(end_date=tail_start_date - timedelta(days=1)).append(tail)
+        self.write(cached.grid_cell, weather_variable, weather_model, end_date, historical_data)
+        return historical_data, first_changed_date
+
+    def store(
+            self,
+            coordinate: Coordinate,
+            weather_variable: WeatherVariable,
+            weather_model: WeatherModel,
+            end_date: datetime,
+            historical_data: DailySeries
+    ):
+        """Stores the historical series that was fetched up to the end date in the grid cell of the coordinate."""
+        self.write(snap_coordinate(coordinate, weather_model), weather_variable, weather_model, end_date, historical_data)
+
+    def write(
+            self,
+            grid_cell: GridCell,
+            weather_variable: WeatherVariable,
+            weather_model: WeatherModel,
+            end_date: datetime,
+            historical_data: DailySeries
+    ):
+        """Writes the historical series that was fetched up to the end date to the file of the grid cell."""
+        path = self.path(grid_cell, weather_variable, weather_model)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write to a temporary file first, so that concurrent readers never see a partially written series.
+        temporary_path = path.with_suffix(f'.{os.getpid()}.tmp')
+        with open(temporary_path, 'wb') as file:
+            np.savez(
+                file,
+                start_date=historical_data.start_date,
+                values=historical_data.values,
+                end_date=np.datetime64(end_date.date(), 'D')
+            )
+        os.replace(temporary_path, path)
+        self.index(weather_model, weather_variable).add(weather_model, [grid_cell])
+
+
+HISTORICAL_CACHE = HistoricalCache(HISTORICAL_CACHE_DIRECTORY)
@@ -0,0 +1,90 @@
+from typing import List, Union
+
+import numpy as np
+import pandas as pd
+
+from src.definitions import ReturnPeriodMode
+
+NEVER = 'Never'
+
+
+class LastOccurrenceIndex:
+    """
+    Answers when a series last reached a value, without sorting or scanning the series for every query.
+
+    The index holds the running maxima and minima of the series from the latest year backwards. Both are monotonic
+    over the years, so the last year at or beyond a value is found with a binary search. The index works on a single
+    series or on many series with one series per row, e.g. the years of several locations or days.
+    """
+
+    def __init__(self, years: np.ndarray, values: np.ndarray):
+        """
+        Args:
+            years: Ascending years of the values.
+            values: Values with the years along the last axis. NaN values never count as an occurrence.
+        """
+        self.years = np.asarray(years)
+        values = np.asarray(values, dtype=np.float64)
+        self.suffix_maxima = np.maximum.accumulate(
+            np.where(np.isnan(values), -np.inf, values)[..., ::-1], axis=-1
+        )[..., ::-1]
+        self.suffix_minima = np.minimum.accumulate(
+            np.where(np.isnan(values), np.inf, values)[..., ::-1], axis=-1
+        )[..., ::-1]
+
+    @classmethod
+    def from_data_frame(cls, historical_data: pd.DataFrame) -> 'LastOccurrenceIndex':
+        """Builds the index of a series with the years as index and the values in the first column."""
+        historical_data = historical_data.sort_index()
+        return cls(historical_data.index.to_numpy(), historical_data.iloc[:, 0].to_numpy(dtype=np.float64))
+
+    def query(self, current_values, modes) -> Union[int, str, List[Union[int, str]]]:
+        """
+        Finds the last year at or above (ReturnPeriodMode.MAX) or at or below (ReturnPeriodMode.MIN) the values.
+
+        Args:
+            current_values: A value, one value per series, or many values for a single series.
+            modes: A mode or one mode per value.
+
+        Returns:
+            Last year or 'Never' per value, or a single result for a single value.
+        """
+        current_values = np.asarray(current_values, dtype=np.float64)
+        modes = np.asarray(modes)
+        maxima = np.vectorize(lambda mode: ReturnPeriodMode.MAX == mode, otypes=[bool])(modes)
+        shape = np.broadcast_shapes(current_values.shape, maxima.shape, self.suffix_maxima.shape[:-1])
+        current_values = np.broadcast_to(current_values, shape)
+        maxima = np.broadcast_to(maxima, shape)
+
+        # Number of leading years whose running maximum (minimum) still reaches the value.
+        lower = np.zeros(shape, dtype=np.int64)
+        upper = np.full(shape, len(self.years), dtype=np.int64)
+        while np.any(lower < upper):
+            middle = (lower + upper) // 2
+            clipped = np.minimum(middle, len(self.years) - 1)
+            reached = np.where(
+                maxima,
+                take_years(self.suffix_maxima, clipped, shape) >= current_values,
+                take_years(self.suffix_minima, clipped, shape) <= current_values
+            )
+            active = lower < upper
+            lower = np.where(active & reached, middle + 1, lower)
+            upper = np.where(active & ~reached, middle, upper)
+
+        last_occurrences = [
+            int(self.years[count - 1]) if count > 0 else NEVER for count in lower.ravel()
+        ]
+        if shape == ():
+            return last_occurrences[0]
+        return last_occurrences
+
+
+def take_years(suffix_values: np.ndarray, positions: np.ndarray, shape) -> np.ndarray:
+    """Selects the year at the position for every query, broadcasting single series over all queries."""
+    if suffix_values.ndim == 1:
+        return suffix_values[positions]
+    return np.take_along_axis(
+        np.broadcast_to(suffix_values, shape + suffix_values.shape[-1:]),
+        positions[..., np.newaxis],
+        axis=-1
+    )[..., 0]
@@ -0,0 +1,114 @@
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from fastapi.responses import JSONResponse
+from prometheus_client import Counter, Histogram
+
+# Buckets of the durations in seconds, from a cached fit to a slow archive request.
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+STAGE_DURATION = Histogram(
+    'climate_context_stage_duration_seconds',
+    'Duration of the stages of handling a request.',
+    ['stage'],
+    buckets=DURATION_BUCKETS
+)
+REQUEST_DURATION = Histogram(
+    'climate_context_request_duration_seconds',
+    'Duration of handling a request.',
+    ['route'],
+    buckets=DURATION_BUCKETS
+)
+CACHE_LOOKUPS = Counter(
+    'climate_context_cache_lookups_total',
+    'Lookups of the caches by result.',
+    ['cache', 'result']
+)
+UPSTREAM_RESPONSES = Counter(
+    'climate_context_upstream_responses_total',
+    'Responses of the weather APIs by status code, or error if no response was received.',
+    ['api', 'status']
+)
+
+# Whether this process records the metrics. Processes of the statistics pool return the durations of their stages
+# instead, which the event loop process records, so that nothing is counted twice.
+metrics_enabled = True
+
+# Durations of the stages of the current request in seconds, see track_stage_durations.
+stage_durations: ContextVar[Optional[Dict[str, float]]] = ContextVar('stage_durations', default=None)
+
+
+@contextmanager
+def time_stage(stage: str):
+    """
+    Measures the duration of a stage, records it in the stage histogram and adds it to the durations of the request.
+
+    Args:
+        stage: Name of the stage, e.g. upstream, parse, extract, fit or serialize.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage_duration(stage, time.perf_counter() - start)
+
+
+def record_stage_duration(stage: str, duration_seconds: float):
+    if metrics_enabled:
+        STAGE_DURATION.labels(stage).observe(duration_seconds)
+    durations = stage_durations.get()
+    if durations is not None:
+        durations[stage] += duration_seconds
+
+
+def record_cache_lookup(cache: str, result: str):
+    if metrics_enabled:
+        CACHE_LOOKUPS.labels(cache, result).inc()
+
+
+def record_upstream_response(api: str, status: str):
+    if metrics_enabled:
+        UPSTREAM_RESPONSES.labels(api, status).inc()
+
+
+def disable_metrics():
+    """
+    Stops recording metrics in this process, e.g. in a process of the statistics pool.
+
+    Labelled metrics create their files in PROMETHEUS_MULTIPROC_DIR only when first recorded, so that the process adds
+    nothing to the metrics of the server.
+    """
+    global metrics_enabled
+    metrics_enabled = False
+
+
+@contextmanager
+def track_stage_durations():
+    """
+    Sums the durations of the stages within the context, including in tasks started within it.
+
+    Yields:
+        Duration in seconds per stage.
+    """
+    durations = defaultdict(float)
+    token = stage_durations.set(durations)
+    try:
+        yield durations
+    finally:
+        stage_durations.reset(token)
+
+
+def get_server_timing_header(durations: Dict[str, float]) -> str:
+    """Server-Timing header with the duration of every stage in milliseconds."""
+    return ', '.join(f'{stage};dur={duration * 1000:.1f}' for stage, duration in durations.items())
+
+
+class TimedJSONResponse(JSONResponse):
+    """JSON response which records rendering its body as the serialize stage."""
+
+    def render(self, content) -> bytes:
+        with time_stage('serialize'):
+            return super().render(content)
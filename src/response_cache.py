@@ -0,0 +1,181 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Hashable, NamedTuple, Optional
+
+from fastapi import Request, Response
+from pydantic import ValidationError
+
+from src.definitions import Coordinate, WeatherModel
+from src.forecast_cache import FORECAST_CACHE_TTL_SECONDS
+from src.grid import snap_coordinate
+from src.metrics import record_cache_lookup
+from src.response_format import get_response_format
+import logging
+logger = logging.getLogger('uvicorn.error')
+
+# Responses are cached at most as long as the forecasts they were calculated from.
+RESPONSE_CACHE_TTL_SECONDS = float(os.environ.get('RESPONSE_CACHE_TTL_SECONDS', FORECAST_CACHE_TTL_SECONDS))
+RESPONSE_CACHE_MAX_SIZE = int(os.environ.get('RESPONSE_CACHE_MAX_SIZE', 10000))
+
+# Weather model of the routes whose responses are determined by the grid cell, the date and the query.
+CACHED_ROUTES = {
+    '/temperature': WeatherModel.ERA5,
+    '/precipitation': WeatherModel.ERA5,
+    '/climate-context': WeatherModel.ERA5
+}
+# Headers of the original response that are served again from the cache.
+CACHED_HEADERS = ['content-type', 'vary', 'x-forecast-cache']
+
+
+class CachedResponse(NamedTuple):
+    created_at: float
+    expires_at: float
+    body: bytes
+    etag: str
+    headers: Dict[str, str]
+    forecast_age: Optional[int]
+
+
+def get_response_cache_key(request: Request) -> Optional[Hashable]:
+    """
+    Computes the key of a request whose response can be cached.
+
+    Returns:
+        Route, grid cell, date, remaining query parameters and the format the request accepts, or None if the response
+        is not cached.
+    """
+    weather_model = CACHED_ROUTES.get(request.url.path.rstrip('/'))
+    if request.method != 'GET' or weather_model is None:
+        return None
+    try:
+        coordinate = Coordinate(
+            timestamp=request.query_params['timestamp'],
+            latitude=request.query_params['latitude'],
+            longitude=request.query_params['longitude']
+        )
+    except (KeyError, ValidationError):
+        # Invalid requests are answered by the route.
+        return None
+    other_parameters = sorted(
+        (key, value) for key, value in request.query_params.multi_items()
+        if key not in ('timestamp', 'latitude', 'longitude')
+    )
+    return (
+        request.url.path.rstrip('/'),
+        snap_coordinate(coordinate, weather_model),
+        datetime.fromtimestamp(coordinate.timestamp).strftime('%Y-%m-%d'),
+        tuple(other_parameters),
+        get_response_format(request.headers.get('accept'))
+    )
+
+
+def get_etag(body: bytes) -> str:
+    """Strong entity tag of the serialized response."""
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def matches_etag(request: Request, etag: str) -> bool:
+    """Whether the entity tag satisfies the If-None-Match header, which uses the weak comparison."""
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is None:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(',')]
+    return '*' in candidates or etag in [candidate.removeprefix('W/') for candidate in candidates]
+
+
+class ResponseCache:
+    """
+    Cache of serialized responses with strong entity tags.
+
+    Responses are served from memory until they expire and conditional requests with a matching If-None-Match
+    header are answered with 304, without running the route.
+    """
+
+    def __init__(self, ttl_seconds: float, max_size: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at <= time.time():
+                self.misses += 1
+                record_cache_lookup('response', 'miss')
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            record_cache_lookup('response', 'hit')
+            return entry
+
+    def put(self, key: Hashable, entry: CachedResponse):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    async def respond(self, request: Request, call_next: Callable[[Request], Awaitable[Response]]) -> Response:
+        """
+        Answers the request from the cache or with the route, caching successful responses of cached routes.
+
+        Args:
+            request: Incoming request.
+            call_next: Calls the route.
+        """
+        key = get_response_cache_key(request)
+        if key is None:
+            return await call_next(request)
+
+        entry = self.get(key)
+        if entry is None:
+            response = await call_next(request)
+            if response.status_code != 200:
+                return response
+            body = b''.join([chunk async for chunk in response.body_iterator])
+            # The response expires with the forecast it was calculated from.
+            forecast_age = int(response.headers['x-forecast-age']) if 'x-forecast-age' in response.headers else None
+            created_at = time.time()
+            entry = CachedResponse(
+                created_at=created_at,
+                expires_at=created_at + self.ttl_seconds - (forecast_age or 0),
+                body=body,
+                etag=get_etag(body),
+                headers={name: response.headers[name] for name in CACHED_HEADERS if name in response.headers},
+                forecast_age=forecast_age
+            )
+            if entry.expires_at > created_at:
+                self.put(key, entry)
+            response_cache_status = 'miss'
+        else:
+            logger.info(f'Serving response from cache for {request.url.path}.')
+            response_cache_status = 'hit'
+
+        age = int(time.time() - entry.created_at)
+        headers = {
+            'ETag': entry.etag,
+            'Cache-Control': f'public, max-age={max(int(entry.expires_at - time.time()), 0)}',
+            'Age': str(age),
+            'X-Response-Cache': response_cache_status
+        }
+        if entry.forecast_age is not None:
+            headers['X-Forecast-Age'] = str(entry.forecast_age + age)
+        if matches_etag(request, entry.etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, status_code=200, headers={**entry.headers, **headers})
+
+
+RESPONSE_CACHE = ResponseCache(RESPONSE_CACHE_TTL_SECONDS, RESPONSE_CACHE_MAX_SIZE)
@@ -0,0 +1,142 @@
+import gzip
+import os
+from typing import Awaitable, Callable, Optional
+
+import brotli
+import msgpack
+import numpy as np
+import orjson
+from fastapi import Request, Response
+
+from src.definitions import ResponseFormat
+from src.metrics import time_stage
+
+# Bodies below this size in bytes are sent uncompressed, as compressing them saves less than it costs.
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+# Levels of the encodings, which trade the size of the body for the time to compress it on every response.
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', 5))
+
+# Content encodings in the order they are preferred at the same quality value.
+CONTENT_ENCODINGS = ['br', 'gzip']
+# Alternative media types of the formats that clients send in the Accept header.
+MEDIA_TYPE_ALIASES = {
+    'application/x-msgpack': ResponseFormat.MSGPACK,
+    'application/vnd.msgpack': ResponseFormat.MSGPACK,
+}
+
+
+def parse_quality_values(header: Optional[str]) -> dict:
+    """
+    Parses an Accept or Accept-Encoding header.
+
+    Returns:
+        Quality value per media type or content coding, in the order of the header.
+    """
+    quality_values = {}
+    for entry in (header or '').split(','):
+        value, *parameters = [part.strip() for part in entry.split(';')]
+        if not value:
+            continue
+        quality = 1.0
+        for parameter in parameters:
+            name, _, quality_value = parameter.partition('=')
+            if name.strip() == 'q':
+                try:
+                    quality = float(quality_value)
+                except ValueError:
+                    quality = 0.0
+        quality_values[value.lower()] = quality
+    return quality_values
+
+
+def get_response_format(accept: Optional[str]) -> ResponseFormat:
+    """
+    Negotiates the format of a response with the Accept header of its request.
+
+    Returns:
+        Format with the highest quality value, or JSON if the request accepts none of the formats in particular.
+    """
+    best_format, best_quality = ResponseFormat.JSON, 0.0
+    for media_type, quality in parse_quality_values(accept).items():
+        response_format = MEDIA_TYPE_ALIASES.get(media_type)
+        if response_format is None:
+            response_format = next(
+                (response_format for response_format in ResponseFormat if response_format.value == media_type), None
+            )
+        if response_format is not None and quality > best_quality:
+            best_format, best_quality = response_format, quality
+    return best_format
+
+
+def to_builtin(value):
+    """Converts NumPy values, which MessagePack does not know, to Python values."""
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    raise TypeError(f'Cannot serialise {type(value)}.')
+
+
+def serialise(content, response_format: ResponseFormat) -> bytes:
+    """Serialises the content of a response, in which missing values are None or NaN, e.g. to null in JSON."""
+    if ResponseFormat.MSGPACK == response_format:
+        return msgpack.packb(content, default=to_builtin)
+    return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
+
+def create_response(request: Request, content) -> Response:
+    """
+    Serialises the content in the format the request accepts.
+
+    The content is serialised directly, without converting it to JSON-compatible values first, which takes longer
+    than serialising the lists of historical values.
+    """
+    response_format = get_response_format(request.headers.get('accept'))
+    with time_stage('serialize'):
+        body = serialise(content, response_format)
+    return Response(content=body, media_type=response_format.value, headers={'Vary': 'Accept'})
+
+
+def get_content_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Negotiates the content encoding with the Accept-Encoding header, or returns None for an uncompressed body."""
+    quality_values = parse_quality_values(accept_encoding)
+    best_encoding, best_quality = None, 0.0
+    for encoding in CONTENT_ENCODINGS:
+        quality = quality_values.get(encoding, quality_values.get('*', 0.0))
+        if quality > best_quality:
+            best_encoding, best_quality = encoding, quality
+    return best_encoding
+
+
+def compress(body: bytes, content_encoding: str) -> bytes:
+    if 'br' == content_encoding:
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+async def compress_response(request: Request, call_next: Callable[[Request], Awaitable[Response]]) -> Response:
+    """
+    Compresses the body of the response with brotli or gzip, if the request accepts either.
+
+    Compressed responses carry a weak entity tag, as their bodies differ from the uncompressed body that the strong
+    entity tag was computed from.
+
+    Args:
+        request: Incoming request.
+        call_next: Calls the route.
+    """
+    response = await call_next(request)
+    content_encoding = get_content_encoding(request.headers.get('accept-encoding'))
+    if content_encoding is None or response.status_code != 200 or 'content-encoding' in response.headers:
+        return response
+
+    body = b''.join([chunk async for chunk in response.body_iterator])
+    headers = dict(response.headers)
+    headers['vary'] = ', '.join(filter(None, [headers.get('vary'), 'Accept-Encoding']))
+    if len(body) >= COMPRESSION_MIN_SIZE:
+        with time_stage('compress'):
+            body = compress(body, content_encoding)
+        headers['content-encoding'] = content_encoding
+        if 'etag' in headers and not headers['etag'].startswith('W/'):
+            headers['etag'] = f'W/{headers["etag"]}'
+    headers.pop('content-length', None)
+    return Response(content=body, status_code=response.status_code, headers=headers)
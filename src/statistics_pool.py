@@ -0,0 +1,64 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional, TypeVar
+
+from src.metrics import disable_metrics
+import logging
+logger = logging.getLogger('uvicorn.error')
+
+# Number of processes computing the statistics. With 0, the statistics are computed on the event loop.
+STATISTICS_POOL_WORKERS = int(os.environ.get('STATISTICS_POOL_WORKERS', os.cpu_count() or 1))
+
+# Pool shared by all requests, so that the fits of concurrent requests run in parallel beside the event loop.
+statistics_pool: Optional[ProcessPoolExecutor] = None
+
+T = TypeVar('T')
+
+
+def get_statistics_pool() -> Optional[ProcessPoolExecutor]:
+    """Returns the shared process pool and creates it on first use, or None if the pool is disabled."""
+    global statistics_pool
+    if STATISTICS_POOL_WORKERS <= 0:
+        return None
+    if statistics_pool is None:
+        logger.info(f'Starting statistics pool with {STATISTICS_POOL_WORKERS} processes.')
+        # Workers are spawned rather than forked, as forking a process with running threads is unsafe.
+        statistics_pool = ProcessPoolExecutor(
+            max_workers=STATISTICS_POOL_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+            # The event loop process records the metrics of the tasks, see calculate_statistics_task.
+            initializer=disable_metrics
+        )
+    return statistics_pool
+
+
+def start_statistics_pool():
+    """Starts all processes of the pool, so that the first requests do not wait for the imports of the processes."""
+    pool = get_statistics_pool()
+    if pool is not None:
+        for future in [pool.submit(int) for _ in range(STATISTICS_POOL_WORKERS)]:
+            future.result()
+
+
+def shutdown_statistics_pool():
+    """Shuts the shared process pool down."""
+    global statistics_pool
+    if statistics_pool is not None:
+        statistics_pool.shutdown(cancel_futures=True)
+        statistics_pool = None
+
+
+async def run_in_statistics_pool(function: Callable[..., T], *arguments) -> T:
+    """
+    Runs the function in the process pool, or directly if the pool is disabled.
+
+    Args:
+        function: Module-level function, so that it can be sent to the processes.
+        arguments: Arguments of the function, which are pickled. Prefer arrays over data frames and objects.
+    """
+    pool = get_statistics_pool()
+    if pool is None:
+        return function(*arguments)
+    return await asyncio.get_running_loop().run_in_executor(pool, function, *arguments)
@@ -1,15 +1,37 @@
-from typing import Dict, Union, Tuple
+import asyncio
+import os
+from typing import Dict, Union, Tuple, Optional, List, NamedTuple
 
-import requests
-from datetime import datetime, timedelta
+import httpx
+from datetime import datetime, timedelta, date
+import numpy as np
+import orjson
 import pandas as pd
 
+from src.daily_series import DailySeries
 from src.definitions import WeatherVariable, Coordinate, WeatherModel
+from src.fit_cache import FIT_CACHE
+from src.forecast_cache import FORECAST_CACHE
+from src.grid import GridCell, snap_coordinate, get_cell_coordinate
+from src.historical_cache import HISTORICAL_CACHE, CachedSeries
+from src.metrics import time_stage, record_upstream_response
 import logging
 logger = logging.getLogger('uvicorn.error')
 
-FORECAST_API_ENDPOINT = 'https://api.open-meteo.com/v1/forecast'
-HISTORICAL_API_ENDPOINT = 'http://127.0.0.1:8081/v1/archive'
+FORECAST_API_ENDPOINT = os.environ.get('FORECAST_API_ENDPOINT', 'https://api.open-meteo.com/v1/forecast')
+HISTORICAL_API_ENDPOINT = os.environ.get('HISTORICAL_API_ENDPOINT', 'http://127.0.0.1:8081/v1/archive')
+
+# Days at the end of a cached archive series that are fetched again with its tail, so that revised values are replaced.
+ARCHIVE_REFETCH_DAYS = int(os.environ.get('ARCHIVE_REFETCH_DAYS', 5))
+
+UPSTREAM_TIMEOUT_SECONDS = float(os.environ.get('UPSTREAM_TIMEOUT_SECONDS', 30))
+UPSTREAM_CONNECT_TIMEOUT_SECONDS = float(os.environ.get('UPSTREAM_CONNECT_TIMEOUT_SECONDS', 5))
+UPSTREAM_MAX_CONNECTIONS = int(os.environ.get('UPSTREAM_MAX_CONNECTIONS', 100))
+UPSTREAM_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get('UPSTREAM_MAX_KEEPALIVE_CONNECTIONS', 20))
+UPSTREAM_KEEPALIVE_EXPIRY_SECONDS = float(os.environ.get('UPSTREAM_KEEPALIVE_EXPIRY_SECONDS', 30))
+
+# Client shared by all requests, so that connections to the weather APIs are pooled and kept alive.
+http_client: Optional[httpx.AsyncClient] = None
 
 
 class WeatherApiException(Exception):
@@ -17,65 +39,402 @@ class WeatherApiException(Exception):
     pass
 
 
-def get_forecast_and_historical_data(
+class DailyData(NamedTuple):
+    """Daily data of a weather API response as arrays."""
+    dates: np.ndarray
+    values: Dict[WeatherVariable, np.ndarray]
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Returns the shared HTTP client for the weather APIs and creates it on first use."""
+    global http_client
+    if http_client is None or http_client.is_closed:
+        http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(UPSTREAM_TIMEOUT_SECONDS, connect=UPSTREAM_CONNECT_TIMEOUT_SECONDS),
+            limits=httpx.Limits(
+                max_connections=UPSTREAM_MAX_CONNECTIONS,
+                max_keepalive_connections=UPSTREAM_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=UPSTREAM_KEEPALIVE_EXPIRY_SECONDS
+            )
+        )
+    return http_client
+
+
+async def close_http_client():
+    """Closes the shared HTTP client and its pooled connections."""
+    global http_client
+    if http_client is not None:
+        await http_client.aclose()
+        http_client = None
+
+
+async def get_forecast_and_historical_data(
         coordinate: Coordinate,
         weather_variable: WeatherVariable,
         weather_model: WeatherModel
-) -> Tuple[pd.DataFrame, pd.DataFrame]:
-    # Get start and end date
+) -> Tuple[pd.DataFrame, DailySeries]:
+    weather_data = await get_forecast_and_historical_data_for_variables(
+        coordinate=coordinate,
+        weather_variables=[weather_variable],
+        weather_model=weather_model
+    )
+    return weather_data[weather_variable]
+
+
+async def get_forecast_and_historical_data_for_variables(
+        coordinate: Coordinate,
+        weather_variables: List[WeatherVariable],
+        weather_model: WeatherModel
+) -> Dict[WeatherVariable, Tuple[pd.DataFrame, DailySeries]]:
+    """
+    Fetches the forecast and historical data of several weather variables with one request to each weather API.
+
+    Args:
+        coordinate: Requested location and time.
+        weather_variables: Weather variables to fetch.
+        weather_model: Reanalysis model of the historical data.
+
+    Returns:
+        Forecast and historical data per weather variable.
+    """
+    today = datetime.fromtimestamp(coordinate.timestamp)
+
+    # Fetch the forecast and the missing archive series concurrently.
+    forecast_data, historical_data = await asyncio.gather(
+        get_forecast_data_for_variables(
+            coordinate=coordinate,
+            weather_variables=weather_variables,
+            weather_model=weather_model
+        ),
+        get_historical_data_for_variables(
+            coordinate=coordinate,
+            weather_variables=weather_variables,
+            weather_model=weather_model,
+            end_date=today - timedelta(days=360)
+        )
+    )
+
+    return {
+        weather_variable: (forecast_data[weather_variable], historical_data[weather_variable])
+        for weather_variable in weather_variables
+    }
+
+
+async def get_forecast_data_for_variables(
+        coordinate: Coordinate,
+        weather_variables: List[WeatherVariable],
+        weather_model: WeatherModel
+) -> Dict[WeatherVariable, pd.DataFrame]:
+    """Fetches the forecast data of the month up to the day of the coordinate at the centre of its grid cell."""
     today = datetime.fromtimestamp(coordinate.timestamp)
-    start_date = today - timedelta(days=30)
-    end_date_historical = today - timedelta(days=360)
-    end_date_historical_string = end_date_historical.strftime('%Y-%m-%d')
-    today_string = today.strftime('%Y-%m-%d')
+    return await get_forecast_data_for_dates(
+        coordinate=coordinate,
+        weather_variables=weather_variables,
+        weather_model=weather_model,
+        start_date=today - timedelta(days=30),
+        end_date=today
+    )
+
+
+async def get_forecast_data_for_dates(
+        coordinate: Coordinate,
+        weather_variables: List[WeatherVariable],
+        weather_model: WeatherModel,
+        start_date: datetime,
+        end_date: datetime
+) -> Dict[WeatherVariable, pd.DataFrame]:
+    """
+    Fetches the forecast data from the start date up to the end date at the centre of the grid cell of the coordinate.
+
+    Forecasts are served from the forecast cache while they are fresh, and concurrent requests for the same grid cell
+    share one request to the forecast API.
+    """
     start_date_string = start_date.strftime('%Y-%m-%d')
+    end_date_string = end_date.strftime('%Y-%m-%d')
+    grid_cell = snap_coordinate(coordinate, weather_model)
 
     parameters_forecast = {
-        'latitude': coordinate.latitude,
-        'longitude': coordinate.longitude,
-        'daily': weather_variable.value,
+        'latitude': grid_cell.latitude,
+        'longitude': grid_cell.longitude,
+        'daily': ','.join(weather_variable.value for weather_variable in weather_variables),
         'timezone': 'auto',
         'start_date': start_date_string,
-        'end_date': today_string
+        'end_date': end_date_string
     }
 
+    return await FORECAST_CACHE.get_or_fetch(
+        key=(weather_model, grid_cell, start_date_string, end_date_string, tuple(weather_variables)),
+        fetch=lambda: weather_api_request_variables(
+            parameters=parameters_forecast,
+            weather_variables=weather_variables,
+            api_uri=FORECAST_API_ENDPOINT
+        )
+    )
+
+
+async def get_historical_data_for_variables(
+        coordinate: Coordinate,
+        weather_variables: List[WeatherVariable],
+        weather_model: WeatherModel,
+        end_date: datetime
+) -> Dict[WeatherVariable, DailySeries]:
+    """
+    Fetches the historical data from 1940 up to the end date, serving cached series from the historical cache.
+
+    Cached series that end before the end date are extended by fetching only the missing tail, and the fitted
+    distributions that depend on cached days whose values the tail revised are removed from the fit cache.
+    """
+    cached_series = {
+        weather_variable: HISTORICAL_CACHE.read(coordinate, weather_variable, weather_model)
+        for weather_variable in weather_variables
+    }
+    historical_data = {
+        weather_variable: HISTORICAL_CACHE.serve(cached, weather_model, end_date)
+        for weather_variable, cached in cached_series.items()
+    }
+    outdated_series = {
+        weather_variable: cached for weather_variable, cached in cached_series.items()
+        if historical_data[weather_variable] is None
+    }
+    missing_weather_variables = [
+        weather_variable for weather_variable, cached in outdated_series.items() if cached is None
+    ]
+
+    # Variables whose series end on the same day in the same cell share one request for their tail.
+    tails: Dict[Tuple[GridCell, date], List[WeatherVariable]] = {}
+    for weather_variable, cached in outdated_series.items():
+        if cached is not None:
+            tail_start_date = cached.end_date - timedelta(days=ARCHIVE_REFETCH_DAYS - 1)
+            tails.setdefault((cached.grid_cell, tail_start_date), []).append(weather_variable)
+
+    fetches = [
+        get_historical_tail(
+            grid_cell=grid_cell,
+            coordinate=coordinate,
+            weather_variables=tail_weather_variables,
+            weather_model=weather_model,
+            tail_start_date=tail_start_date,
+            end_date=end_date,
+            cached_series={
+                weather_variable: outdated_series[weather_variable] for weather_variable in tail_weather_variables
+            }
+        )
+        for (grid_cell, tail_start_date), tail_weather_variables in tails.items()
+    ]
+    if missing_weather_variables:
+        fetches.append(get_historical_series(
+            coordinate=coordinate,
+            weather_variables=missing_weather_variables,
+            weather_model=weather_model,
+            end_date=end_date
+        ))
+
+    for fetched_historical_data in await asyncio.gather(*fetches):
+        historical_data.update(fetched_historical_data)
+    return historical_data
+
+
+async def get_historical_series(
+        coordinate: Coordinate,
+        weather_variables: List[WeatherVariable],
+        weather_model: WeatherModel,
+        end_date: datetime
+) -> Dict[WeatherVariable, DailySeries]:
+    """Fetches the whole historical series from 1940 up to the end date and stores them in the historical cache."""
+    # Fetch the series at the centre of the grid cell, so that the cached series does not depend on the coordinate
+    # that was requested first.
+    cell_coordinate = get_cell_coordinate(coordinate, snap_coordinate(coordinate, weather_model))
     parameters_historical = {
-        'latitude': coordinate.latitude,
-        'longitude': coordinate.longitude,
+        'latitude': cell_coordinate.latitude,
+        'longitude': cell_coordinate.longitude,
         'models': weather_model.value,
-        'daily': weather_variable.value,
+        'daily': ','.join(weather_variable.value for weather_variable in weather_variables),
         'timezone': 'auto',
         'start_date': '1940-01-01',
-        'end_date': end_date_historical_string
+        'end_date': end_date.strftime('%Y-%m-%d')
+    }
+
+    historical_data = await weather_api_request_series(
+        parameters=parameters_historical,
+        weather_variables=weather_variables,
+        api_uri=HISTORICAL_API_ENDPOINT
+    )
+
+    for weather_variable in weather_variables:
+        HISTORICAL_CACHE.store(
+            coordinate=cell_coordinate,
+            weather_variable=weather_variable,
+            weather_model=weather_model,
+            end_date=end_date,
+            historical_data=historical_data[weather_variable]
+        )
+
+    return historical_data
+
+
+async def get_historical_tail(
+        grid_cell: GridCell,
+        coordinate: Coordinate,
+        weather_variables: List[WeatherVariable],
+        weather_model: WeatherModel,
+        tail_start_date: date,
+        end_date: datetime,
+        cached_series: Dict[WeatherVariable, CachedSeries]
+) -> Dict[WeatherVariable, DailySeries]:
+    """
+    Fetches the tail of cached historical series from the start date up to the end date and appends it in the cache.
+
+    Args:
+        grid_cell: Grid cell of the cached series.
+        coordinate: Requested location and time.
+        weather_variables: Weather variables whose series end on the same day.
+        weather_model: Reanalysis model of the historical data.
+        tail_start_date: First day of the tail, which overlaps the end of the cached series by ARCHIVE_REFETCH_DAYS.
+        end_date: Last day of the tail.
+        cached_series: Cached series per weather variable.
+
+    Returns:
+        Extended series per weather variable.
+    """
+    cell_coordinate = get_cell_coordinate(coordinate, grid_cell)
+    parameters_historical = {
+        'latitude': cell_coordinate.latitude,
+        'longitude': cell_coordinate.longitude,
+        'models': weather_model.value,
+        'daily': ','.join(weather_variable.value for weather_variable in weather_variables),
+        'timezone': 'auto',
+        'start_date': tail_start_date.strftime('%Y-%m-%d'),
+        'end_date': end_date.strftime('%Y-%m-%d')
     }
 
-    forecast_data = weather_api_request(
-        parameters=parameters_forecast,
-        weather_variable=weather_variable,
-        api_uri=FORECAST_API_ENDPOINT)
-    historical_data = weather_api_request(
+    tails = await weather_api_request_series(
         parameters=parameters_historical,
-        weather_variable=weather_variable,
+        weather_variables=weather_variables,
         api_uri=HISTORICAL_API_ENDPOINT
     )
 
-    return forecast_data, historical_data
+    historical_data = {}
+    for weather_variable in weather_variables:
+        historical_data[weather_variable], first_changed_date = HISTORICAL_CACHE.append(
+            cached=cached_series[weather_variable],
+            weather_variable=weather_variable,
+            weather_model=weather_model,
+            end_date=end_date,
+            tail=tails[weather_variable],
+            tail_start_date=tail_start_date
+        )
+        if first_changed_date is not None:
+            logger.info(f'Archive revised {weather_variable.value} of {grid_cell} from {first_changed_date}.')
+            FIT_CACHE.invalidate(
+                grid_cell.latitude,
+                grid_cell.longitude,
+                weather_model,
+                weather_variable,
+                first_changed_date.strftime('%Y-%m-%d')
+            )
+
+    return historical_data
 
 
-def weather_api_request(
+async def weather_api_request(
         parameters: Dict[str, Union[str, float]],
         weather_variable: WeatherVariable,
         api_uri: str
 ) -> pd.DataFrame:
+    weather_data = await weather_api_request_variables(
+        parameters=parameters,
+        weather_variables=[weather_variable],
+        api_uri=api_uri
+    )
+    return weather_data[weather_variable]
+
+
+async def weather_api_request_variables(
+        parameters: Dict[str, Union[str, float]],
+        weather_variables: List[WeatherVariable],
+        api_uri: str
+) -> Dict[WeatherVariable, pd.DataFrame]:
+    daily_data = await get_daily_data(parameters=parameters, api_uri=api_uri, weather_variables=weather_variables)
+    with time_stage('parse'):
+        weather_data = {}
+        for weather_variable in weather_variables:
+            values = daily_data.values[weather_variable]
+            available = ~np.isnan(values)
+            weather_data[weather_variable] = pd.DataFrame(
+                data=values[available],
+                index=pd.DatetimeIndex(daily_data.dates[available].astype('datetime64[ns]')),
+                columns=[weather_variable.value]
+            )
+        return weather_data
+
+
+async def weather_api_request_series(
+        parameters: Dict[str, Union[str, float]],
+        weather_variables: List[WeatherVariable],
+        api_uri: str
+) -> Dict[WeatherVariable, DailySeries]:
+    """Fetches daily data like weather_api_request_variables, but as compact daily series, e.g. of the archive."""
+    daily_data = await get_daily_data(parameters=parameters, api_uri=api_uri, weather_variables=weather_variables)
+    with time_stage('parse'):
+        return {
+            weather_variable: DailySeries.from_dates(
+                daily_data.dates, daily_data.values[weather_variable], weather_variable
+            )
+            for weather_variable in weather_variables
+        }
+
+
+async def get_daily_data(
+        parameters: Dict[str, Union[str, float]],
+        api_uri: str,
+        weather_variables: List[WeatherVariable]
+) -> DailyData:
+    """Requests the daily data from a weather API and returns the dates and the values of the weather variables."""
     logger.info(f'Fetching weather data from {api_uri}.')
-    api_response = requests.get(api_uri, params=parameters)
+    api = 'forecast' if FORECAST_API_ENDPOINT == api_uri else 'archive'
+    try:
+        with time_stage('upstream'):
+            api_response = await get_http_client().get(api_uri, params=parameters)
+    except httpx.HTTPError as exception:
+        record_upstream_response(api, 'error')
+        raise WeatherApiException(f'Failed to fetch weather data with: {exception!r}') from exception
+    record_upstream_response(api, str(api_response.status_code))
 
     if api_response.status_code != 200:
         raise WeatherApiException(f'Failed to fetch weather data with: {api_response.json()["reason"]}')
 
     logger.info(f'Fetched weather data successfully.')
-    return pd.DataFrame(
-        data=api_response.json()['daily'][weather_variable.value],
-        index=pd.DatetimeIndex(api_response.json()['daily']['time']),
-        columns=[weather_variable.value]
-    ).dropna(axis=0)
+    with time_stage('parse'):
+        return parse_daily_data(api_response.content, weather_variables)
+
+
+def parse_daily_data(content: bytes, weather_variables: List[WeatherVariable]) -> DailyData:
+    """
+    Parses the body of a weather API response once and converts the dates and values of the weather variables to arrays.
+
+    Missing values, which the weather APIs send as null, are NaN.
+    """
+    daily_data = orjson.loads(content)['daily']
+    return DailyData(
+        dates=parse_dates(daily_data['time']),
+        values={
+            weather_variable: np.array(daily_data[weather_variable.value], dtype=np.float64)
+            for weather_variable in weather_variables
+        }
+    )
+
+
+def parse_dates(dates: List[str]) -> np.ndarray:
+    """
+    Converts dates in ISO format to a datetime64[D] array.
+
+    The weather APIs return every day of the requested range once and in order. Unless days are missing, the dates
+    follow from the first and the last date, so that only two dates are parsed. Otherwise, every date is parsed.
+    """
+    if not dates:
+        return np.empty(0, dtype='datetime64[D]')
+    first_date = np.datetime64(dates[0], 'D')
+    last_date = np.datetime64(dates[-1], 'D')
+    if (last_date - first_date).astype(np.int64) + 1 == len(dates):
+        return np.arange(first_date, last_date + 1)
+    return np.array(dates, dtype='datetime64[D]')
@@ -0,0 +1,52 @@
+import pytest
+
+from src.climatology_store import CLIMATOLOGY_STORE
+from src.fit_cache import FIT_CACHE
+from src.forecast_cache import FORECAST_CACHE
+from src.historical_cache import HISTORICAL_CACHE
+from src.response_cache import RESPONSE_CACHE
+import src.statistics_pool
+
+
+@pytest.fixture(autouse=True)
+def historical_cache_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(HISTORICAL_CACHE, 'directory', tmp_path / 'historical')
+    HISTORICAL_CACHE.clear()
+    yield HISTORICAL_CACHE.directory
+    HISTORICAL_CACHE.clear()
+
+
+@pytest.fixture(autouse=True)
+def fit_cache():
+    FIT_CACHE.clear()
+    yield FIT_CACHE
+    FIT_CACHE.clear()
+
+
+@pytest.fixture(autouse=True)
+def climatology_store_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(CLIMATOLOGY_STORE, 'directory', tmp_path / 'climatology')
+    monkeypatch.setattr(CLIMATOLOGY_STORE, '_opened', {})
+    return CLIMATOLOGY_STORE.directory
+
+
+@pytest.fixture(autouse=True)
+def forecast_cache():
+    FORECAST_CACHE.clear()
+    yield FORECAST_CACHE
+    FORECAST_CACHE.clear()
+
+
+@pytest.fixture(autouse=True)
+def response_cache():
+    RESPONSE_CACHE.clear()
+    yield RESPONSE_CACHE
+    RESPONSE_CACHE.clear()
+
+
+@pytest.fixture(autouse=True)
+def statistics_pool_workers(monkeypatch):
+    # Statistics are computed on the event loop, unless a test starts the pool.
+    monkeypatch.setattr(src.statistics_pool, 'STATISTICS_POOL_WORKERS', 0)
+    yield
+    src.statistics_pool.shutdown_statistics_pool()
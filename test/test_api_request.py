@@ -1,20 +1,29 @@
+import asyncio
 from unittest import TestCase
+from datetime import datetime
 from unittest.mock import patch
 
+import httpx
+import numpy as np
+import orjson
 import pandas as pd
 import pytest
-import responses
 
+from src.daily_series import DailySeries
 from src.definitions import WeatherVariable, TimeFrame, Coordinate, WeatherModel
 from src.weather_api_request import FORECAST_API_ENDPOINT, weather_api_request, WeatherApiException, \
-    get_forecast_and_historical_data, HISTORICAL_API_ENDPOINT
+    get_forecast_and_historical_data, HISTORICAL_API_ENDPOINT, get_http_client, \
+    get_forecast_and_historical_data_for_variables, get_historical_data_for_variables, ARCHIVE_REFETCH_DAYS, \
+    parse_daily_data, parse_dates
+from src.fit_cache import FIT_CACHE, FitKey
+from src.historical_cache import HISTORICAL_CACHE
 
 
 @pytest.fixture
 def forecast_parameters():
     return {
-        'latitude': 48.3504104,
-        'longitude': 10.8766662,
+        'latitude': 48.4,
+        'longitude': 10.9,
         'daily': WeatherVariable.TEMPERATURE.value,
         'timezone': 'auto',
         'start_date': '2023-05-23',
@@ -27,8 +36,8 @@ def historical_parameters():
     return {
         'daily': WeatherVariable.TEMPERATURE.value,
         'end_date': '2022-06-27',
-        'latitude': 48.3504104,
-        'longitude': 10.8766662,
+        'latitude': 48.4,
+        'longitude': 10.9,
         'models': 'era5_land',
         'start_date': '1940-01-01',
         'timezone': 'auto'
@@ -70,6 +79,13 @@ def failed_weather_api_response():
     }
 
 
+def mock_weather_api(monkeypatch, handler):
+    monkeypatch.setattr(
+        'src.weather_api_request.http_client',
+        httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    )
+
+
 @pytest.fixture(scope='package')
 def coordinate():
     return Coordinate(
@@ -79,21 +95,20 @@ def coordinate():
     )
 
 
-@responses.activate
-def test_weather_api_request_successful(successful_weather_api_response, forecast_parameters):
-    responses.add(
-        method=responses.GET,
-        url=FORECAST_API_ENDPOINT,
-        json=successful_weather_api_response,
-        status=200
-    )
+@pytest.mark.asyncio
+async def test_weather_api_request_successful(monkeypatch, successful_weather_api_response, forecast_parameters):
+    def handler(request):
+        assert FORECAST_API_ENDPOINT == str(request.url.copy_with(query=None))
+        assert forecast_parameters['start_date'] == request.url.params['start_date']
+        return httpx.Response(status_code=200, json=successful_weather_api_response)
+    mock_weather_api(monkeypatch, handler)
 
     expected = pd.DataFrame(
         data=successful_weather_api_response[TimeFrame.DAILY.value][WeatherVariable.TEMPERATURE.value],
         index=pd.DatetimeIndex(successful_weather_api_response[TimeFrame.DAILY.value]['time']),
         columns=[WeatherVariable.TEMPERATURE.value]
     )
-    actual = weather_api_request(
+    actual = await weather_api_request(
         parameters=forecast_parameters,
         weather_variable=WeatherVariable.TEMPERATURE,
         api_uri=FORECAST_API_ENDPOINT
@@ -102,50 +117,96 @@ def test_weather_api_request_successful(successful_weather_api_response, forecas
     pd.testing.assert_frame_equal(expected, actual)
 
 
-@responses.activate
-def test_weather_api_request_failure(forecast_parameters, failed_weather_api_response):
-    responses.add(
-        method=responses.GET,
-        url=FORECAST_API_ENDPOINT,
-        json=failed_weather_api_response,
-        status=400
-    )
+@pytest.mark.asyncio
+async def test_weather_api_request_failure(monkeypatch, forecast_parameters, failed_weather_api_response):
+    mock_weather_api(monkeypatch, lambda request: httpx.Response(status_code=400, json=failed_weather_api_response))
 
     with pytest.raises(WeatherApiException):
-        weather_api_request(
+        await weather_api_request(
             parameters=forecast_parameters,
             weather_variable=WeatherVariable.TEMPERATURE,
             api_uri=FORECAST_API_ENDPOINT
         )
 
 
-def test_get_forecast_and_historical_data_successful(
+@pytest.mark.asyncio
+async def test_weather_api_request_timeout(monkeypatch, forecast_parameters):
+    def handler(request):
+        raise httpx.ReadTimeout('Timed out.', request=request)
+    mock_weather_api(monkeypatch, handler)
+
+    with pytest.raises(WeatherApiException):
+        await weather_api_request(
+            parameters=forecast_parameters,
+            weather_variable=WeatherVariable.TEMPERATURE,
+            api_uri=FORECAST_API_ENDPOINT
+        )
+
+
+def test_parse_daily_data(successful_weather_api_response):
+    weather_api_response = {'daily': dict(successful_weather_api_response['daily'])}
+    weather_api_response['daily'][WeatherVariable.PRECIPITATION.value] = [0] * 30 + [None]
+
+    daily_data = parse_daily_data(
+        orjson.dumps(weather_api_response),
+        [WeatherVariable.TEMPERATURE, WeatherVariable.PRECIPITATION]
+    )
+
+    np.testing.assert_array_equal(
+        np.array(weather_api_response['daily']['time'], dtype='datetime64[D]'), daily_data.dates
+    )
+    assert weather_api_response['daily'][WeatherVariable.TEMPERATURE.value] == \
+        daily_data.values[WeatherVariable.TEMPERATURE].tolist()
+    assert np.float64 == daily_data.values[WeatherVariable.PRECIPITATION].dtype
+    assert np.isnan(daily_data.values[WeatherVariable.PRECIPITATION][-1])
+
+
+def test_parse_dates_with_gaps():
+    dates = ['2023-05-23', '2023-05-25', '2023-05-26']
+
+    np.testing.assert_array_equal(np.array(dates, dtype='datetime64[D]'), parse_dates(dates))
+    assert 0 == len(parse_dates([]))
+
+
+def test_get_http_client_is_shared():
+    assert get_http_client() is get_http_client()
+
+
+@pytest.mark.asyncio
+async def test_get_forecast_and_historical_data_successful(
         successful_weather_api_response,
         weather_data,
         coordinate,
         forecast_parameters,
         historical_parameters
 ):
-    with patch('src.weather_api_request.weather_api_request', return_value=weather_data) as mock_weather_api_request:
-        actual_forecast_data, actual_historical_data = get_forecast_and_historical_data(
+    with patch(
+            'src.weather_api_request.weather_api_request_variables',
+            return_value={WeatherVariable.TEMPERATURE: weather_data}
+    ) as mock_forecast_request, patch(
+            'src.weather_api_request.weather_api_request_series',
+            return_value={WeatherVariable.TEMPERATURE: DailySeries.from_data_frame(weather_data)}
+    ) as mock_historical_request:
+        actual_forecast_data, actual_historical_data = await get_forecast_and_historical_data(
             coordinate=coordinate,
             weather_variable=WeatherVariable.TEMPERATURE,
             weather_model=WeatherModel.ERA5_LAND
         )
 
         pd.testing.assert_frame_equal(weather_data, actual_forecast_data)
-        pd.testing.assert_frame_equal(weather_data, actual_historical_data)
+        pd.testing.assert_frame_equal(weather_data, actual_historical_data.to_data_frame())
 
-        TestCase().assertDictEqual(forecast_parameters, mock_weather_api_request.call_args_list[0].kwargs['parameters'])
-        assert WeatherVariable.TEMPERATURE == mock_weather_api_request.call_args_list[0].kwargs['weather_variable']
-        assert FORECAST_API_ENDPOINT == mock_weather_api_request.call_args_list[0].kwargs['api_uri']
+        TestCase().assertDictEqual(forecast_parameters, mock_forecast_request.call_args.kwargs['parameters'])
+        assert [WeatherVariable.TEMPERATURE] == mock_forecast_request.call_args.kwargs['weather_variables']
+        assert FORECAST_API_ENDPOINT == mock_forecast_request.call_args.kwargs['api_uri']
 
-        TestCase().assertDictEqual(historical_parameters, mock_weather_api_request.call_args_list[1].kwargs['parameters'])
-        assert WeatherVariable.TEMPERATURE == mock_weather_api_request.call_args_list[1].kwargs['weather_variable']
-        assert HISTORICAL_API_ENDPOINT == mock_weather_api_request.call_args_list[1].kwargs['api_uri']
+        TestCase().assertDictEqual(historical_parameters, mock_historical_request.call_args.kwargs['parameters'])
+        assert [WeatherVariable.TEMPERATURE] == mock_historical_request.call_args.kwargs['weather_variables']
+        assert HISTORICAL_API_ENDPOINT == mock_historical_request.call_args.kwargs['api_uri']
 
 
-def test_get_forecast_and_historical_data_failure(
+@pytest.mark.asyncio
+async def test_get_forecast_and_historical_data_failure(
         successful_weather_api_response,
         weather_data,
         coordinate,
@@ -153,9 +214,153 @@ def test_get_forecast_and_historical_data_failure(
         historical_parameters
 ):
     with pytest.raises(WeatherApiException):
-        with patch('src.weather_api_request.weather_api_request', side_effect=WeatherApiException()):
-            get_forecast_and_historical_data(
+        with patch('src.weather_api_request.weather_api_request_variables', side_effect=WeatherApiException()):
+            await get_forecast_and_historical_data(
                 coordinate=coordinate,
                 weather_variable=WeatherVariable.TEMPERATURE,
                 weather_model=WeatherModel.ERA5_LAND
             )
+
+
+@pytest.mark.asyncio
+async def test_get_forecast_and_historical_data_from_cache(weather_data, coordinate):
+    historical_data = weather_data.set_index(weather_data.index - pd.DateOffset(years=2))
+    with patch(
+            'src.weather_api_request.weather_api_request_variables',
+            return_value={WeatherVariable.TEMPERATURE: weather_data}
+    ) as mock_forecast_request, patch(
+            'src.weather_api_request.weather_api_request_series',
+            return_value={WeatherVariable.TEMPERATURE: DailySeries.from_data_frame(historical_data)}
+    ) as mock_historical_request:
+        await get_forecast_and_historical_data(
+            coordinate=coordinate,
+            weather_variable=WeatherVariable.TEMPERATURE,
+            weather_model=WeatherModel.ERA5_LAND
+        )
+        _, actual_historical_data = await get_forecast_and_historical_data(
+            coordinate=coordinate,
+            weather_variable=WeatherVariable.TEMPERATURE,
+            weather_model=WeatherModel.ERA5_LAND
+        )
+
+        pd.testing.assert_frame_equal(historical_data, actual_historical_data.to_data_frame())
+        # The forecast is served from the forecast cache and the archive from the historical cache.
+        assert 1 == mock_forecast_request.call_count
+        assert 1 == mock_historical_request.call_count
+
+
+@pytest.mark.asyncio
+async def test_get_forecast_and_historical_data_fetches_concurrently(weather_data, coordinate):
+    historical_data = weather_data.set_index(weather_data.index - pd.DateOffset(years=2))
+    historical_request_started = asyncio.Event()
+
+    async def mock_forecast_request(parameters, weather_variables, api_uri):
+        # Only completes if the archive is requested while the forecast request is still in flight.
+        await historical_request_started.wait()
+        return {WeatherVariable.TEMPERATURE: weather_data}
+
+    async def mock_historical_request(parameters, weather_variables, api_uri):
+        historical_request_started.set()
+        return {WeatherVariable.TEMPERATURE: DailySeries.from_data_frame(historical_data)}
+
+    with patch('src.weather_api_request.weather_api_request_variables', side_effect=mock_forecast_request), \
+            patch('src.weather_api_request.weather_api_request_series', side_effect=mock_historical_request):
+        actual_forecast_data, actual_historical_data = await asyncio.wait_for(
+            get_forecast_and_historical_data(
+                coordinate=coordinate,
+                weather_variable=WeatherVariable.TEMPERATURE,
+                weather_model=WeatherModel.ERA5_LAND
+            ),
+            timeout=1
+        )
+
+    pd.testing.assert_frame_equal(weather_data, actual_forecast_data)
+    pd.testing.assert_frame_equal(historical_data, actual_historical_data.to_data_frame())
+
+
+@pytest.mark.asyncio
+async def test_get_forecast_and_historical_data_for_variables_single_request(
+        monkeypatch,
+        successful_weather_api_response,
+        coordinate
+):
+    precipitation = [0.0] * 30 + [None]
+    requested_urls = []
+
+    def handler(request):
+        requested_urls.append(request.url)
+        weather_api_response = {'daily': dict(successful_weather_api_response['daily'])}
+        weather_api_response['daily'][WeatherVariable.PRECIPITATION.value] = precipitation
+        if HISTORICAL_API_ENDPOINT.startswith(str(request.url.copy_with(query=None))):
+            weather_api_response['daily']['time'] = [
+                date.replace('2023', '2021') for date in weather_api_response['daily']['time']
+            ]
+        return httpx.Response(status_code=200, json=weather_api_response)
+    mock_weather_api(monkeypatch, handler)
+
+    weather_data = await get_forecast_and_historical_data_for_variables(
+        coordinate=coordinate,
+        weather_variables=[WeatherVariable.TEMPERATURE, WeatherVariable.PRECIPITATION],
+        weather_model=WeatherModel.ERA5
+    )
+
+    assert 2 == len(requested_urls)
+    for url in requested_urls:
+        assert 'temperature_2m_max,precipitation_sum' == url.params['daily']
+    forecast_data, historical_data = weather_data[WeatherVariable.PRECIPITATION]
+    assert [WeatherVariable.PRECIPITATION.value] == list(forecast_data.columns)
+    assert 30 == len(forecast_data)
+    assert 30 == len(historical_data.to_data_frame())
+    assert 31 == len(weather_data[WeatherVariable.TEMPERATURE][0])
+
+
+@pytest.mark.asyncio
+async def test_get_historical_data_fetches_only_missing_tail(coordinate):
+    index = pd.date_range('2021-01-01', '2021-06-27', freq='d')
+    cached_data = pd.DataFrame(
+        data=[float(value) for value in range(len(index))], index=index, columns=[WeatherVariable.TEMPERATURE.value]
+    )
+    HISTORICAL_CACHE.store(
+        coordinate,
+        WeatherVariable.TEMPERATURE,
+        WeatherModel.ERA5,
+        datetime(2021, 6, 27),
+        DailySeries.from_data_frame(cached_data)
+    )
+    fit_keys = {
+        archive_end_date: FitKey(
+            48.25, 11.0, WeatherModel.ERA5, WeatherVariable.TEMPERATURE, '06-22', TimeFrame.DAILY, archive_end_date
+        )
+        for archive_end_date in ['2021-06-25', '2021-06-26']
+    }
+    for fit_key in fit_keys.values():
+        FIT_CACHE.put(fit_key, (20.0, 3.5))
+    # The archive revised the value of the 26th and added the 28th.
+    tail_index = pd.date_range('2021-06-23', '2021-06-28', freq='d')
+    tail = pd.DataFrame(
+        data=[173.0, 174.0, 175.0, 0.0, 177.0, 178.0], index=tail_index, columns=[WeatherVariable.TEMPERATURE.value]
+    )
+
+    with patch(
+            'src.weather_api_request.weather_api_request_series',
+            return_value={WeatherVariable.TEMPERATURE: DailySeries.from_data_frame(tail)}
+    ) as mock_weather_api_request, patch.object(
+            HISTORICAL_CACHE, 'read', wraps=HISTORICAL_CACHE.read
+    ) as mock_read:
+        historical_data = await get_historical_data_for_variables(
+            coordinate=coordinate,
+            weather_variables=[WeatherVariable.TEMPERATURE],
+            weather_model=WeatherModel.ERA5,
+            end_date=datetime(2021, 6, 28)
+        )
+
+    # The stale series is read from disk once.
+    assert 1 == mock_read.call_count
+    parameters = mock_weather_api_request.call_args.kwargs['parameters']
+    assert 5 == ARCHIVE_REFETCH_DAYS
+    assert ('2021-06-23', '2021-06-28') == (parameters['start_date'], parameters['end_date'])
+    assert (48.25, 11.0) == (parameters['latitude'], parameters['longitude'])
+    assert 179 == len(historical_data[WeatherVariable.TEMPERATURE])
+    assert 0.0 == historical_data[WeatherVariable.TEMPERATURE].window('2021-06-26', '2021-06-26')[0]
+    assert FIT_CACHE.get(fit_keys['2021-06-25']) is not None
+    assert FIT_CACHE.get(fit_keys['2021-06-26']) is None
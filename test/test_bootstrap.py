@@ -0,0 +1,42 @@
+import numpy as np
+
+from src.bootstrap import resample, get_confidence_intervals
+
+
+def test_resample_draws_only_values_of_the_series():
+    values = np.array([
+        [1.0, 2.0, 3.0, 4.0],
+        [np.nan, 5.0, np.nan, 6.0],
+        [np.nan, np.nan, np.nan, np.nan],
+    ])
+
+    resampled = resample(values, samples=50, seed=1)
+
+    assert (3, 50, 4) == resampled.shape
+    assert set(resampled[0].ravel()) == {1.0, 2.0, 3.0, 4.0}
+    # Series with fewer values are padded behind the drawn values.
+    assert set(resampled[1, :, :2].ravel()) == {5.0, 6.0}
+    assert np.isnan(resampled[1, :, 2:]).all()
+    assert np.isnan(resampled[2]).all()
+
+
+def test_resample_is_reproducible():
+    values = np.arange(20.0).reshape(2, 10)
+
+    np.testing.assert_array_equal(resample(values, samples=10), resample(values, samples=10))
+    assert not np.array_equal(resample(values, samples=10, seed=1), resample(values, samples=10, seed=2))
+
+
+def test_get_confidence_intervals():
+    samples = np.array([
+        np.arange(101.0),
+        np.where(np.arange(101) <= 80, np.arange(101.0), np.nan),
+        np.full(101, np.nan),
+    ])
+
+    lower, upper = get_confidence_intervals(samples, confidence_level=0.9)
+
+    np.testing.assert_allclose([5.0, 95.0], [lower[0], upper[0]])
+    # Samples without a statistic are left out.
+    np.testing.assert_allclose([4.0, 76.0], [lower[1], upper[1]])
+    assert np.isnan(lower[2]) and np.isnan(upper[2])
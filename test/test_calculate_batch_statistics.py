@@ -0,0 +1,53 @@
+from unittest.mock import patch
+
+import pytest
+
+from src.calculate_batch_statistics import get_batch_climate_context_data
+from src.calculate_statistics import calculate_weather_variable_statistics
+from src.definitions import WeatherModel, WeatherVariableName, WeatherVariable, Coordinate
+from test.test_api_request import coordinate
+from test.test_calculate_statistics import climate_context_weather_data
+
+
+@pytest.mark.asyncio
+async def test_get_batch_climate_context_data(coordinate, climate_context_weather_data):
+    same_cell_coordinate = Coordinate(
+        timestamp=coordinate.timestamp + 60,
+        latitude=coordinate.latitude + 0.01,
+        longitude=coordinate.longitude
+    )
+    other_cell_coordinate = Coordinate(
+        timestamp=coordinate.timestamp,
+        latitude=coordinate.latitude + 1,
+        longitude=coordinate.longitude
+    )
+
+    with patch(
+            'src.calculate_batch_statistics.get_forecast_and_historical_data_for_variables',
+            return_value=climate_context_weather_data
+    ) as mock_get_forecast_and_historical_data:
+        batch_climate_context_data = await get_batch_climate_context_data(
+            coordinates=[coordinate, same_cell_coordinate, other_cell_coordinate],
+            weather_model=WeatherModel.ERA5,
+            weather_variable_names=[WeatherVariableName.TEMPERATURE, WeatherVariableName.PRECIPITATION]
+        )
+
+    assert 2 == mock_get_forecast_and_historical_data.call_count
+    assert 3 == len(batch_climate_context_data)
+    assert same_cell_coordinate.latitude == batch_climate_context_data[1]['latitude']
+
+    for weather_variable, weather_variable_name in [
+        (WeatherVariable.TEMPERATURE, WeatherVariableName.TEMPERATURE),
+        (WeatherVariable.PRECIPITATION, WeatherVariableName.PRECIPITATION)
+    ]:
+        expected = calculate_weather_variable_statistics(
+            coordinate,
+            WeatherModel.ERA5,
+            *climate_context_weather_data[weather_variable],
+            weather_variable_name
+        )
+        for location_climate_context_data in batch_climate_context_data:
+            actual = location_climate_context_data[weather_variable_name.value]
+            assert 12 == len(actual)
+            for key, value in actual.items():
+                assert expected[key] == pytest.approx(value)
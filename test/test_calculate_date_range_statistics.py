@@ -0,0 +1,74 @@
+from datetime import date, datetime, time
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from src.calculate_date_range_statistics import get_date_range_climate_context_data
+from src.calculate_statistics import calculate_weather_variable_statistics
+from src.definitions import WeatherModel, WeatherVariableName, WeatherVariable, Coordinate, ReturnPeriodMethod
+from test.test_api_request import coordinate
+from test.test_calculate_statistics import climate_context_weather_data
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('return_period_method', list(ReturnPeriodMethod))
+async def test_get_date_range_climate_context_data(coordinate, climate_context_weather_data, return_period_method):
+    with patch(
+            'src.calculate_date_range_statistics.get_forecast_data_for_dates',
+            return_value={
+                weather_variable: forecast_data
+                for weather_variable, (forecast_data, _) in climate_context_weather_data.items()
+            }
+    ) as mock_get_forecast_data, patch(
+            'src.calculate_date_range_statistics.get_historical_data_for_variables',
+            return_value={
+                weather_variable: historical_data
+                for weather_variable, (_, historical_data) in climate_context_weather_data.items()
+            }
+    ) as mock_get_historical_data:
+        date_range_climate_context_data = await get_date_range_climate_context_data(
+            latitude=coordinate.latitude,
+            longitude=coordinate.longitude,
+            start_date=date(2023, 6, 19),
+            end_date=date(2023, 6, 22),
+            weather_model=WeatherModel.ERA5,
+            weather_variable_names=[WeatherVariableName.TEMPERATURE, WeatherVariableName.PRECIPITATION],
+            return_period_method=return_period_method
+        )
+
+    assert 1 == mock_get_forecast_data.call_count
+    assert datetime(2023, 5, 20).date() == mock_get_forecast_data.call_args.kwargs['start_date'].date()
+    assert 1 == mock_get_historical_data.call_count
+    assert ['2023-06-19', '2023-06-20', '2023-06-21', '2023-06-22'] == \
+        [day_data['date'] for day_data in date_range_climate_context_data]
+
+    for weather_variable, weather_variable_name in [
+        (WeatherVariable.TEMPERATURE, WeatherVariableName.TEMPERATURE),
+        (WeatherVariable.PRECIPITATION, WeatherVariableName.PRECIPITATION)
+    ]:
+        for day_data in date_range_climate_context_data:
+            day = datetime.combine(date.fromisoformat(day_data['date']), time(12))
+            expected = calculate_weather_variable_statistics(
+                Coordinate(timestamp=int(day.timestamp()), latitude=coordinate.latitude, longitude=coordinate.longitude),
+                WeatherModel.ERA5,
+                *climate_context_weather_data[weather_variable],
+                weather_variable_name,
+                return_period_method=return_period_method
+            )
+            actual = day_data[weather_variable_name.value]
+            assert 12 == len(actual)
+            for key, value in actual.items():
+                assert expected[key] == pytest.approx(value)
+
+
+def test_date_range_rejects_reversed_range():
+    response = TestClient(app).get('/date-range', params={
+        'latitude': 48.35,
+        'longitude': 10.88,
+        'start_date': '2023-06-22',
+        'end_date': '2023-06-19'
+    })
+
+    assert 422 == response.status_code
@@ -0,0 +1,90 @@
+import io
+from unittest.mock import patch
+
+import pytest
+import xarray as xr
+from fastapi.testclient import TestClient
+
+from main import app
+from src.calculate_batch_statistics import calculate_stacked_statistics
+from src.calculate_map_statistics import get_map_data, MapTooLargeException
+from src.definitions import WeatherModel, WeatherVariableName, WeatherVariable
+from test.test_api_request import coordinate
+from test.test_calculate_statistics import climate_context_weather_data
+
+
+@pytest.fixture
+def mock_fetch_batch_weather_data(climate_context_weather_data):
+    async def fetch_batch_weather_data(coordinates, weather_variables, weather_model):
+        return [climate_context_weather_data] * len(coordinates)
+
+    with patch('src.calculate_map_statistics.fetch_batch_weather_data', side_effect=fetch_batch_weather_data) as mock:
+        yield mock
+
+
+@pytest.mark.asyncio
+async def test_get_map_data(coordinate, climate_context_weather_data, mock_fetch_batch_weather_data):
+    map_data = await get_map_data(
+        south=48.2,
+        north=48.5,
+        west=10.7,
+        east=11.1,
+        timestamp=coordinate.timestamp,
+        weather_model=WeatherModel.ERA5,
+        weather_variable_names=[WeatherVariableName.TEMPERATURE, WeatherVariableName.PRECIPITATION]
+    )
+
+    assert [48.25, 48.5] == map_data['latitude'].values.tolist()
+    assert [10.75, 11.0] == map_data['longitude'].values.tolist()
+    assert 4 == len(mock_fetch_batch_weather_data.call_args.args[0])
+    for weather_variable, weather_variable_name in [
+        (WeatherVariable.TEMPERATURE, WeatherVariableName.TEMPERATURE),
+        (WeatherVariable.PRECIPITATION, WeatherVariableName.PRECIPITATION)
+    ]:
+        expected = calculate_stacked_statistics(
+            [coordinate], WeatherModel.ERA5, [climate_context_weather_data[weather_variable]], weather_variable,
+            weather_variable_name
+        )[0]
+        for time_frame in ['daily', 'weekly', 'monthly']:
+            return_periods = map_data[f'{time_frame}_return_period_{weather_variable_name.value}']
+            anomalies = map_data[f'{time_frame}_anomaly_{weather_variable_name.value}']
+            assert ('latitude', 'longitude') == return_periods.dims
+            assert expected[f'{time_frame}_return_period_{weather_variable_name.value}'] == \
+                pytest.approx(float(return_periods.sel(latitude=48.5, longitude=11.0)))
+            assert expected[f'{time_frame}_current_{weather_variable_name.value}'] - \
+                expected[f'{time_frame}_average_{weather_variable_name.value}'] == \
+                pytest.approx(float(anomalies.sel(latitude=48.25, longitude=10.75)))
+
+
+@pytest.mark.asyncio
+async def test_get_map_data_rejects_too_many_cells(coordinate):
+    with pytest.raises(MapTooLargeException):
+        await get_map_data(
+            south=40.0,
+            north=55.0,
+            west=0.0,
+            east=15.0,
+            timestamp=coordinate.timestamp,
+            weather_model=WeatherModel.ERA5,
+            weather_variable_names=[WeatherVariableName.TEMPERATURE]
+        )
+
+
+def test_map_endpoint_returns_netcdf(coordinate, mock_fetch_batch_weather_data):
+    parameters = {
+        'south': 48.2, 'north': 48.5, 'west': 10.7, 'east': 11.1, 'timestamp': coordinate.timestamp,
+        'weather_variables': ['temperature']
+    }
+    client = TestClient(app)
+
+    response = client.get('/map', params=parameters)
+    json_response = client.get('/map', params={**parameters, 'format': 'json'})
+
+    assert 200 == response.status_code
+    assert 'application/x-netcdf' == response.headers['content-type']
+    with xr.open_dataset(io.BytesIO(response.content)) as map_data:
+        assert (2, 2) == map_data['daily_return_period_temperature'].shape
+        assert 'float32' == map_data['daily_return_period_temperature'].dtype
+        assert json_response.json()['variables']['daily_return_period_temperature'][0][0] == \
+            pytest.approx(float(map_data['daily_return_period_temperature'][0, 0]))
+    assert 422 == client.get('/map', params={**parameters, 'south': 49.0}).status_code
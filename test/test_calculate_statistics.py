@@ -1,13 +1,19 @@
+from pathlib import Path
 from unittest.mock import patch
 
 import numpy as np
 import pandas as pd
 import pytest
 from numpy.random import default_rng
-from scipy.stats import genextreme, gamma
+from scipy.stats import genextreme, gamma, norm
 
 from src.calculate_statistics import calculate_return_period, calculate_cumulative_probability, WeatherVariable, \
-    ReturnPeriodMode, calculate_last_occurrence
+    ReturnPeriodMode, calculate_last_occurrence, get_climate_context_data, calculate_weather_variable_statistics, \
+    calculate_return_period_intervals
+from src.definitions import WeatherModel, WeatherVariableName, TimeFrame, ReturnPeriodMethod
+from src.fit_cache import FitKey
+from src.fit_distribution import fit_gamma
+from test.test_api_request import coordinate
 
 TEMPERATURE_C = 0
 TEMPERATURE_LOCATION = 15
@@ -214,6 +220,36 @@ async def test_calculate_cumulative_probability_precipitation_outlier(
     assert cumulative_probability == pytest.approx(1)
 
 
+def test_calculate_cumulative_probability_cached_fit(temperature_timeseries, fit_cache):
+    fit_key = FitKey(
+        latitude=48.25,
+        longitude=11.0,
+        weather_model=WeatherModel.ERA5,
+        weather_variable=WeatherVariable.TEMPERATURE,
+        day_of_year='06-22',
+        time_frame=TimeFrame.DAILY,
+        archive_end_date='2022-06-27'
+    )
+    expected = calculate_cumulative_probability(
+        timeseries=temperature_timeseries,
+        current_value=20,
+        weather_variable=WeatherVariable.TEMPERATURE,
+        fit_key=fit_key
+    )
+
+    with patch.object(norm, 'fit') as mock_fit:
+        actual = calculate_cumulative_probability(
+            timeseries=temperature_timeseries,
+            current_value=20,
+            weather_variable=WeatherVariable.TEMPERATURE,
+            fit_key=fit_key
+        )
+
+    mock_fit.assert_not_called()
+    assert expected == pytest.approx(actual)
+    assert 1 == fit_cache.hits
+
+
 @pytest.mark.asyncio
 @patch(
     'src.calculate_statistics.calculate_cumulative_probability',
@@ -266,6 +302,56 @@ async def test_calculate_return_period_mode_max(
     assert return_period == pytest.approx(expected=3, rel=0.1)
 
 
+def test_calculate_return_period_empirical(temperature_timeseries):
+    highest_value = float(temperature_timeseries.iloc[:, 0].max())
+
+    with patch('src.calculate_statistics.calculate_cumulative_probability') as calculate_cumulative_probability_mock:
+        return_period = calculate_return_period(
+            timeseries=temperature_timeseries,
+            current_value=highest_value,
+            mode=ReturnPeriodMode.MAX,
+            method=ReturnPeriodMethod.EMPIRICAL
+        )
+
+    calculate_cumulative_probability_mock.assert_not_called()
+    # The highest of 73 years is reached in one year and by the current value.
+    assert (73 + 2) / 2 == return_period
+
+
+@pytest.mark.parametrize('method', list(ReturnPeriodMethod))
+def test_calculate_return_period_intervals(temperature_timeseries, method):
+    values = temperature_timeseries.iloc[:, 0].to_numpy()
+    current_values = np.array([np.quantile(values, 0.9), np.quantile(values, 0.1)])
+    mean_values = np.full(2, np.mean(values))
+
+    lower_bounds, upper_bounds = calculate_return_period_intervals(
+        np.stack([values, values]), current_values, mean_values, WeatherVariable.TEMPERATURE, method
+    )
+
+    for current_value, mode, lower_bound, upper_bound in zip(
+            current_values, [ReturnPeriodMode.MAX, ReturnPeriodMode.MIN], lower_bounds, upper_bounds
+    ):
+        return_period = calculate_return_period(temperature_timeseries, current_value, mode, method=method)
+        assert lower_bound <= return_period <= upper_bound
+        assert lower_bound < upper_bound
+
+
+def test_calculate_return_period_intervals_of_inaccurate_fits():
+    rng = default_rng(1)
+    dry_values = np.where(rng.random(40) < 0.6, 0.0, np.round(rng.gamma(0.8, 5.0, 40), 1))
+    wet_values = np.round(rng.gamma(4.0, 2.0, 40) + 1.0, 1)
+    values = np.stack([dry_values, wet_values])
+    _, accurate = fit_gamma(values)
+
+    lower_bounds, upper_bounds = calculate_return_period_intervals(
+        values, np.array([6.0, 12.0]), np.nanmean(values, axis=1), WeatherVariable.PRECIPITATION
+    )
+
+    np.testing.assert_array_equal([False, True], accurate)
+    assert np.isnan(lower_bounds[0]) and np.isnan(upper_bounds[0])
+    assert lower_bounds[1] < upper_bounds[1]
+
+
 def test_calculate_last_occurrence_max(temperature_timeseries):
     current_temperature = 20
     expected_last_occurrence = 2017
@@ -316,3 +402,99 @@ def test_calculate_last_occurrence_max_never(temperature_timeseries):
     )
 
     assert expected_last_occurrence == actual_last_occurrence
+
+
+@pytest.fixture
+def climate_context_weather_data(coordinate):
+    historical_data = pd.read_csv(Path(__file__).parent / 'historical_test_data.csv', index_col=0, parse_dates=True)
+    historical_data = historical_data.dropna()
+    forecast_data = historical_data.loc['2022-05-23':'2022-06-22']
+    forecast_data = forecast_data.set_index(forecast_data.index + pd.DateOffset(years=1))
+
+    def as_precipitation(weather_data):
+        return pd.DataFrame(
+            data=weather_data.abs().values,
+            index=weather_data.index,
+            columns=[WeatherVariable.PRECIPITATION.value]
+        )
+    return {
+        WeatherVariable.TEMPERATURE: (forecast_data, historical_data),
+        WeatherVariable.PRECIPITATION: (as_precipitation(forecast_data), as_precipitation(historical_data))
+    }
+
+
+@pytest.mark.asyncio
+async def test_get_climate_context_data(coordinate, climate_context_weather_data):
+    with patch(
+            'src.calculate_statistics.get_forecast_and_historical_data_for_variables',
+            return_value=climate_context_weather_data
+    ) as mock_get_forecast_and_historical_data:
+        climate_context_data = await get_climate_context_data(
+            coordinate=coordinate,
+            weather_model=WeatherModel.ERA5,
+            weather_variable_names=[WeatherVariableName.TEMPERATURE, WeatherVariableName.PRECIPITATION]
+        )
+
+    assert 1 == mock_get_forecast_and_historical_data.call_count
+    assert [WeatherVariable.TEMPERATURE, WeatherVariable.PRECIPITATION] == \
+        mock_get_forecast_and_historical_data.call_args.kwargs['weather_variables']
+    assert climate_context_data['temperature'] == calculate_weather_variable_statistics(
+        coordinate,
+        WeatherModel.ERA5,
+        *climate_context_weather_data[WeatherVariable.TEMPERATURE],
+        WeatherVariableName.TEMPERATURE
+    )
+    assert 'daily_return_period_precipitation' in climate_context_data['precipitation']
+
+
+@pytest.fixture
+def dry_precipitation_weather_data(climate_context_weather_data):
+    """Daily precipitation without rain on most days, whose fast gamma fits lie at the edge of their locations."""
+    forecast_data, historical_data = climate_context_weather_data[WeatherVariable.TEMPERATURE]
+    rng = default_rng(1)
+    precipitation = np.where(
+        rng.random(len(historical_data)) < 0.6, 0.0, np.round(rng.gamma(0.8, 5.0, len(historical_data)), 1)
+    )
+    historical_data = pd.DataFrame(
+        data=precipitation, index=historical_data.index, columns=[WeatherVariable.PRECIPITATION.value]
+    )
+    forecast_data = historical_data.loc['2022-05-23':'2022-06-22'].copy()
+    # Rain on the requested day, so that its return period follows from the fit.
+    forecast_data.iloc[-1] = 6.0
+    return forecast_data.set_index(forecast_data.index + pd.DateOffset(years=1)), historical_data
+
+
+@pytest.mark.parametrize('method', list(ReturnPeriodMethod))
+@pytest.mark.parametrize('weather_variable_name', list(WeatherVariableName))
+def test_calculate_weather_variable_statistics_confidence_intervals(
+        coordinate, climate_context_weather_data, dry_precipitation_weather_data, method, weather_variable_name
+):
+    weather_data = climate_context_weather_data[WeatherVariable.TEMPERATURE] \
+        if WeatherVariableName.TEMPERATURE == weather_variable_name else dry_precipitation_weather_data
+    statistics = calculate_weather_variable_statistics(
+        coordinate,
+        WeatherModel.ERA5,
+        *weather_data,
+        weather_variable_name,
+        return_period_method=method,
+        confidence_intervals=True
+    )
+
+    for time_frame in TimeFrame:
+        lower_bound = statistics[f'{time_frame.value}_return_period_lower_{weather_variable_name.value}']
+        upper_bound = statistics[f'{time_frame.value}_return_period_upper_{weather_variable_name.value}']
+        if np.isnan(lower_bound):
+            # The fast fits to dry precipitation are inaccurate and do not bootstrap the refitted distribution.
+            assert ReturnPeriodMethod.FIT == method and WeatherVariableName.PRECIPITATION == weather_variable_name
+            assert np.isnan(upper_bound)
+        else:
+            assert lower_bound <= statistics[f'{time_frame.value}_return_period_{weather_variable_name.value}'] <= \
+                upper_bound
+    np.testing.assert_equal(statistics, calculate_weather_variable_statistics(
+        coordinate,
+        WeatherModel.ERA5,
+        *weather_data,
+        weather_variable_name,
+        return_period_method=method,
+        confidence_intervals=True
+    ))
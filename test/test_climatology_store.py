@@ -0,0 +1,131 @@
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import pytest
+import pytest_asyncio
+
+from src.build_climatology import build_climatology_store
+from src.calculate_statistics import get_weather_variable_data, calculate_weather_variable_statistics, \
+    calculate_weather_variable_statistics_from_climatology
+from src.climatology_store import CLIMATOLOGY_STORE, get_day_of_year_index, get_month_and_day
+from src.definitions import WeatherModel, WeatherVariable, WeatherVariableName, Coordinate, TimeFrame
+from test.test_api_request import coordinate
+
+
+@pytest.fixture
+def historical_data():
+    return pd.read_csv(Path(__file__).parent / 'historical_test_data.csv', index_col=0, parse_dates=True).dropna()
+
+
+@pytest.fixture
+def forecast_data(historical_data):
+    forecast_data = historical_data.loc['2022-05-23':'2022-06-22']
+    return forecast_data.set_index(forecast_data.index + pd.DateOffset(years=1))
+
+
+@pytest_asyncio.fixture
+async def climatology_store(historical_data):
+    with patch(
+            'src.build_climatology.get_historical_data_for_variables',
+            return_value={WeatherVariable.TEMPERATURE: historical_data}
+    ):
+        await build_climatology_store(
+            climatology_store=CLIMATOLOGY_STORE,
+            weather_model=WeatherModel.ERA5,
+            weather_variables=[WeatherVariable.TEMPERATURE],
+            latitude_range=(48.25, 48.5),
+            longitude_range=(10.75, 11.0),
+            year=2023
+        )
+    return CLIMATOLOGY_STORE
+
+
+def test_day_of_year_index():
+    assert 59 == get_day_of_year_index(2, 29)
+    assert (2, 29) == get_month_and_day(59)
+    assert (12, 31) == get_month_and_day(365)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('forecast_start, forecast_end, month, day', [
+    ('2022-05-23', '2022-06-22', 6, 22),
+    # The daily values of January start a year earlier than the weekly and monthly values.
+    ('2021-12-16', '2022-01-15', 1, 15),
+])
+async def test_get_weather_variable_data_from_climatology_store(
+        climatology_store,
+        coordinate,
+        historical_data,
+        forecast_start,
+        forecast_end,
+        month,
+        day
+):
+    forecast_data = historical_data.loc[forecast_start:forecast_end]
+    forecast_data = forecast_data.set_index(forecast_data.index + pd.DateOffset(years=1))
+    day_coordinate = Coordinate(
+        timestamp=int(datetime(2023, month, day, 12).timestamp()),
+        latitude=coordinate.latitude,
+        longitude=coordinate.longitude
+    )
+    expected = calculate_weather_variable_statistics(
+        day_coordinate,
+        WeatherModel.ERA5,
+        forecast_data,
+        historical_data,
+        WeatherVariableName.TEMPERATURE
+    )
+
+    with patch(
+            'src.calculate_statistics.get_forecast_data_for_variables',
+            return_value={WeatherVariable.TEMPERATURE: forecast_data}
+    ), patch('src.calculate_statistics.get_forecast_and_historical_data') as mock_get_forecast_and_historical_data:
+        actual = await get_weather_variable_data(
+            coordinate=day_coordinate,
+            weather_model=WeatherModel.ERA5,
+            weather_variable=WeatherVariable.TEMPERATURE,
+            weather_variable_name=WeatherVariableName.TEMPERATURE
+        )
+
+    mock_get_forecast_and_historical_data.assert_not_called()
+    assert list(expected) == list(actual)
+    for key, value in expected.items():
+        np.testing.assert_allclose(value, actual[key])
+
+
+def test_climatology_with_missing_values(climatology_store, coordinate, forecast_data):
+    climatology = climatology_store.load(coordinate, WeatherModel.ERA5, WeatherVariable.TEMPERATURE)
+    weekly_values = climatology.historical_values[TimeFrame.WEEKLY].copy()
+    weekly_values[0] = np.nan
+    climatology = climatology._replace(
+        historical_values={**climatology.historical_values, TimeFrame.WEEKLY: weekly_values}
+    )
+
+    statistics = calculate_weather_variable_statistics_from_climatology(
+        coordinate,
+        forecast_data,
+        climatology,
+        WeatherVariable.TEMPERATURE,
+        WeatherVariableName.TEMPERATURE
+    )
+
+    assert np.nanmean(weekly_values) == statistics['weekly_average_temperature']
+    assert np.isfinite(statistics['weekly_return_period_temperature'])
+
+
+@pytest.mark.asyncio
+async def test_climatology_store_does_not_cover_coordinate(climatology_store, coordinate):
+    outside_region = Coordinate(timestamp=coordinate.timestamp, latitude=50, longitude=coordinate.longitude)
+    next_year = Coordinate(
+        timestamp=coordinate.timestamp + 365 * 24 * 3600,
+        latitude=coordinate.latitude,
+        longitude=coordinate.longitude
+    )
+
+    assert climatology_store.load(coordinate, WeatherModel.ERA5, WeatherVariable.TEMPERATURE) is not None
+    assert climatology_store.load(outside_region, WeatherModel.ERA5, WeatherVariable.TEMPERATURE) is None
+    assert climatology_store.load(next_year, WeatherModel.ERA5, WeatherVariable.TEMPERATURE) is None
+    assert climatology_store.load(coordinate, WeatherModel.ERA5, WeatherVariable.PRECIPITATION) is None
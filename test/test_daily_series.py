@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from src.daily_series import DailySeries, as_daily_series
+from src.definitions import WeatherVariable
+
+
+def test_daily_series_from_dates_places_values_on_consecutive_days():
+    series = DailySeries.from_dates(
+        ['2000-01-01', '2000-01-02', '2000-01-04'], [1.5, None, 2.1], WeatherVariable.TEMPERATURE
+    )
+
+    assert np.datetime64('2000-01-01') == series.start_date
+    assert np.datetime64('2000-01-04') == series.end_date
+    assert np.float32 == series.values.dtype
+    np.testing.assert_array_equal([False, True, True, False], series.mask)
+    # Widening restores the published decimals, which float32 does not represent exactly.
+    assert [1.5, 2.1] == series.to_data_frame().iloc[:, 0].tolist()
+
+
+def test_daily_series_round_trips_data_frame():
+    data_frame = pd.DataFrame(
+        data=[20.5, 14.6, 20.9],
+        index=pd.DatetimeIndex(['2023-05-23', '2023-05-24', '2023-05-26']),
+        columns=[WeatherVariable.TEMPERATURE.value]
+    )
+
+    series = as_daily_series(data_frame)
+
+    assert series is as_daily_series(series)
+    assert WeatherVariable.TEMPERATURE == series.weather_variable
+    pd.testing.assert_frame_equal(data_frame, series.to_data_frame())
+
+
+def test_daily_series_slice_and_window():
+    series = DailySeries(np.datetime64('2000-01-01'), np.arange(10), WeatherVariable.TEMPERATURE)
+
+    sliced = series.slice(start_date='2000-01-03', end_date='2000-01-05')
+
+    assert np.datetime64('2000-01-03') == sliced.start_date
+    assert [2.0, 3.0, 4.0] == sliced.values.tolist()
+    assert np.shares_memory(series.values, sliced.values)
+    np.testing.assert_array_equal(
+        [np.nan, 0.0, 1.0], series.window('1999-12-31', '2000-01-02')
+    )
+    np.testing.assert_array_equal([8.0, 9.0, np.nan], series.window('2000-01-09', '2000-01-11'))
+
+
+def test_daily_series_append_replaces_overlapping_days():
+    series = DailySeries(np.datetime64('2000-01-01'), [1.0, 2.0, 3.0], WeatherVariable.TEMPERATURE)
+    tail = DailySeries(np.datetime64('2000-01-03'), [4.0, 5.0], WeatherVariable.TEMPERATURE)
+
+    appended = series.append(tail)
+
+    assert np.datetime64('2000-01-01') == appended.start_date
+    assert [1.0, 2.0, 4.0, 5.0] == appended.values.tolist()
+    assert appended is appended.append(DailySeries.from_dates([], [], WeatherVariable.TEMPERATURE))
@@ -0,0 +1,55 @@
+import numpy as np
+from numpy.random import default_rng
+
+from src.definitions import ReturnPeriodMode
+from src.empirical_distribution import EmpiricalDistribution
+
+
+def test_empirical_distribution_counts_many_series():
+    rng = default_rng(42)
+    values = np.round(rng.normal(15.0, 5.0, size=(30, 85)), 1)
+    values[rng.random(values.shape) < 0.1] = np.nan
+    current_values = np.round(rng.normal(15.0, 8.0, size=30), 1)
+    # Values of the series themselves are counted as reached.
+    current_values[:5] = values[:5, 0]
+
+    distribution = EmpiricalDistribution(values)
+
+    np.testing.assert_array_equal(
+        np.sum(values >= current_values[:, np.newaxis], axis=1),
+        distribution.count(current_values, ReturnPeriodMode.MAX)
+    )
+    np.testing.assert_array_equal(
+        np.sum(values <= current_values[:, np.newaxis], axis=1),
+        distribution.count(current_values, ReturnPeriodMode.MIN)
+    )
+
+
+def test_empirical_distribution_counts_many_values_of_single_series():
+    values = np.array([3.0, np.nan, 1.0, 2.0, 2.0])
+
+    distribution = EmpiricalDistribution(values)
+
+    assert [4, 4, 3, 1, 0] == distribution.count([0.0, 1.0, 2.0, 2.5, 3.5], ReturnPeriodMode.MAX).tolist()
+    assert [0, 1, 3, 3, 4] == distribution.count([0.0, 1.0, 2.0, 2.5, 3.5], ReturnPeriodMode.MIN).tolist()
+
+
+def test_empirical_distribution_return_periods():
+    distribution = EmpiricalDistribution(np.arange(1.0, 10.0))
+
+    return_periods = distribution.return_periods(
+        [9.0, 100.0, 1.0, np.nan],
+        [ReturnPeriodMode.MAX, ReturnPeriodMode.MAX, ReturnPeriodMode.MIN, ReturnPeriodMode.MAX]
+    )
+
+    # Ranked among the 9 historical values and itself, with Weibull plotting positions.
+    np.testing.assert_allclose([11 / 2, 11, 11 / 2, np.nan], return_periods)
+
+
+def test_empirical_distribution_return_periods_of_series_without_values():
+    distribution = EmpiricalDistribution(np.array([[1.0, 2.0], [np.nan, np.nan]]))
+
+    return_periods = distribution.return_periods(np.array([3.0, 3.0]), ReturnPeriodMode.MAX)
+
+    assert 4.0 == return_periods[0]
+    assert np.isnan(return_periods[1])
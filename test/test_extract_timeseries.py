@@ -1,10 +1,14 @@
+from datetime import datetime
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 import pytest
 
-from src.definitions import WeatherVariable
-from src.extract_timeseries import get_historical_timeseries
+from src.daily_series import DailySeries
+from src.definitions import WeatherVariable, Coordinate
+from src.extract_timeseries import get_historical_timeseries, get_end_dates, calculate_trailing_means, \
+    get_historical_timeseries_stacked
 from test.test_api_request import coordinate
 
 
@@ -109,3 +113,34 @@ def test_get_historical_timeseries(coordinate, historical_data, daily_data, week
     pd.testing.assert_frame_equal(daily_data, actual_daily_data)
     pd.testing.assert_frame_equal(weekly_data, actual_weekly_data)
     pd.testing.assert_frame_equal(monthly_data, actual_monthly_data)
+
+
+@pytest.mark.parametrize('date', [datetime(2023, 1, 15, 12), datetime(2023, 6, 22, 12), datetime(2024, 2, 29, 12)])
+def test_get_historical_timeseries_stacked_matches_get_historical_timeseries(historical_data, date):
+    series = DailySeries.from_data_frame(historical_data)
+    date_coordinate = Coordinate(timestamp=int(date.timestamp()), latitude=48.25, longitude=11.0)
+
+    expected = get_historical_timeseries(date_coordinate, series)
+    years, *actual = get_historical_timeseries_stacked(
+        series.to_float64()[np.newaxis], series.start_date, date.year, date.month, date.day
+    )
+
+    for expected_data, actual_values in zip(expected, actual):
+        expected_data = expected_data.dropna()
+        available = ~np.isnan(actual_values[0])
+        np.testing.assert_array_equal(expected_data.index, years[available])
+        np.testing.assert_allclose(expected_data.iloc[:, 0].to_numpy(), actual_values[0, available])
+
+
+def test_get_end_dates_leap_day():
+    actual = get_end_dates(np.array([2019, 2020]), month=2, day=29)
+
+    np.testing.assert_array_equal(np.array(['2019-02-28', '2020-02-29'], dtype='datetime64[D]'), actual)
+
+
+def test_calculate_trailing_means_ignores_missing_values():
+    values = np.array([1.0, np.nan, 3.0, 5.0, np.nan, np.nan])
+
+    actual = calculate_trailing_means(values, end_offsets=np.array([0, 2, 3, 5]), window_length=3)
+
+    np.testing.assert_array_equal(np.array([1.0, 2.0, 4.0, 5.0]), actual)
@@ -0,0 +1,136 @@
+import multiprocessing
+
+from src.definitions import WeatherVariable, TimeFrame, WeatherModel
+from src.fit_cache import FitCache, FitKey, SharedFitCache
+
+
+def get_fit_key(day_of_year, archive_end_date='2022-06-27', weather_model=WeatherModel.ERA5):
+    return FitKey(
+        latitude=48.25,
+        longitude=11.0,
+        weather_model=weather_model,
+        weather_variable=WeatherVariable.TEMPERATURE,
+        day_of_year=day_of_year,
+        time_frame=TimeFrame.DAILY,
+        archive_end_date=archive_end_date
+    )
+
+
+def test_fit_cache_hit_and_miss():
+    fit_cache = FitCache(max_size=2)
+
+    assert fit_cache.get(get_fit_key('06-22')) is None
+    fit_cache.put(get_fit_key('06-22'), (20.1, 3.5))
+
+    assert (20.1, 3.5) == fit_cache.get(get_fit_key('06-22'))
+    assert 1 == fit_cache.hits
+    assert 1 == fit_cache.misses
+
+
+def test_fit_cache_peek_is_not_counted():
+    fit_cache = FitCache(max_size=2)
+    fit_cache.put(get_fit_key('06-22'), (20.1, 3.5))
+
+    assert (20.1, 3.5) == fit_cache.peek(get_fit_key('06-22'))
+    assert fit_cache.peek(get_fit_key('06-23')) is None
+    assert 0 == fit_cache.hits
+    assert 0 == fit_cache.misses
+
+
+def test_fit_cache_evicts_least_recently_used():
+    fit_cache = FitCache(max_size=2)
+    fit_cache.put(get_fit_key('06-21'), (20.1, 3.5))
+    fit_cache.put(get_fit_key('06-22'), (20.2, 3.5))
+    fit_cache.get(get_fit_key('06-21'))
+
+    fit_cache.put(get_fit_key('06-23'), (20.3, 3.5))
+
+    assert 2 == len(fit_cache)
+    assert fit_cache.get(get_fit_key('06-22')) is None
+    assert (20.1, 3.5) == fit_cache.get(get_fit_key('06-21'))
+
+
+def test_fit_cache_separates_weather_models():
+    fit_cache = FitCache(max_size=4)
+    fit_cache.put(get_fit_key('06-22'), (20.1, 3.5))
+    fit_cache.put(get_fit_key('06-22', weather_model=WeatherModel.ERA5_LAND), (19.8, 3.6))
+
+    fit_cache.invalidate(48.25, 11.0, WeatherModel.ERA5_LAND, WeatherVariable.TEMPERATURE, '2022-06-26')
+
+    assert (20.1, 3.5) == fit_cache.get(get_fit_key('06-22'))
+    assert fit_cache.get(get_fit_key('06-22', weather_model=WeatherModel.ERA5_LAND)) is None
+
+
+def test_fit_cache_invalidates_fits_to_revised_archive():
+    fit_cache = FitCache(max_size=4)
+    fit_cache.put(get_fit_key('06-20', '2022-06-25'), (20.1, 3.5))
+    fit_cache.put(get_fit_key('06-22', '2022-06-27'), (20.2, 3.5))
+
+    fit_cache.invalidate(48.25, 11.0, WeatherModel.ERA5, WeatherVariable.TEMPERATURE, '2022-06-26')
+
+    assert (20.1, 3.5) == fit_cache.get(get_fit_key('06-20', '2022-06-25'))
+    assert fit_cache.get(get_fit_key('06-22', '2022-06-27')) is None
+
+
+def put_in_other_process(path):
+    SharedFitCache(path, max_size=16).put(get_fit_key('06-22'), (20.1, 3.5))
+
+
+def test_shared_fit_cache_is_shared_between_processes(tmp_path):
+    path = str(tmp_path / 'fit_cache.npy')
+    shared_fit_cache = SharedFitCache(path, max_size=16)
+    assert shared_fit_cache.get(get_fit_key('06-22')) is None
+
+    process = multiprocessing.get_context('spawn').Process(target=put_in_other_process, args=(path,))
+    process.start()
+    process.join()
+
+    assert 0 == process.exitcode
+    assert (20.1, 3.5) == shared_fit_cache.get(get_fit_key('06-22'))
+    assert 1 == len(shared_fit_cache)
+
+
+def test_shared_fit_cache_replaces_slots_when_full(tmp_path):
+    shared_fit_cache = SharedFitCache(str(tmp_path / 'fit_cache.npy'), max_size=4)
+    for day in range(10, 20):
+        shared_fit_cache.put(get_fit_key(f'06-{day}'), (float(day), 1.0, 2.0))
+
+    assert 4 == len(shared_fit_cache)
+    assert (19.0, 1.0, 2.0) == shared_fit_cache.get(get_fit_key('06-19'))
+
+    shared_fit_cache.clear()
+
+    assert 0 == len(shared_fit_cache)
+
+
+def test_shared_fit_cache_ignores_partially_written_slots(tmp_path):
+    shared_fit_cache = SharedFitCache(str(tmp_path / 'fit_cache.npy'), max_size=4)
+    shared_fit_cache.put(get_fit_key('06-22'), (20.1, 3.5))
+
+    shared_fit_cache.slots()['parameters'][:, 0] = 99.0
+
+    assert shared_fit_cache.get(get_fit_key('06-22')) is None
+
+
+def test_shared_fit_cache_invalidates_fits_to_revised_archive(tmp_path):
+    shared_fit_cache = SharedFitCache(str(tmp_path / 'fit_cache.npy'), max_size=16)
+    shared_fit_cache.put(get_fit_key('06-20', '2022-06-25'), (20.1, 3.5))
+    shared_fit_cache.put(get_fit_key('06-22', '2022-06-27'), (20.2, 3.5))
+
+    shared_fit_cache.invalidate(48.25, 11.0, WeatherModel.ERA5, WeatherVariable.PRECIPITATION, '2022-06-26')
+    shared_fit_cache.invalidate(48.25, 11.0, WeatherModel.ERA5_LAND, WeatherVariable.TEMPERATURE, '2022-06-26')
+    assert 2 == len(shared_fit_cache)
+    shared_fit_cache.invalidate(48.25, 11.0, WeatherModel.ERA5, WeatherVariable.TEMPERATURE, '2022-06-26')
+
+    assert (20.1, 3.5) == shared_fit_cache.get(get_fit_key('06-20', '2022-06-25'))
+    assert shared_fit_cache.get(get_fit_key('06-22', '2022-06-27')) is None
+
+
+def test_shared_fit_cache_peek_is_not_counted(tmp_path):
+    shared_fit_cache = SharedFitCache(str(tmp_path / 'fit_cache.npy'), max_size=16)
+    shared_fit_cache.put(get_fit_key('06-22'), (20.1, 3.5))
+
+    assert (20.1, 3.5) == shared_fit_cache.peek(get_fit_key('06-22'))
+    assert shared_fit_cache.peek(get_fit_key('06-23')) is None
+    assert 0 == shared_fit_cache.hits
+    assert 0 == shared_fit_cache.misses
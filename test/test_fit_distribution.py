@@ -0,0 +1,54 @@
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from numpy.random import default_rng
+from scipy.stats import norm, gamma
+
+from src.definitions import WeatherVariable
+from src.fit_distribution import fit_distribution, fit_distributions, fit_gamma
+
+
+@pytest.fixture
+def rng():
+    return default_rng(69514468002301609459978422552062721160)
+
+
+def test_fit_distribution_temperature(rng):
+    values = norm.rvs(loc=15, scale=5, size=83, random_state=rng)
+
+    np.testing.assert_allclose(norm.fit(values), fit_distribution(WeatherVariable.TEMPERATURE, values))
+
+
+def test_fit_distribution_precipitation(rng):
+    values = gamma.rvs(a=2, loc=0, scale=5, size=83, random_state=rng)
+
+    expected = gamma.fit(values)
+    actual = fit_distribution(WeatherVariable.PRECIPITATION, values)
+
+    for value in [1, 5, 10, 20, 40]:
+        assert gamma.cdf(value, *expected) == pytest.approx(gamma.cdf(value, *actual), abs=0.01)
+
+
+def test_fit_distributions_ignores_missing_values(rng):
+    values = gamma.rvs(a=7.5, loc=15, scale=2, size=(3, 83), random_state=rng)
+    values_with_gaps = values.copy()
+    values_with_gaps[1, :10] = np.nan
+
+    parameters = fit_distributions(WeatherVariable.PRECIPITATION, values_with_gaps)
+
+    np.testing.assert_allclose(parameters[0], fit_distribution(WeatherVariable.PRECIPITATION, values[0]))
+    np.testing.assert_allclose(parameters[1], fit_distribution(WeatherVariable.PRECIPITATION, values[1, 10:]))
+
+
+def test_fit_distributions_falls_back_to_scipy(rng):
+    values = gamma.rvs(a=1, loc=0, scale=2, size=(2, 83), random_state=rng)
+    # Many dry days make the likelihood unbounded at the minimum.
+    values[0] = np.where(values[0] < 1, 0, values[0])
+
+    _, accurate = fit_gamma(values)
+    with patch.object(gamma, 'fit', wraps=gamma.fit) as mock_fit:
+        fit_distributions(WeatherVariable.PRECIPITATION, values)
+
+    assert not accurate[0]
+    assert mock_fit.call_count == np.sum(~accurate)
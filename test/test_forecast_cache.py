@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+from src.forecast_cache import ForecastCache, ForecastCacheStatus, track_forecast_freshness, \
+    get_forecast_freshness_headers
+
+
+@pytest.mark.asyncio
+async def test_forecast_cache_serves_fresh_forecasts():
+    forecast_cache = ForecastCache(ttl_seconds=60, max_size=10)
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        return 'forecast'
+
+    with track_forecast_freshness() as freshness:
+        assert 'forecast' == await forecast_cache.get_or_fetch('key', fetch)
+        assert 'forecast' == await forecast_cache.get_or_fetch('key', fetch)
+
+    assert 1 == len(calls)
+    assert [ForecastCacheStatus.MISS, ForecastCacheStatus.HIT] == [status for status, _ in freshness]
+    assert {'X-Forecast-Cache': 'mixed', 'X-Forecast-Age': '0'} == get_forecast_freshness_headers(freshness)
+
+
+@pytest.mark.asyncio
+async def test_forecast_cache_refetches_expired_forecasts():
+    forecast_cache = ForecastCache(ttl_seconds=0, max_size=10)
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        return len(calls)
+
+    assert 1 == await forecast_cache.get_or_fetch('key', fetch)
+    assert 2 == await forecast_cache.get_or_fetch('key', fetch)
+    assert 2 == forecast_cache.misses
+
+
+@pytest.mark.asyncio
+async def test_forecast_cache_coalesces_concurrent_fetches():
+    forecast_cache = ForecastCache(ttl_seconds=60, max_size=10)
+    release = asyncio.Event()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await release.wait()
+        return 'forecast'
+
+    with track_forecast_freshness() as freshness:
+        requests = asyncio.gather(*[forecast_cache.get_or_fetch('key', fetch) for _ in range(5)])
+        await asyncio.sleep(0)
+        release.set()
+        assert ['forecast'] * 5 == await requests
+
+    assert 1 == len(calls)
+    assert 4 == forecast_cache.coalesced
+    assert 4 == sum(ForecastCacheStatus.COALESCED == status for status, _ in freshness)
+
+
+@pytest.mark.asyncio
+async def test_forecast_cache_shares_and_does_not_cache_failures():
+    forecast_cache = ForecastCache(ttl_seconds=60, max_size=10)
+    release = asyncio.Event()
+
+    async def fetch():
+        await release.wait()
+        raise RuntimeError('upstream failed')
+
+    requests = asyncio.gather(*[forecast_cache.get_or_fetch('key', fetch) for _ in range(3)], return_exceptions=True)
+    await asyncio.sleep(0)
+    release.set()
+
+    assert all(isinstance(result, RuntimeError) for result in await requests)
+    assert 0 == len(forecast_cache._entries)
+    assert 0 == len(forecast_cache._in_flight)
+
+
+@pytest.mark.asyncio
+async def test_forecast_cache_cancelled_caller_does_not_cancel_waiters():
+    forecast_cache = ForecastCache(ttl_seconds=60, max_size=10)
+    release = asyncio.Event()
+
+    async def fetch():
+        await release.wait()
+        return 'forecast'
+
+    leader = asyncio.ensure_future(forecast_cache.get_or_fetch('key', fetch))
+    await asyncio.sleep(0)
+    waiter = asyncio.ensure_future(forecast_cache.get_or_fetch('key', fetch))
+    await asyncio.sleep(0)
+    leader.cancel()
+    await asyncio.sleep(0)
+    release.set()
+
+    assert 'forecast' == await waiter
+    assert leader.cancelled()
+    assert 'forecast' == await forecast_cache.get_or_fetch('key', fetch)
+    assert 1 == forecast_cache.hits
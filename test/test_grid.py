@@ -0,0 +1,49 @@
+from src.definitions import Coordinate, WeatherModel
+from src.grid import snap_coordinate, GridIndex, GridCell, get_cell_coordinate
+
+
+def test_snap_coordinate():
+    coordinate = Coordinate(timestamp=1687461397, latitude=48.3504104, longitude=10.8766662)
+
+    assert (48.25, 11.0) == snap_coordinate(coordinate, WeatherModel.ERA5)
+    assert (48.4, 10.9) == snap_coordinate(coordinate, WeatherModel.ERA5_LAND)
+
+
+def test_snap_coordinate_wraps_longitude():
+    coordinate = Coordinate(timestamp=1687461397, latitude=90.1, longitude=179.95)
+
+    assert (90.0, -180.0) == snap_coordinate(coordinate, WeatherModel.ERA5)
+    assert snap_coordinate(coordinate, WeatherModel.ERA5) == snap_coordinate(
+        Coordinate(timestamp=1687461397, latitude=90.0, longitude=-180.05), WeatherModel.ERA5
+    )
+
+
+def test_get_cell_coordinate():
+    coordinate = Coordinate(timestamp=1687461397, latitude=48.3504104, longitude=10.8766662)
+
+    cell_coordinate = get_cell_coordinate(coordinate, snap_coordinate(coordinate, WeatherModel.ERA5))
+
+    assert Coordinate(timestamp=1687461397, latitude=48.25, longitude=11.0) == cell_coordinate
+
+
+def test_grid_index_nearest():
+    grid_index = GridIndex()
+    grid_index.add(WeatherModel.ERA5, [GridCell(48.25, 11.0), GridCell(48.5, 11.0)])
+    coordinate = Coordinate(timestamp=1687461397, latitude=48.3, longitude=11.1)
+
+    assert (WeatherModel.ERA5, GridCell(48.25, 11.0)) in grid_index
+    assert (WeatherModel.ERA5_LAND, GridCell(48.25, 11.0)) not in grid_index
+    assert GridCell(48.25, 11.0) == grid_index.nearest(WeatherModel.ERA5, coordinate, max_distance=0.125)
+    assert grid_index.nearest(WeatherModel.ERA5, coordinate, max_distance=0.05) is None
+    assert grid_index.nearest(WeatherModel.ERA5_LAND, coordinate, max_distance=1) is None
+
+
+def test_grid_index_rebuilds_after_add():
+    grid_index = GridIndex()
+    grid_index.add(WeatherModel.ERA5, [GridCell(48.25, 11.0)])
+    coordinate = Coordinate(timestamp=1687461397, latitude=50.0, longitude=11.0)
+    assert grid_index.nearest(WeatherModel.ERA5, coordinate, max_distance=0.125) is None
+
+    grid_index.add(WeatherModel.ERA5, [GridCell(50.0, 11.0)])
+
+    assert GridCell(50.0, 11.0) == grid_index.nearest(WeatherModel.ERA5, coordinate, max_distance=0.125)
@@ -0,0 +1,186 @@
+from datetime import datetime, date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.daily_series import DailySeries
+from src.definitions import WeatherVariable, WeatherModel, Coordinate
+from src.historical_cache import HistoricalCache
+from test.test_api_request import coordinate
+
+
+@pytest.fixture
+def historical_data():
+    return DailySeries(
+        np.datetime64('2000-01-01'), np.arange(366, dtype=np.float32), WeatherVariable.TEMPERATURE
+    )
+
+
+@pytest.fixture
+def historical_cache(tmp_path):
+    return HistoricalCache(tmp_path)
+
+
+def test_historical_cache_miss(historical_cache, coordinate):
+    assert historical_cache.load(
+        coordinate=coordinate,
+        weather_variable=WeatherVariable.TEMPERATURE,
+        weather_model=WeatherModel.ERA5,
+        end_date=datetime(2000, 12, 31)
+    ) is None
+
+
+def test_historical_cache_clear(historical_cache, coordinate, historical_data):
+    historical_cache.store(
+        coordinate=coordinate,
+        weather_variable=WeatherVariable.TEMPERATURE,
+        weather_model=WeatherModel.ERA5,
+        end_date=datetime(2000, 12, 31),
+        historical_data=historical_data
+    )
+
+    historical_cache.clear()
+
+    assert historical_cache.read(coordinate, WeatherVariable.TEMPERATURE, WeatherModel.ERA5) is None
+    assert (WeatherModel.ERA5, (48.25, 11.0)) not in \
+        historical_cache.index(WeatherModel.ERA5, WeatherVariable.TEMPERATURE)
+
+
+def test_historical_cache_hit_in_same_grid_cell(historical_cache, coordinate, historical_data):
+    historical_cache.store(
+        coordinate=coordinate,
+        weather_variable=WeatherVariable.TEMPERATURE,
+        weather_model=WeatherModel.ERA5,
+        end_date=datetime(2000, 12, 31),
+        historical_data=historical_data
+    )
+    neighbour = Coordinate(timestamp=coordinate.timestamp, latitude=48.3504105, longitude=10.8766663)
+
+    actual = historical_cache.load(
+        coordinate=neighbour,
+        weather_variable=WeatherVariable.TEMPERATURE,
+        weather_model=WeatherModel.ERA5,
+        end_date=datetime(2000, 6, 30)
+    )
+
+    assert np.datetime64('2000-01-01') == actual.start_date
+    assert np.datetime64('2000-06-30') == actual.end_date
+    np.testing.assert_array_equal(historical_data.values[:len(actual)], actual.values)
+
+
+def test_historical_cache_miss_for_later_end_date(historical_cache, coordinate, historical_data):
+    historical_cache.store(
+        coordinate=coordinate,
+        weather_variable=WeatherVariable.TEMPERATURE,
+        weather_model=WeatherModel.ERA5,
+        end_date=datetime(2000, 12, 31),
+        historical_data=historical_data
+    )
+
+    assert historical_cache.load(
+        coordinate=coordinate,
+        weather_variable=WeatherVariable.TEMPERATURE,
+        weather_model=WeatherModel.ERA5,
+        end_date=datetime(2001, 1, 1)
+    ) is None
+
+
+def test_historical_cache_reuses_cached_cell_on_boundary(historical_cache, coordinate, historical_data):
+    cached_cell = Coordinate(timestamp=coordinate.timestamp, latitude=48.25, longitude=11.0)
+    historical_cache.store(
+        coordinate=cached_cell,
+        weather_variable=WeatherVariable.TEMPERATURE,
+        weather_model=WeatherModel.ERA5,
+        end_date=datetime(2000, 12, 31),
+        historical_data=historical_data
+    )
+    # Lies on the boundary between the cells at 48.0 and 48.25 and snaps to 48.0.
+    on_boundary = Coordinate(timestamp=coordinate.timestamp, latitude=48.125, longitude=11.0)
+    inside_other_cell = Coordinate(timestamp=coordinate.timestamp, latitude=48.1, longitude=11.0)
+
+    assert historical_cache.load(
+        coordinate=on_boundary,
+        weather_variable=WeatherVariable.TEMPERATURE,
+        weather_model=WeatherModel.ERA5,
+        end_date=datetime(2000, 12, 31)
+    ) is not None
+    assert historical_cache.load(
+        coordinate=inside_other_cell,
+        weather_variable=WeatherVariable.TEMPERATURE,
+        weather_model=WeatherModel.ERA5,
+        end_date=datetime(2000, 12, 31)
+    ) is None
+
+
+def test_historical_cache_indexes_existing_cache_directory(historical_cache, coordinate, historical_data):
+    historical_cache.store(
+        coordinate=coordinate,
+        weather_variable=WeatherVariable.TEMPERATURE,
+        weather_model=WeatherModel.ERA5,
+        end_date=datetime(2000, 12, 31),
+        historical_data=historical_data
+    )
+
+    reopened_cache = HistoricalCache(historical_cache.directory)
+
+    assert (WeatherModel.ERA5, (48.25, 11.0)) in reopened_cache.index(WeatherModel.ERA5, WeatherVariable.TEMPERATURE)
+
+
+def test_historical_cache_appends_tail(historical_cache, coordinate, historical_data):
+    historical_cache.store(
+        coordinate=coordinate,
+        weather_variable=WeatherVariable.TEMPERATURE,
+        weather_model=WeatherModel.ERA5,
+        end_date=datetime(2000, 12, 31),
+        historical_data=historical_data
+    )
+    cached = historical_cache.read(coordinate, WeatherVariable.TEMPERATURE, WeatherModel.ERA5)
+    tail = DailySeries(
+        np.datetime64('2000-12-29'), [363.0, 364.0, 365.0, 366.0, 367.0, 368.0], WeatherVariable.TEMPERATURE
+    )
+
+    appended, first_changed_date = historical_cache.append(
+        cached=cached,
+        weather_variable=WeatherVariable.TEMPERATURE,
+        weather_model=WeatherModel.ERA5,
+        end_date=datetime(2001, 1, 3),
+        tail=tail,
+        tail_start_date=date(2000, 12, 29)
+    )
+
+    assert date(2000, 12, 31) == cached.end_date
+    assert first_changed_date is None
+    assert 369 == len(appended)
+    pd.testing.assert_frame_equal(
+        appended.to_data_frame(),
+        historical_cache.load(
+            coordinate, WeatherVariable.TEMPERATURE, WeatherModel.ERA5, datetime(2001, 1, 3)
+        ).to_data_frame()
+    )
+
+
+def test_historical_cache_append_detects_revised_values(historical_cache, coordinate, historical_data):
+    historical_cache.store(
+        coordinate=coordinate,
+        weather_variable=WeatherVariable.TEMPERATURE,
+        weather_model=WeatherModel.ERA5,
+        end_date=datetime(2000, 12, 31),
+        historical_data=historical_data
+    )
+    cached = historical_cache.read(coordinate, WeatherVariable.TEMPERATURE, WeatherModel.ERA5)
+    # The archive revised the 30th and no longer holds the 31st.
+    tail = DailySeries.from_dates(['2000-12-29', '2000-12-30'], [363.0, 0.0], WeatherVariable.TEMPERATURE)
+
+    appended, first_changed_date = historical_cache.append(
+        cached=cached,
+        weather_variable=WeatherVariable.TEMPERATURE,
+        weather_model=WeatherModel.ERA5,
+        end_date=datetime(2000, 12, 31),
+        tail=tail,
+        tail_start_date=date(2000, 12, 29)
+    )
+
+    assert date(2000, 12, 30) == first_changed_date
+    assert np.datetime64('2000-12-30') == appended.end_date
+    assert [363.0, 0.0] == appended.values[-2:].tolist()
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from numpy.random import default_rng
+
+from src.definitions import ReturnPeriodMode
+from src.last_occurrence_index import LastOccurrenceIndex
+
+
+def get_last_occurrence(years, values, current_value, mode):
+    for year, value in zip(years[::-1], values[::-1]):
+        if (ReturnPeriodMode.MAX == mode and value >= current_value) or \
+                (ReturnPeriodMode.MIN == mode and value <= current_value):
+            return int(year)
+    return 'Never'
+
+
+@pytest.fixture
+def years():
+    return np.arange(1940, 2023)
+
+
+@pytest.fixture
+def values(years):
+    rng = default_rng(69514468002301609459978422552062721160)
+    values = rng.normal(loc=20, scale=5, size=(4, len(years)))
+    values[2, -5:] = np.nan
+    return values
+
+
+def test_last_occurrence_index_many_values_of_one_series(years, values):
+    current_values = np.linspace(0, 40, 81)
+    index = LastOccurrenceIndex(years, values[0])
+
+    for mode in ReturnPeriodMode:
+        expected = [get_last_occurrence(years, values[0], current_value, mode) for current_value in current_values]
+        assert expected == index.query(current_values, mode)
+
+
+def test_last_occurrence_index_one_value_per_series(years, values):
+    current_values = np.array([30, 10, 25, 20])
+    modes = [ReturnPeriodMode.MAX, ReturnPeriodMode.MIN, ReturnPeriodMode.MAX, ReturnPeriodMode.MIN]
+
+    expected = [
+        get_last_occurrence(years, series, current_value, mode)
+        for series, current_value, mode in zip(values, current_values, modes)
+    ]
+
+    assert expected == LastOccurrenceIndex(years, values).query(current_values, modes)
+
+
+def test_last_occurrence_index_single_value(years, values):
+    index = LastOccurrenceIndex(years, values[0])
+
+    assert 'Never' == index.query(100, ReturnPeriodMode.MAX)
+    assert 'Never' == index.query(-100, ReturnPeriodMode.MIN)
+    assert int(years[-1]) == index.query(-100, ReturnPeriodMode.MAX)
@@ -0,0 +1,34 @@
+from benchmark.load_test import generate_requests, summarise_level, LoadTestResult, LOAD_TEST_PATHS
+
+
+def test_generate_requests_is_reproducible():
+    def generate():
+        return generate_requests(
+            number_of_requests=100,
+            number_of_locations=5,
+            number_of_days=3,
+            paths=LOAD_TEST_PATHS,
+            latitude_range=(47.0, 55.0),
+            longitude_range=(5.0, 15.0),
+            seed=1
+        )
+
+    requests = generate()
+
+    assert requests == generate()
+    assert 5 == len({(request.parameters['latitude'], request.parameters['longitude']) for request in requests})
+    assert 3 == len({request.parameters['timestamp'] for request in requests})
+    assert set(LOAD_TEST_PATHS) == {request.path for request in requests}
+
+
+def test_summarise_level():
+    results = [LoadTestResult(latency_seconds=0.01 * latency, status_code=200) for latency in range(1, 100)]
+    results.append(LoadTestResult(latency_seconds=1.0, status_code=None))
+
+    summary = summarise_level(concurrency=4, results=results, duration_seconds=2.0)
+
+    assert 1 == summary['errors']
+    assert 0.01 == summary['error_rate']
+    assert 50.0 == summary['throughput_per_second']
+    assert 0.505 == round(summary['latency_seconds']['p50'], 3)
+    assert 1.0 == summary['latency_seconds']['max']
@@ -0,0 +1,87 @@
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+import src.statistics_pool
+from main import app
+from src.metrics import time_stage, track_stage_durations, get_server_timing_header, record_cache_lookup, \
+    CACHE_LOOKUPS
+from src.statistics_pool import run_in_statistics_pool
+from test.test_upstream_stand_in import stand_in_client
+
+
+def test_time_stage_sums_durations_of_request():
+    with track_stage_durations() as stage_durations:
+        with time_stage('fit'):
+            pass
+        with time_stage('fit'):
+            pass
+        with time_stage('extract'):
+            pass
+
+    assert ['fit', 'extract'] == list(stage_durations)
+    assert all(duration >= 0 for duration in stage_durations.values())
+
+
+def test_get_server_timing_header():
+    assert 'upstream;dur=120.5, fit;dur=3.0' == get_server_timing_header({'upstream': 0.1205, 'fit': 0.003})
+
+
+def test_request_reports_stages_and_metrics(stand_in_client):
+    client = TestClient(app)
+
+    response = client.get('/temperature', params={'timestamp': 1687461397, 'latitude': 48.35, 'longitude': 10.87})
+    metrics = client.get('/metrics').text
+
+    assert 200 == response.status_code
+    stages = [entry.split(';')[0] for entry in response.headers['server-timing'].split(', ')]
+    assert {'upstream', 'parse', 'extract', 'fit', 'serialize', 'compress', 'total'} == set(stages)
+    assert 'climate_context_upstream_responses_total{api="archive",status="200"}' in metrics
+    assert 'climate_context_cache_lookups_total{cache="forecast",result="miss"}' in metrics
+    assert 'climate_context_request_duration_seconds_count{route="/temperature"}' in metrics
+
+
+def get_metric_values() -> dict:
+    stage_counts = {
+        stage: REGISTRY.get_sample_value('climate_context_stage_duration_seconds_count', {'stage': stage}) or 0
+        for stage in ['extract', 'fit']
+    }
+    fit_lookups = {
+        result:
+            REGISTRY.get_sample_value('climate_context_cache_lookups_total', {'cache': 'fit', 'result': result}) or 0
+        for result in ['hit', 'miss']
+    }
+    return {**stage_counts, **fit_lookups}
+
+
+def test_request_in_statistics_pool_records_metrics_once(monkeypatch, stand_in_client):
+    monkeypatch.setattr(src.statistics_pool, 'STATISTICS_POOL_WORKERS', 1)
+    client = TestClient(app)
+    before = get_metric_values()
+
+    response = client.get('/temperature', params={'timestamp': 1687461397, 'latitude': 48.35, 'longitude': 10.87})
+    after = get_metric_values()
+
+    assert 200 == response.status_code
+    # One fit per time frame, which the pool returns, and one lookup of each fit.
+    assert {'extract': 1, 'fit': 1, 'hit': 0, 'miss': 3} == {key: after[key] - before[key] for key in before}
+
+
+def record_cache_lookup_in_statistics_pool() -> float:
+    record_cache_lookup('fit', 'hit')
+    return CACHE_LOOKUPS.labels('fit', 'hit')._value.get()
+
+
+@pytest.mark.asyncio
+async def test_statistics_pool_records_no_metrics(monkeypatch):
+    monkeypatch.setattr(src.statistics_pool, 'STATISTICS_POOL_WORKERS', 1)
+
+    assert 0 == await run_in_statistics_pool(record_cache_lookup_in_statistics_pool)
+
+
+def test_record_cache_lookup():
+    before = CACHE_LOOKUPS.labels('fit', 'hit')._value.get()
+
+    record_cache_lookup('fit', 'hit')
+
+    assert before + 1 == CACHE_LOOKUPS.labels('fit', 'hit')._value.get()
@@ -0,0 +1,65 @@
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from src.response_cache import get_etag
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture
+def temperature_parameters():
+    return {'timestamp': 1687461397, 'latitude': 48.3504104, 'longitude': 10.8766662}
+
+
+@pytest.fixture
+def mock_get_weather_variable_data():
+    with patch('src.api.temperature.get_weather_variable_data', return_value={'current_value': 32.7}) as mock:
+        yield mock
+
+
+def test_response_cache_serves_repeated_requests(client, temperature_parameters, mock_get_weather_variable_data):
+    first_response = client.get('/temperature', params=temperature_parameters)
+    # Same grid cell and day.
+    second_response = client.get(
+        '/temperature',
+        params={**temperature_parameters, 'timestamp': temperature_parameters['timestamp'] + 60, 'latitude': 48.3}
+    )
+
+    assert 1 == mock_get_weather_variable_data.call_count
+    assert 'miss' == first_response.headers['x-response-cache']
+    assert 'hit' == second_response.headers['x-response-cache']
+    assert first_response.content == second_response.content
+    assert get_etag(first_response.content) == second_response.headers['etag']
+    assert second_response.headers['cache-control'].startswith('public, max-age=')
+    assert 'application/json' == second_response.headers['content-type']
+
+
+def test_response_cache_answers_conditional_requests(client, temperature_parameters, mock_get_weather_variable_data):
+    etag = client.get('/temperature', params=temperature_parameters).headers['etag']
+
+    response = client.get('/temperature', params=temperature_parameters, headers={'If-None-Match': f'W/{etag}'})
+
+    assert 304 == response.status_code
+    assert b'' == response.content
+    assert etag == response.headers['etag']
+    assert 1 == mock_get_weather_variable_data.call_count
+
+
+def test_response_cache_keys_by_grid_cell(client, temperature_parameters, mock_get_weather_variable_data):
+    client.get('/temperature', params=temperature_parameters)
+    client.get('/temperature', params={**temperature_parameters, 'latitude': 50.0})
+
+    assert 2 == mock_get_weather_variable_data.call_count
+
+
+def test_response_cache_skips_invalid_requests(client):
+    response = client.get('/temperature', params={'latitude': 48.35})
+
+    assert 422 == response.status_code
+    assert 'etag' not in response.headers
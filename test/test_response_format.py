@@ -0,0 +1,106 @@
+import gzip
+from unittest.mock import patch
+
+import brotli
+import msgpack
+import numpy as np
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from src.definitions import ResponseFormat
+from src.response_format import get_response_format, get_content_encoding, serialise
+from test.test_response_cache import temperature_parameters
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture
+def weather_variable_data():
+    return {
+        'daily_average_temperature': 20.1,
+        'daily_return_period_temperature': None,
+        'daily_historical_temperature': list(np.linspace(10.0, 30.0, 85)),
+        'daily_historical_index': list(range(1940, 2025)),
+    }
+
+
+@pytest.fixture
+def mock_get_weather_variable_data(weather_variable_data):
+    with patch('src.api.temperature.get_weather_variable_data', return_value=weather_variable_data) as mock:
+        yield mock
+
+
+def test_get_response_format():
+    assert ResponseFormat.JSON == get_response_format(None)
+    assert ResponseFormat.JSON == get_response_format('*/*')
+    assert ResponseFormat.MSGPACK == get_response_format('application/msgpack')
+    assert ResponseFormat.MSGPACK == get_response_format('application/json;q=0.5, application/x-msgpack')
+    assert ResponseFormat.JSON == get_response_format('application/msgpack;q=0.1, application/json')
+
+
+def test_get_content_encoding():
+    assert get_content_encoding(None) is None
+    assert 'br' == get_content_encoding('gzip, deflate, br')
+    assert 'gzip' == get_content_encoding('gzip, br;q=0.5')
+    assert 'gzip' == get_content_encoding('*, br;q=0')
+    assert get_content_encoding('identity') is None
+
+
+def test_serialise_numpy_values():
+    content = {'values': np.array([1.5, np.nan]), 'year': np.int32(1940)}
+
+    assert {'values': [1.5, None], 'year': 1940} == orjson.loads(serialise(content, ResponseFormat.JSON))
+    assert 1940 == msgpack.unpackb(serialise(content, ResponseFormat.MSGPACK))['year']
+
+
+def test_response_in_message_pack(client, temperature_parameters, mock_get_weather_variable_data, weather_variable_data):
+    response = client.get(
+        '/temperature', params=temperature_parameters, headers={'Accept': 'application/msgpack'}
+    )
+    json_response = client.get('/temperature', params=temperature_parameters)
+
+    assert 'application/msgpack' == response.headers['content-type']
+    assert weather_variable_data == msgpack.unpackb(response.content)
+    assert 'application/json' == json_response.headers['content-type']
+    assert weather_variable_data == json_response.json()
+    # The response cache holds one response per format.
+    assert 2 == mock_get_weather_variable_data.call_count
+
+
+@pytest.mark.parametrize('content_encoding, decompress', [('br', brotli.decompress), ('gzip', gzip.decompress)])
+def test_response_compression(
+        client, temperature_parameters, mock_get_weather_variable_data, weather_variable_data, content_encoding,
+        decompress
+):
+    response = client.get(
+        '/temperature', params=temperature_parameters, headers={'Accept-Encoding': content_encoding}
+    )
+    # Reads the body as it was sent, without decompressing it.
+    with client.stream(
+            'GET', '/temperature', params=temperature_parameters, headers={'Accept-Encoding': content_encoding}
+    ) as raw_response:
+        body = b''.join(raw_response.iter_raw())
+
+    assert content_encoding == response.headers['content-encoding']
+    assert 'Accept, Accept-Encoding' == response.headers['vary']
+    assert response.headers['etag'].startswith('W/')
+    assert weather_variable_data == response.json()
+    assert weather_variable_data == orjson.loads(decompress(body))
+    assert len(body) < len(serialise(weather_variable_data, ResponseFormat.JSON))
+
+
+def test_compressed_response_answers_conditional_requests(
+        client, temperature_parameters, mock_get_weather_variable_data
+):
+    etag = client.get('/temperature', params=temperature_parameters, headers={'Accept-Encoding': 'gzip'}).headers['etag']
+
+    response = client.get(
+        '/temperature', params=temperature_parameters, headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag}
+    )
+
+    assert 304 == response.status_code
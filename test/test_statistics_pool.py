@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+import src.calculate_statistics
+import src.statistics_pool
+from src.calculate_batch_statistics import get_batch_climate_context_data
+from src.calculate_date_range_statistics import get_date_range_climate_context_data
+from src.calculate_map_statistics import get_map_data
+from src.calculate_statistics import get_weather_variable_data
+from src.definitions import WeatherModel, WeatherVariable, WeatherVariableName
+from src.statistics_pool import run_in_statistics_pool, get_statistics_pool
+from test.test_api_request import coordinate
+from test.test_upstream_stand_in import stand_in_client
+
+
+@pytest.mark.asyncio
+async def test_run_in_statistics_pool_without_pool():
+    assert get_statistics_pool() is None
+    assert 3 == await run_in_statistics_pool(max, 1, 3)
+
+
+@pytest.mark.asyncio
+async def test_statistics_pool_matches_event_loop(monkeypatch, stand_in_client, coordinate, fit_cache):
+    async def get_precipitation_data():
+        return await get_weather_variable_data(
+            coordinate=coordinate,
+            weather_model=WeatherModel.ERA5,
+            weather_variable=WeatherVariable.PRECIPITATION,
+            weather_variable_name=WeatherVariableName.PRECIPITATION
+        )
+
+    expected = await get_precipitation_data()
+    fit_cache.clear()
+    monkeypatch.setattr(src.statistics_pool, 'STATISTICS_POOL_WORKERS', 1)
+
+    actual = await get_precipitation_data()
+    # Fitted distributions are returned to the fit cache of the event loop and sent along on the next request.
+    fitted = len(fit_cache)
+    actual_from_cached_fits = await get_precipitation_data()
+
+    assert get_statistics_pool() is not None
+    assert 0 < fitted
+    assert fitted == fit_cache.hits
+    np.testing.assert_equal(expected, actual)
+    np.testing.assert_equal(expected, actual_from_cached_fits)
+
+
+@pytest.mark.asyncio
+async def test_statistics_pool_matches_event_loop_for_many_locations_and_days(
+        monkeypatch, stand_in_client, coordinate, fit_cache
+):
+    weather_variable_names = [WeatherVariableName.TEMPERATURE, WeatherVariableName.PRECIPITATION]
+    end_date = datetime.fromtimestamp(coordinate.timestamp).date()
+
+    async def get_climate_context_data():
+        batch_data = await get_batch_climate_context_data(
+            coordinates=[coordinate],
+            weather_model=WeatherModel.ERA5,
+            weather_variable_names=weather_variable_names
+        )
+        date_range_data = await get_date_range_climate_context_data(
+            latitude=coordinate.latitude,
+            longitude=coordinate.longitude,
+            start_date=end_date - timedelta(days=2),
+            end_date=end_date,
+            weather_model=WeatherModel.ERA5,
+            weather_variable_names=weather_variable_names
+        )
+        map_data = await get_map_data(
+            south=coordinate.latitude - 0.2,
+            north=coordinate.latitude + 0.2,
+            west=coordinate.longitude - 0.2,
+            east=coordinate.longitude + 0.2,
+            timestamp=coordinate.timestamp,
+            weather_model=WeatherModel.ERA5,
+            weather_variable_names=weather_variable_names
+        )
+        return batch_data, date_range_data, map_data.to_dict()
+
+    expected = await get_climate_context_data()
+    fit_cache.clear()
+    monkeypatch.setattr(src.statistics_pool, 'STATISTICS_POOL_WORKERS', 1)
+    pool_functions = []
+
+    async def run_in_pool(function, task):
+        pool_functions.append(task.function.__name__)
+        return await run_in_statistics_pool(function, task)
+
+    monkeypatch.setattr(src.calculate_statistics, 'run_in_statistics_pool', run_in_pool)
+
+    actual = await get_climate_context_data()
+
+    assert {
+        'calculate_stacked_statistics', 'calculate_date_range_statistics', 'calculate_stacked_statistics_arrays'
+    } == set(pool_functions)
+    # The distributions fitted in the pool are returned to the fit cache of the event loop.
+    assert 0 < len(fit_cache)
+    np.testing.assert_equal(expected, actual)
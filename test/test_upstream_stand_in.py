@@ -0,0 +1,45 @@
+from datetime import datetime
+
+import httpx
+import numpy as np
+import pytest
+
+import src.weather_api_request
+from benchmark.upstream_stand_in import create_app, generate_daily_series
+from src.definitions import WeatherVariable, WeatherModel
+from src.weather_api_request import get_forecast_and_historical_data_for_variables
+from test.test_api_request import coordinate
+
+
+@pytest.fixture
+def stand_in_client(monkeypatch):
+    stand_in_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=create_app(0, 0)))
+    monkeypatch.setattr(src.weather_api_request, 'http_client', stand_in_client)
+    return stand_in_client
+
+
+def test_generate_daily_series_is_deterministic():
+    full_series = generate_daily_series(
+        WeatherVariable.PRECIPITATION, 48.25, 11.0, np.datetime64('1940-01-01'), np.datetime64('2000-12-31')
+    )
+    partial_series = generate_daily_series(
+        WeatherVariable.PRECIPITATION, 48.25, 11.0, np.datetime64('2000-01-01'), np.datetime64('2000-12-31')
+    )
+
+    assert 366 == len(partial_series)
+    np.testing.assert_array_equal(full_series[-366:], partial_series)
+    assert (full_series >= 0).all()
+
+
+@pytest.mark.asyncio
+async def test_stand_in_serves_weather_api_requests(stand_in_client, coordinate):
+    weather_data = await get_forecast_and_historical_data_for_variables(
+        coordinate=coordinate,
+        weather_variables=list(WeatherVariable),
+        weather_model=WeatherModel.ERA5
+    )
+
+    for forecast_data, historical_data in weather_data.values():
+        assert datetime.fromtimestamp(coordinate.timestamp).date() == forecast_data.index[-1].date()
+        assert np.datetime64('1940-01-01') == historical_data.start_date
+        assert 31 == len(forecast_data)